@@ -37,7 +37,7 @@ class AVL:
       if self.left is None: #if it does not have a left child
         return -1
       else:
-        return self.left_height #computing left height
+        return self.left._height() #computing left height
 
 
     def right_height(self):
@@ -49,15 +49,24 @@ class AVL:
         return -1
 
       else:
-        return self.right_height #computing right height
-      
-    def _height(self):                  
-      """Return the height of the subtree rooted at the current node.       
+        return self.right._height() #computing right height
+
+    def _height(self):
+      """Return the height of the subtree rooted at the current node.
+
+      The balance factors say which child is taller, so it suffices to walk
+      down one path, in O(height) time rather than time proportional to the
+      size of the subtree.
       """
-      if self.is_leaf():
-        return 0
-      else:
-        return 1 + max(c._height() for c in self.children())
+      height = 0
+      walk = self
+      while not walk.is_leaf():
+        if walk.balanceFactor < 0:       # right subtree is taller
+          walk = walk.right
+        else:                            # left is taller, or both are equal
+          walk = walk.left
+        height += 1
+      return height
 
     def is_leaf(self):
       """Return True if current node does not have any children."""
@@ -89,31 +98,34 @@ class AVL:
   def insert(self, element):
     """ Insert element into the AVL, keeping the AVL property. """
     def _insertNode(root, node):
-      if root == None or root == node:    # Overwrite if already present
-        root = node
-      else:
-        if node < root:  # Go left
-          if root.hasLeft():
-            _insertNode(root.left, node)
+      """Link node below root; return False if an equal element was overwritten."""
+      walk = root
+      while True:
+        if node.element == walk.element:   # Overwrite if already present
+          walk.element = node.element
+          return False
+        elif node < walk:  # Go left
+          if walk.hasLeft():
+            walk = walk.left
           else:
-            root.left = node
-            node.parent = root
-        else:            # Go right
-          if root.hasRight():
-            _insertNode(root.right, node)
+            walk.left = node
+            node.parent = walk
+            return True
+        else:              # Go right
+          if walk.hasRight():
+            walk = walk.right
           else:
-            root.right = node
-            node.parent = root
+            walk.right = node
+            node.parent = walk
+            return True
 
     # Create node to insert
     node = self._BTNode(element)
 
     if self.root == None:   # Special case for when tree is empty
       self.root = node
-    else:
-      _insertNode(self.root, node)
-      self.recompute_balanceFactor(node) #recompute the balance factors from the node along its path to the root
-      self._rebalance(node)
+    elif _insertNode(self.root, node):
+      self._rebalance_insert(node)
       
   def _subtree_last_position(self, p):
     """Return Position of last item in subtree rooted at p."""
@@ -155,27 +167,23 @@ class AVL:
       p =  replacement
       # now p has at most one child
     parent = p.parent
+    from_left = parent is not None and p is parent.left
     self._delete(p)
-    #recompute the balance factors from the parent node along its path to the root
-    self.recompute_balanceFactor(parent) 
-    self._rebalance(parent)               
-        
-      
+    #update the balance factors from the parent node along its path to the root
+    self._rebalance_delete(parent, from_left)
+
+
   def _subtree_search(self, p, k):
-    """Return Note of p's subtree having key k, or last node searched."""
-    
-    if k == p.element:                                   # found match
-      return p
-    elif k < p.element:                                  # search left subtree
-      if p.left is not None:
-        return self._subtree_search(p.left, k)
-      else:
-        return None
-    else:                                              # search right subtree
-      if p.right is not None:
-        return self._subtree_search(p.right, k)
-      else:
-        return None
+    """Return Node of p's subtree having key k, or None if not found."""
+    walk = p
+    while walk is not None:
+      if k == walk.element:                              # found match
+        return walk
+      elif k < walk.element:                             # search left subtree
+        walk = walk.left
+      else:                                              # search right subtree
+        walk = walk.right
+    return None
       
   def search(self,element):
     """Return node with key k, or else neighbor (or None if empty)."""
@@ -207,26 +215,32 @@ class AVL:
     print();
 #-------utilities for rebalance
   def recompute_balanceFactor(self, p):
-    """Q3: recompute balance factor	for not along the path from p to root"""
-    return p.left_height() - p.right_height()
+    """Q3: recompute balance factor	for nodes along the path from p to root
+
+    Insertion and deletion maintain the balance factors incrementally, so this
+    is only needed after the tree has been modified by other means.
+    """
+    while p is not None:
+      self._recompute_balanceFactor_singleNode(p)
+      p = p.parent
 
 
   def _recompute_balanceFactor_singleNode(self, p):
     """Q4: recompute balance factor	of a single node"""
-    if node is None:
-      return 
-    return p._node.left_height() - p._node.right_height()
+    if p is None:
+      return
+    p.balanceFactor = p.left_height() - p.right_height()
 
 
 
   def _isbalanced(self, p):
     """Q5: check the current node if it is balanced."""
-    return abs(p._node.left_height() - p._node.right_height()) <= -1
+    return abs(p.balanceFactor) <= 1
 
 
 
   def _tall_child(self, p, favorleft=False): # parameter controls tiebreaker
-    if p.left_height() + (1 if favorleft else 0) > p.right_height():
+    if p.balanceFactor + (1 if favorleft else 0) > 0:
       return p.left
     else:
       return p.right
@@ -237,16 +251,38 @@ class AVL:
     alignment = (child == p.left)
     return self._tall_child(child, alignment)
 
-  def _rebalance(self, p):
+  def _rebalance_insert(self, node):
+    """Update balance factors above newly inserted node, restructuring if needed.
+
+    Stops as soon as a subtree's height is unchanged, so takes O(log n) time.
+    """
+    child, p = node, node.parent
+    while p is not None:
+      p.balanceFactor += 1 if child is p.left else -1
+      if p.balanceFactor == 0:                    # height of p is unchanged
+        return
+      if not self._isbalanced(p):                 # imbalance detected!
+        # restructuring restores the height p had before the insertion
+        self._restructure(self._tall_grandchild(p))
+        return
+      child, p = p, p.parent                      # p grew taller; repeat with parent
+
+  def _rebalance_delete(self, p, from_left):
+    """Update balance factors above p after its left (or right) subtree shrank.
+
+    Stops as soon as a subtree's height is unchanged, so takes O(log n) time.
+    """
     while p is not None:
-      if not self._isbalanced(p):                           # imbalance detected!
-        # perform trinode restructuring, setting p to resulting root,
-        # and recompute new local heights after the restructuring
+      p.balanceFactor += -1 if from_left else 1
+      if abs(p.balanceFactor) == 1:               # height of p is unchanged
+        return
+      if not self._isbalanced(p):                 # imbalance detected!
         p = self._restructure(self._tall_grandchild(p))
-        self._recompute_balanceFactor_singleNode(p.left)
-        self._recompute_balanceFactor_singleNode(p.right)
-      self._recompute_balanceFactor_singleNode(p)              # adjust for recent changes            
-      p = p.parent                                # repeat with parent
+        if p.balanceFactor != 0:                  # height of subtree is unchanged
+          return
+      parent = p.parent                           # p grew shorter; repeat with parent
+      from_left = parent is not None and p is parent.left
+      p = parent
 	  
   def _relink(self, parent, child, make_left_child):
     """Relink parent node with child node (we allow child to be None)."""
@@ -269,9 +305,19 @@ class AVL:
       t0  t1                  t1  t2
 
     Caller should ensure that p is not the root.
+
+    The balance factors of a and b are updated in O(1) time, as the heights of
+    t0, t1 and t2 relative to one another follow from their old values.
     """
     """Rotate Position p above its parent."""
     x = p
+    y = x.parent
+    if x is y.left:
+      y.balanceFactor -= 1 + max(x.balanceFactor, 0)
+      x.balanceFactor -= 1 - min(y.balanceFactor, 0)
+    else:
+      y.balanceFactor += 1 - min(x.balanceFactor, 0)
+      x.balanceFactor += 1 + max(y.balanceFactor, 0)
     y = x.parent                                 # we assume this exists
     z = y.parent                                 # grandparent (possibly None)
     if z is None:
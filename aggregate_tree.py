@@ -0,0 +1,135 @@
+from avl_tree import AVLTreeMap
+
+class AggregateTreeMap(AVLTreeMap):
+  """AVL tree map answering aggregate queries over key ranges in O(log n) time.
+
+  Each node caches the aggregate of the values in its subtree, in key order.  By
+  default the aggregate is a sum.  To aggregate with another function, define a
+  subclass overriding the public combine method with any associative function of
+  two values (see MinTreeMap and MaxTreeMap).  No identity element is needed, as
+  combine is never applied to an empty range.  The function belongs to the class,
+  so maps created by from_sorted, split and the set operations keep it.
+  """
+
+  _augmented = True               # refreshed up to the root after each update
+
+  #-------------------------- nested _Node class --------------------------
+  class _Node(AVLTreeMap._Node):
+    """Node class for AggregateTreeMap maintains aggregate of its subtree's values."""
+    __slots__ = '_aggregate'      # additional data member to store aggregate
+
+    def __init__(self, element, parent=None, left=None, right=None):
+      super().__init__(element, parent, left, right)
+      self._aggregate = element._value   # will be recomputed during balancing
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _merge(self, a, b):
+    """Combine two partial aggregates, either of which may be None (empty)."""
+    if a is None:
+      return b
+    if b is None:
+      return a
+    return self.combine(a, b)
+
+  def _refresh_node(self, node):
+    super()._refresh_node(node)
+    aggregate = node._element._value
+    if node._left is not None:
+      aggregate = self.combine(node._left._aggregate, aggregate)
+    if node._right is not None:
+      aggregate = self.combine(aggregate, node._right._aggregate)
+    node._aggregate = aggregate
+
+  def _aggregate_from(self, node, start):
+    """Return aggregate of values in subtree of node with keys >= start (None if empty)."""
+    result = None
+    while node is not None:
+      if node._element._key < start:
+        node = node._right
+      else:                                         # node and right subtree qualify
+        part = node._element._value
+        if node._right is not None:
+          part = self.combine(part, node._right._aggregate)
+        result = self._merge(part, result)          # earlier parts lie further right
+        node = node._left
+    return result
+
+  def _aggregate_before(self, node, stop):
+    """Return aggregate of values in subtree of node with keys < stop (None if empty)."""
+    result = None
+    while node is not None:
+      if node._element._key < stop:                 # left subtree and node qualify
+        part = node._element._value
+        if node._left is not None:
+          part = self.combine(node._left._aggregate, part)
+        result = self._merge(result, part)          # earlier parts lie further left
+        node = node._right
+      else:
+        node = node._left
+    return result
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    if self._root is None:
+      super().__setitem__(k, v)
+      return
+    node = self._node_search(self._root, k)
+    key = node._element._key
+    if key == k:
+      node._element._value = v                      # replace existing item's value
+      self._refresh_path(node)                      # aggregates above it change
+    else:
+      child = self._add_child_node(node, self._Item(k,v), k < key)
+      self._rebalance_insert(self._make_position(child))
+
+  #--------------------- public method defining the aggregate ---------------------
+  def combine(self, a, b):
+    """Return the aggregate of a followed by b.
+
+    Override in a subclass to change the aggregate; the function must be associative.
+    """
+    return a + b
+
+  #--------------------- public methods for range aggregates ---------------------
+  def aggregate(self, start=None, stop=None):
+    """Return aggregate of values of all items such that start <= key < stop.
+
+    If start is None, the range begins with minimum key of map.
+    If stop is None, the range continues through the maximum key of map.
+    Return None if there are no such items.
+    """
+    node = self._root
+    while node is not None:                         # find the topmost node in range
+      key = node._element._key
+      if start is not None and key < start:
+        node = node._right
+      elif stop is not None and not key < stop:
+        node = node._left
+      else:
+        break
+    if node is None:
+      return None
+    if start is None:
+      left = node._left._aggregate if node._left is not None else None
+    else:
+      left = self._aggregate_from(node._left, start)
+    if stop is None:
+      right = node._right._aggregate if node._right is not None else None
+    else:
+      right = self._aggregate_before(node._right, stop)
+    return self._merge(self._merge(left, node._element._value), right)
+
+
+class MinTreeMap(AggregateTreeMap):
+  """AggregateTreeMap whose aggregate is the minimum value."""
+
+  def combine(self, a, b):
+    return a if not b < a else b
+
+
+class MaxTreeMap(AggregateTreeMap):
+  """AggregateTreeMap whose aggregate is the maximum value."""
+
+  def combine(self, a, b):
+    return a if not a < b else b
@@ -0,0 +1,732 @@
+from array import array
+from binary_search_tree import TreeMap
+from map_base import MapBase, RankedMapMixin, sorted_pairs
+from map_file import load_items, MappedTreeMap
+from map_merge import merge_items
+from tree_cursor import TreeCursor
+
+class ArrayAVLTreeMap(MapBase, RankedMapMixin):
+  """Sorted map implementation using an AVL tree stored as parallel arrays.
+
+  Each item occupies one slot, identified by an integer index, across a handful
+  of parallel arrays: keys and values (Python lists), and left child, right child,
+  parent, height, subtree size and stamp (compact typed arrays).  There are no
+  node or item objects, so an entry costs roughly 60 bytes plus its key and value.
+  Slots of deleted items are kept on a free list for reuse.
+
+  We use index -1 for a missing node.  As in AVLTreeMap, a missing child has
+  height 0, so a leaf has height 1.
+
+  The sorted map interface matches that of AVLTreeMap, including Positions,
+  cursors, batched lookups and updates, range deletion, split and join, set
+  operations, saving, freezing and the key filter.  A Position holds the index of
+  its slot and the stamp the slot was given when its item was added; as every
+  new item gets a fresh stamp, a Position whose item was removed is rejected even
+  after its slot has been reused.  The positional tree interface (root, parent,
+  children) is not offered.
+  """
+
+  _filter = None                          # optional BloomFilter of keys (see enable_filter)
+  _clock = 0                              # last stamp given to a slot, by any map
+
+  #-------------------------- nested Position class --------------------------
+  class Position:
+    """A handle on the item stored in one slot of an ArrayAVLTreeMap."""
+    __slots__ = '_container', '_index', '_stamp'
+
+    def __init__(self, container, index):
+      """Constructor should not be invoked by user."""
+      self._container = container
+      self._index = index
+      self._stamp = container._stamp[index]
+
+    def key(self):
+      """Return key of map's key-value pair."""
+      return self._container._keys[self._container._validate(self)]
+
+    def value(self):
+      """Return value of map's key-value pair."""
+      return self._container._values[self._container._validate(self)]
+
+    def __eq__(self, other):
+      """Return True if other is a Position representing the same item."""
+      return (type(other) is type(self) and other._container is self._container
+              and other._index == self._index and other._stamp == self._stamp)
+
+  #------------------------------- map constructor -------------------------------
+  def __init__(self, capacity=0):
+    """Create an empty map, preallocating slots for capacity items."""
+    self._keys = []
+    self._values = []
+    self._left = array('l')
+    self._right = array('l')
+    self._parent = array('l')
+    self._height = array('b')
+    self._count = array('l')              # number of items in subtree
+    self._stamp = array('q')              # 0 for a free slot
+    self._root = -1
+    self._size = 0
+    self._free = -1                       # head of free list, linked through _left
+    self._version = 0                     # changed whenever a slot changes its key
+    self._reserve(capacity)
+
+  #------------------------------- slot management -------------------------------
+  def _reserve(self, n):
+    """Add n slots to the free list."""
+    start = len(self._keys)
+    self._keys.extend([None] * n)
+    self._values.extend([None] * n)
+    for column in (self._left, self._right, self._parent, self._count):
+      column.extend([-1] * n)
+    self._height.extend([0] * n)
+    self._stamp.extend([0] * n)
+    for j in range(start + n - 1, start - 1, -1):   # chain new slots onto free list
+      self._left[j] = self._free
+      self._free = j
+
+  def _allocate(self, k, v, parent):
+    """Return index of a new leaf slot storing (k,v) below given parent."""
+    if self._free == -1:
+      self._reserve(max(16, len(self._keys)))       # grow geometrically
+    j = self._free
+    self._free = self._left[j]
+    self._keys[j] = k
+    self._values[j] = v
+    self._left[j] = self._right[j] = -1
+    self._parent[j] = parent
+    self._height[j] = 1
+    self._count[j] = 1
+    ArrayAVLTreeMap._clock += 1
+    self._stamp[j] = ArrayAVLTreeMap._clock       # distinguishes this item from earlier ones
+    return j
+
+  def _release(self, j):
+    """Return slot j to the free list."""
+    self._keys[j] = self._values[j] = None          # drop references
+    self._stamp[j] = 0                              # Positions of the item become invalid
+    self._left[j] = self._free
+    self._free = j
+
+  def _discard_slots(self, capacity=0):
+    """Replace all slots by capacity free ones; cursors re-seek and Positions become invalid."""
+    version = self._version
+    self.__init__(capacity)
+    self._version = version + 1
+
+  def _take_slots(self, other):
+    """Replace the slots of this map by those of other, leaving other empty."""
+    for name in ('_keys', '_values', '_left', '_right', '_parent', '_height', '_count', '_stamp'):
+      setattr(self, name, getattr(other, name))
+    self._root, self._size, self._free = other._root, other._size, other._free
+    self._version += 1
+    other._discard_slots()
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _validate(self, p):
+    """Return index of the slot of Position p, if it is valid."""
+    if not isinstance(p, self.Position):
+      raise TypeError('p must be proper Position type')
+    if p._container is not self:
+      raise ValueError('p does not belong to this container')
+    j = p._index
+    if j >= len(self._stamp) or self._stamp[j] != p._stamp:
+      raise ValueError('p is no longer valid')
+    return j
+
+  def _make_position(self, j):
+    """Return Position instance for given index (or None if j is -1)."""
+    return self.Position(self, j) if j != -1 else None
+
+  def _h(self, j):
+    return self._height[j] if j != -1 else 0
+
+  def _c(self, j):
+    return self._count[j] if j != -1 else 0
+
+  def _refresh(self, j):
+    left, right = self._left[j], self._right[j]
+    self._height[j] = 1 + max(self._h(left), self._h(right))
+    self._count[j] = 1 + self._c(left) + self._c(right)
+
+  def _search(self, k):
+    """Return index having key k, or last index searched (or -1 if empty)."""
+    keys, left, right = self._keys, self._left, self._right
+    j = self._root
+    while j != -1:
+      key = keys[j]
+      if k == key:
+        return j
+      child = left[j] if k < key else right[j]
+      if child == -1:
+        return j
+      j = child
+    return j
+
+  def _first(self, j):
+    while self._left[j] != -1:
+      j = self._left[j]
+    return j
+
+  def _last(self, j):
+    while self._right[j] != -1:
+      j = self._right[j]
+    return j
+
+  def _before(self, j):
+    """Return index just before j in the natural order (or -1)."""
+    if self._left[j] != -1:
+      return self._last(self._left[j])
+    above = self._parent[j]
+    while above != -1 and j == self._left[above]:
+      j, above = above, self._parent[above]
+    return above
+
+  def _after(self, j):
+    """Return index just after j in the natural order (or -1)."""
+    if self._right[j] != -1:
+      return self._first(self._right[j])
+    above = self._parent[j]
+    while above != -1 and j == self._right[above]:
+      j, above = above, self._parent[above]
+    return above
+
+  def _bound(self, k, forward, inclusive):
+    """Return index of the item nearest to k in the given direction (or -1)."""
+    j = self._search(k)
+    if j != -1:
+      key = self._keys[j]
+      if forward:
+        if key < k or (not inclusive and key == k):
+          j = self._after(j)
+      elif k < key or (not inclusive and key == k):
+        j = self._before(j)
+    return j
+
+  def _select_index(self, i):
+    """Return index of the item with the i-th smallest key (0 <= i < len(self))."""
+    j = self._root
+    while True:
+      left = self._c(self._left[j])
+      if i < left:
+        j = self._left[j]
+      elif i == left:
+        return j
+      else:
+        i -= left + 1
+        j = self._right[j]
+
+  def _pair(self, j):
+    return (self._keys[j], self._values[j]) if j != -1 else None
+
+  def _adjust_counts(self, j, delta):
+    while j != -1:
+      self._count[j] += delta
+      j = self._parent[j]
+
+  def _remove_index(self, j):
+    """Remove the item stored in slot j."""
+    self._version += 1                              # slot j loses (or changes) its key
+    if self._left[j] != -1 and self._right[j] != -1:  # j has two children
+      replacement = self._last(self._left[j])
+      self._keys[j] = self._keys[replacement]
+      self._values[j] = self._values[replacement]
+      j = replacement
+    # now j has at most one child
+    child = self._left[j] if self._left[j] != -1 else self._right[j]
+    parent = self._parent[j]
+    if child != -1:
+      self._parent[child] = parent
+    if parent == -1:
+      self._root = child
+    elif self._left[parent] == j:
+      self._left[parent] = child
+    else:
+      self._right[parent] = child
+    self._release(j)
+    self._size -= 1
+    self._adjust_counts(parent, -1)
+    self._rebalance(parent)
+    if self._filter is not None and len(self._filter) > 2 * len(self) + 64:
+      self.rebuild_filter()                         # mostly stale after deletions
+
+  #--------------------- nonpublic methods to support tree balancing ---------------------
+  def _rotate(self, x):
+    """Rotate index x above its parent (which must exist)."""
+    left, right, parent = self._left, self._right, self._parent
+    y = parent[x]
+    z = parent[y]
+    if z == -1:
+      self._root = x                                # x becomes root
+    elif left[z] == y:
+      left[z] = x
+    else:
+      right[z] = x
+    parent[x] = z
+    if left[y] == x:
+      middle = right[x]                             # x's right becomes left child of y
+      left[y] = middle
+      right[x] = y
+    else:
+      middle = left[x]                              # x's left becomes right child of y
+      right[y] = middle
+      left[x] = y
+    if middle != -1:
+      parent[middle] = y
+    parent[y] = x
+    self._refresh(y)
+    self._refresh(x)
+
+  def _restructure(self, x):
+    """Perform trinode restructure of index x with parent/grandparent; return new root."""
+    y = self._parent[x]
+    z = self._parent[y]
+    if (x == self._right[y]) == (y == self._right[z]):  # matching alignments
+      self._rotate(y)                                   # single rotation (of y)
+      return y
+    else:                                               # opposite alignments
+      self._rotate(x)                                   # double rotation (of x)
+      self._rotate(x)
+      return x
+
+  def _tall_child(self, j, favorleft=False):
+    left, right = self._left[j], self._right[j]
+    if self._h(left) + (1 if favorleft else 0) > self._h(right):
+      return left
+    return right
+
+  def _tall_grandchild(self, j):
+    child = self._tall_child(j)
+    # if child is on left, favor left grandchild; else favor right grandchild
+    return self._tall_child(child, child == self._left[j])
+
+  def _rebalance(self, j):
+    while j != -1:
+      old_height = self._height[j]
+      if abs(self._h(self._left[j]) - self._h(self._right[j])) > 1:   # imbalance detected!
+        j = self._restructure(self._tall_grandchild(j))
+      self._refresh(j)
+      if self._height[j] == old_height:                 # has height changed?
+        return                                          # no further changes needed
+      j = self._parent[j]
+
+  #--------------------- public methods providing "positional" support ---------------------
+  def first(self):
+    """Return the first Position in the map (or None if empty)."""
+    return self._make_position(self._first(self._root)) if self._root != -1 else None
+
+  def last(self):
+    """Return the last Position in the map (or None if empty)."""
+    return self._make_position(self._last(self._root)) if self._root != -1 else None
+
+  def before(self, p):
+    """Return the Position just before p in the natural order.
+
+    Return None if p is the first position.
+    """
+    return self._make_position(self._before(self._validate(p)))
+
+  def after(self, p):
+    """Return the Position just after p in the natural order.
+
+    Return None if p is the last position.
+    """
+    return self._make_position(self._after(self._validate(p)))
+
+  def find_position(self, k):
+    """Return position with key k, or else neighbor (or None if empty)."""
+    return self._make_position(self._search(k))
+
+  def delete(self, p):
+    """Remove the item at given Position."""
+    self._remove_index(self._validate(p))
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    return self._size
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    if self._filter is not None and k not in self._filter:
+      raise KeyError('Key Error: ' + repr(k))      # definitely absent
+    j = self._search(k)
+    if j == -1 or k != self._keys[j]:
+      raise KeyError('Key Error: ' + repr(k))
+    return self._values[j]
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    if self._filter is not None and k not in self._filter:
+      return False                               # definitely absent
+    j = self._search(k)
+    return j != -1 and k == self._keys[j]
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    j = self._search(k)
+    if j != -1 and k == self._keys[j]:
+      self._values[j] = v                           # replace existing item's value
+      return
+    if self._filter is not None:                    # every new key passes through here
+      self._filter_add(k)
+    if j == -1:
+      self._root = self._allocate(k, v, -1)
+    else:
+      leaf = self._allocate(k, v, j)
+      if k < self._keys[j]:
+        self._left[j] = leaf
+      else:
+        self._right[j] = leaf
+      self._adjust_counts(j, 1)
+      self._rebalance(j)
+    self._size += 1
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found)."""
+    j = self._search(k)
+    if j == -1 or k != self._keys[j]:
+      raise KeyError('Key Error: ' + repr(k))
+    self._remove_index(j)
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map in order."""
+    j = self._first(self._root) if self._root != -1 else -1
+    while j != -1:
+      yield self._keys[j]
+      j = self._after(j)
+
+  #--------------------- public methods for batched lookups ---------------------
+  def get_many(self, keys, default=None):
+    """Return list of the values associated with each of the given keys, in the same order.
+
+    default is reported for each key that is not in the map.  Each key is searched
+    from the root, so m lookups take O(m log n) time.
+    """
+    result = []
+    for k in keys:
+      j = self._search(k)
+      result.append(self._values[j] if j != -1 and k == self._keys[j] else default)
+    return result
+
+  def contains_many(self, keys):
+    """Return list of booleans reporting whether each of the given keys is in the map."""
+    return [k in self for k in keys]
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the map in reverse order."""
+    j = self._last(self._root) if self._root != -1 else -1
+    while j != -1:
+      yield self._keys[j]
+      j = self._before(j)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    return self._pair(self._first(self._root)) if self._root != -1 else None
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    return self._pair(self._last(self._root)) if self._root != -1 else None
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k (or None)."""
+    return self._pair(self._bound(k, False, True))
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k (or None)."""
+    return self._pair(self._bound(k, False, False))
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k (or None)."""
+    return self._pair(self._bound(k, True, True))
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k (or None)."""
+    return self._pair(self._bound(k, True, False))
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of map.
+    If stop is None, iteration continues through the maximum key of map.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    if self._root == -1:
+      return
+    if not reverse:
+      j = self._first(self._root) if start is None else self._bound(start, True, True)
+      while j != -1 and (stop is None or self._keys[j] < stop):
+        yield (self._keys[j], self._values[j])
+        j = self._after(j)
+    else:
+      j = self._last(self._root) if stop is None else self._bound(stop, False, False)
+      while j != -1 and (start is None or not self._keys[j] < start):
+        yield (self._keys[j], self._values[j])
+        j = self._before(j)
+
+  def cursor(self):
+    """Return a new ArrayTreeCursor over the map, positioned before its first item."""
+    return ArrayTreeCursor(self)
+
+  #--------------------- public methods for order statistics ---------------------
+  def rank(self, k):
+    """Return the number of keys in the map that are strictly less than k."""
+    count = 0
+    j = self._root
+    while j != -1:
+      if self._keys[j] < k:
+        count += 1 + self._c(self._left[j])
+        j = self._right[j]
+      else:
+        j = self._left[j]
+    return count
+
+  def select(self, i):
+    """Return (key,value) pair with the i-th smallest key (counting from 0).
+
+    Negative indices count from the end, as for a list.
+    Raise IndexError if i is out of range.
+    """
+    if i < 0:
+      i += len(self)
+    if not 0 <= i < len(self):
+      raise IndexError('Index out of range: ' + repr(i))
+    return self._pair(self._select_index(i))
+
+  #--------------------- public methods for bulk construction ---------------------
+  @classmethod
+  def from_sorted(cls, items):
+    """Return a new map holding the (key,value) pairs of items, built in linear time.
+
+    See bulk_load for a description of the accepted input.
+    """
+    tree = cls()
+    tree.bulk_load(items)
+    return tree
+
+  def bulk_load(self, items):
+    """Replace the contents of the map with the (key,value) pairs of items.
+
+    items may be a mapping or an iterable of (key,value) pairs.  When the pairs
+    are already in increasing key order the balanced tree is built in O(n) time;
+    otherwise they are sorted first.  For repeated keys the last value wins.
+    """
+    self._rebuild(sorted_pairs(items))
+
+  def update_sorted(self, items):
+    """Assign the values of all (key,value) pairs of items, as a batch.
+
+    items is interpreted as for bulk_load, and is sorted only once.  A batch of m
+    items that is small relative to the map is inserted item by item, in O(m log n)
+    time; a larger batch is merged with the in-order stream of the map and the
+    tree rebuilt, in O(n + m) time.  If a key cannot be compared with the others,
+    TypeError is raised and the map is left unchanged.
+    """
+    pairs = sorted_pairs(items)
+    if not pairs:
+      return
+    n = len(self)
+    if len(pairs) * n.bit_length() >= n:         # rebuilding is no more expensive
+      self._rebuild(list(merge_items(self.find_range(None, None), pairs, 'union')))
+    else:
+      self._search(pairs[0][0])                  # fail while the map is intact
+      self._search(pairs[-1][0])
+      for k, v in pairs:
+        self[k] = v
+
+  def _rebuild(self, pairs):
+    """Replace the contents of the map with the given (key,value) pairs, in strictly increasing key order."""
+    self._discard_slots(len(pairs))
+    self._root = self._build_subtree(pairs, 0, len(pairs), -1)
+    self._size = len(pairs)
+    self.rebuild_filter()
+
+  def _build_subtree(self, pairs, start, stop, parent):
+    """Return root index of a balanced subtree holding pairs[start:stop]."""
+    if start >= stop:
+      return -1
+    mid = (start + stop) // 2                    # median becomes subtree root
+    j = self._allocate(pairs[mid][0], pairs[mid][1], parent)
+    self._left[j] = self._build_subtree(pairs, start, mid, j)
+    self._right[j] = self._build_subtree(pairs, mid + 1, stop, j)
+    self._refresh(j)
+    return j
+
+  #--------------------- public methods for splitting and truncating maps ---------------------
+  def split(self, k):
+    """Split the map by key k and return the two halves as a (left,right) pair of maps.
+
+    left holds the items with keys less than k, and right those with keys greater
+    than or equal to k.  The larger half takes over the slots of this map, and the
+    smaller half, of m items, is moved to new slots, so this takes O(m log n) time
+    (and O(n) at most).  As a side effect, this map is set to empty, and Positions
+    of this map are no longer valid.  If a key filter is enabled, each half gets
+    its own, built in O(n) time.
+    """
+    r = self.rank(k)                                # fail while the map is intact
+    left, right = type(self)(), type(self)()
+    if r <= len(self) - r:                          # left half is the smaller
+      left._rebuild(list(self.find_range(None, k)))
+      self._delete_ranks(0, r)
+      right._take_slots(self)
+    else:
+      right._rebuild(list(self.find_range(k, None)))
+      self._delete_ranks(r, len(self))
+      left._take_slots(self)
+    if self._filter is not None:
+      self._split_filter(left, right)
+    return left, right
+
+  def join(self, other):
+    """Move all items of other into this map.
+
+    The keys of other must all be less than, or all be greater than, those of this
+    map.  The items of the smaller map are inserted into the larger one, whose
+    slots this map then holds, so this takes O(m log n) time for a smaller map of
+    m items (and O(n + m) at most).  As a side effect, other is set to empty, and
+    Positions of both maps may no longer be valid.
+    Raise TypeError if other does not match the type of this map.
+    Raise ValueError if the key ranges of the two maps overlap.
+    """
+    if type(self) is not type(other):
+      raise TypeError('Map types must match')
+    if other is self or len(other) == 0:
+      return
+    if len(self) > 0:
+      if not (self._keys[self._last(self._root)] < other._keys[other._first(other._root)] or
+              other._keys[other._last(other._root)] < self._keys[self._first(self._root)]):
+        raise ValueError('Key ranges overlap')
+    if len(other) <= len(self):
+      self.update_sorted(other.find_range(None, None))
+      other._discard_slots()
+    else:
+      added = list(other) if self._filter is not None else ()
+      other.update_sorted(self.find_range(None, None))
+      self._take_slots(other)
+      for k in added:                               # a rebuild on the way sees every key
+        self._filter_add(k)
+
+  #--------------------- public methods for truncating maps ---------------------
+  def delete_range(self, start, stop):
+    """Remove all items such that start <= key < stop, and return how many were removed.
+
+    If start is None, removal begins with minimum key of map.
+    If stop is None, removal continues through the maximum key of map.
+    Removing k items takes O(k log n) time when k is small relative to the map;
+    otherwise the tree is rebuilt from the remaining items, in O(n) time.
+    """
+    low = 0 if start is None else self.rank(start)
+    high = len(self) if stop is None else self.rank(stop)
+    return self._delete_ranks(low, high)
+
+  def truncate_before(self, k):
+    """Remove all items with keys strictly less than k; return how many were removed."""
+    return self.delete_range(None, k)
+
+  def truncate_after(self, k):
+    """Remove all items with keys strictly greater than k; return how many were removed."""
+    j = self._bound(k, True, False)
+    low = self.rank(self._keys[j]) if j != -1 else len(self)
+    return self._delete_ranks(low, len(self))
+
+  def _delete_ranks(self, low, high):
+    """Remove the items with ranks low through high-1; return how many were removed."""
+    count = high - low
+    if count <= 0:
+      return 0
+    n = len(self)
+    if count * n.bit_length() < n:               # cheaper than rebuilding
+      keys = []
+      j = self._select_index(low)
+      for r in range(count):
+        keys.append(self._keys[j])
+        j = self._after(j)
+      for k in keys:
+        del self[k]
+    else:
+      pairs = list(self.find_range(None, None))
+      del pairs[low:high]
+      self._rebuild(pairs)
+    return count
+
+  # bulk set operations, saving, freezing and the key filter depend only on the
+  # sorted map interface
+  union = TreeMap.union
+  intersection = TreeMap.intersection
+  difference = TreeMap.difference
+  symmetric_difference = TreeMap.symmetric_difference
+  save = TreeMap.save
+  freeze = TreeMap.freeze
+  enable_filter = TreeMap.enable_filter
+  disable_filter = TreeMap.disable_filter
+  rebuild_filter = TreeMap.rebuild_filter
+  key_filter = TreeMap.key_filter
+  _filter_add = TreeMap._filter_add
+  _split_filter = TreeMap._split_filter
+
+  @classmethod
+  def load(cls, path, mmap=True):
+    """Return a map with the items stored in the file at path, written by save.
+
+    If mmap is True, return a read-only MappedTreeMap (see TreeMap.load).
+    Otherwise return a new map of this class, built in linear time.
+    """
+    if mmap:
+      return MappedTreeMap(path)
+    return cls.from_sorted(load_items(path))
+
+
+class ArrayTreeCursor(TreeCursor):
+  """Bidirectional cursor over the items of an ArrayAVLTreeMap, in key order.
+
+  The cursor behaves as a TreeCursor.  Its path holds just the index of the
+  current item, as the parent links of the arrays lead to its neighbors.  It
+  re-seeks by key only if some slot has changed its key since the cursor last
+  moved (after a deletion, or a rebuild of the map).
+  """
+  __slots__ = ()
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _descend(self, k, forward, inclusive):
+    j = self._tree._bound(k, forward, inclusive)
+    self._settle([j] if j != -1 else [], forward)
+
+  def _extreme(self, forward):
+    tree = self._tree
+    path = []
+    if tree._root != -1:
+      path.append(tree._first(tree._root) if forward else tree._last(tree._root))
+    self._settle(path, not forward)
+
+  def _settle(self, path, forward):
+    self._path = path
+    self._past_end = forward
+    self._key = self._tree._keys[path[-1]] if path else None
+    self._version = self._tree._version
+
+  def _step(self, forward):
+    if not self._path:                            # off an end
+      if self._past_end != forward:               # re-enter from that end
+        self._extreme(forward)
+      return
+    tree = self._tree
+    j = tree._after(self._path[-1]) if forward else tree._before(self._path[-1])
+    self._settle([j] if j != -1 else [], forward)
+
+  def _pull(self, n, forward, extract):
+    self._sync(forward, True)
+    if not self._path and self._past_end != forward:   # about to enter from an end
+      self._extreme(forward)
+    tree = self._tree
+    result = []
+    while len(result) < n and self._path:
+      j = self._path[-1]
+      result.append(extract(tree._Item(tree._keys[j], tree._values[j])))
+      self._step(forward)
+    return result
+
+  #------------------------------- accessors -------------------------------
+  def item(self):
+    """Return (key,value) pair of the current item (or None if off an end)."""
+    self._sync(True, True)
+    return self._tree._pair(self._path[-1]) if self._path else None
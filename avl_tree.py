@@ -24,6 +24,8 @@ from binary_search_tree import TreeMap
 class AVLTreeMap(TreeMap):
   """Sorted map implementation using an AVL tree."""
 
+  _augmented = False              # does _refresh_node maintain data beyond sizes and heights?
+
   #-------------------------- nested _Node class --------------------------
   class _Node(TreeMap._Node):
     """Node class for AVL maintains height value for balancing.
@@ -44,7 +46,17 @@ class AVLTreeMap(TreeMap):
 
   #------------------------- positional-based utility methods -------------------------
   def _recompute_height(self, p):
-    p._node._height = 1 + max(p._node.left_height(), p._node.right_height())
+    self._refresh_node(p._node)
+
+  def _refresh_node(self, node):
+    super()._refresh_node(node)
+    node._height = 1 + max(node.left_height(), node.right_height())
+
+  def _refresh_path(self, node):
+    """Refresh node and each of its ancestors."""
+    while node is not None:
+      self._refresh_node(node)
+      node = node._parent
 
   def _isbalanced(self, p):
     return abs(p._node.left_height() - p._node.right_height()) <= 1
@@ -72,10 +84,60 @@ class AVLTreeMap(TreeMap):
         self._recompute_height(self.right(p))                           
       self._recompute_height(p)                             # adjust for recent changes
       if p._node._height == old_height:                     # has height changed?
+        if self._augmented:                                 # other data may change up to the root
+          self._refresh_path(p._node._parent)
         p = None                                            # no further changes needed
       else:
         p = self.parent(p)                                  # repeat with parent
 
+  #------------------------- node-level utilities for split and join -------------------------
+  def _node_height(self, node):
+    return node._height if node is not None else 0
+
+  def _rebalance_upward(self, node):
+    """Rebalance and refresh node and all of its ancestors; return root of the tree.
+
+    Unlike _rebalance, this does not stop early, as the caller may have altered
+    the sizes of the subtrees along the whole path.
+    """
+    root = None
+    while node is not None:
+      p = self._make_position(node)
+      if not self._isbalanced(p):                           # imbalance detected!
+        p = self._restructure(self._tall_grandchild(p))     # rotations refresh nodes
+      self._refresh_node(p._node)
+      root = p._node
+      node = root._parent
+    return root
+
+  def _join_nodes(self, left, mid, right):
+    """Join the detached trees rooted at left and right, with node mid between them.
+
+    All keys of left must be less than that of mid, which must be less than all
+    keys of right.  Return the root of the resulting tree.  Running time is
+    proportional to the difference in heights of the two trees.
+    """
+    left_height, right_height = self._node_height(left), self._node_height(right)
+    if left_height > right_height + 1:                # descend right spine of left
+      above, walk = None, left
+      while self._node_height(walk) > right_height + 1:
+        above, walk = walk, walk._right
+      self._relink(mid, walk, True)
+      self._relink(mid, right, False)
+      self._relink(above, mid, False)                 # mid replaces walk
+    elif right_height > left_height + 1:              # descend left spine of right
+      above, walk = None, right
+      while self._node_height(walk) > left_height + 1:
+        above, walk = walk, walk._left
+      self._relink(mid, left, True)
+      self._relink(mid, walk, False)
+      self._relink(above, mid, True)                  # mid replaces walk
+    else:                                             # heights are close enough
+      mid._parent = None
+      self._relink(mid, left, True)
+      self._relink(mid, right, False)
+    return self._rebalance_upward(mid)
+
   #---------------------------- override balancing hooks ----------------------------
   def _rebalance_insert(self, p):
     self._rebalance(p)
@@ -23,11 +23,18 @@ sys.path.append("../ch08")  # change to "..\ch08" for Windows
 sys.path.append("../ch10")  # change to "..\ch08" for Windows
 sys.path.append("..")
 from linked_binary_tree import LinkedBinaryTree
-from map_base import MapBase
-
-class TreeMap(LinkedBinaryTree, MapBase):
+from map_base import MapBase, RankedMapMixin, sorted_pairs
+from tree_cursor import TreeCursor
+from map_merge import merge_items, merge_maps
+from map_file import save_map, load_items, MappedTreeMap
+from frozen_map import FrozenTreeMap
+from bloom_filter import BloomFilter
+
+class TreeMap(LinkedBinaryTree, MapBase, RankedMapMixin):
   """Sorted map implementation using a binary search tree."""
 
+  _filter = None                  # optional BloomFilter of keys (see enable_filter)
+
   #---------------------------- override Position class ----------------------------
   class Position(LinkedBinaryTree.Position):
     def key(self):
@@ -41,233 +48,713 @@ class TreeMap(LinkedBinaryTree, MapBase):
   #------------------------------- nonpublic utilities -------------------------------
   def _subtree_search(self, p, k):
     """Return Position of p's subtree having key k, or last node searched."""
-    if k == p.key():                                   # found match
-      return p                                         
-    elif k < p.key():                                  # search left subtree
-      if self.left(p) is not None:
-        return self._subtree_search(self.left(p), k)   
-    else:                                              # search right subtree
-      if self.right(p) is not None:
-        return self._subtree_search(self.right(p), k)
-    return p                                           # unsucessful search
+    return self._make_position(self._node_search(p._node, k))
 
   def _subtree_first_position(self, p):
     """Return Position of first item in subtree rooted at p."""
-    walk = p
-    while self.left(walk) is not None:                 # keep walking left
-      walk = self.left(walk)
-    return walk
+    return self._make_position(self._node_first(p._node))
 
   def _subtree_last_position(self, p):
     """Return Position of last item in subtree rooted at p."""
-    walk = p
-    while self.right(walk) is not None:                # keep walking right
-      walk = self.right(walk)
-    return walk
-  
+    return self._make_position(self._node_last(p._node))
+
+  #---------------- nonpublic node-level utilities (no Position objects) ----------------
+  def _node_search(self, node, k):
+    """Return node of the subtree rooted at node having key k, or last node searched."""
+    while True:
+      key = node._element._key
+      if k == key:                                     # found match
+        return node
+      child = node._left if k < key else node._right   # search proper subtree
+      if child is None:                                # unsuccessful search
+        return node
+      node = child
+
+  def _node_first(self, node):
+    """Return first node in subtree rooted at node."""
+    while node._left is not None:                      # keep walking left
+      node = node._left
+    return node
+
+  def _node_last(self, node):
+    """Return last node in subtree rooted at node."""
+    while node._right is not None:                     # keep walking right
+      node = node._right
+    return node
+
+  def _node_before(self, node):
+    """Return node just before given node in the natural order (or None)."""
+    if node._left is not None:
+      return self._node_last(node._left)
+    above = node._parent                               # walk upward
+    while above is not None and node is above._left:
+      node = above
+      above = node._parent
+    return above
+
+  def _node_after(self, node):
+    """Return node just after given node in the natural order (or None)."""
+    if node._right is not None:
+      return self._node_first(node._right)
+    above = node._parent                               # walk upward
+    while above is not None and node is above._right:
+      node = above
+      above = node._parent
+    return above
+
+  def _find_node(self, k):
+    """Return node with key k, or else neighbor (or None if empty)."""
+    if self._root is None:
+      return None
+    node = self._node_search(self._root, k)
+    self._access_node(node)                            # hook for balanced tree subclasses
+    return node
+
+  def _node_pair(self, node):
+    """Return (key,value) pair stored at node (or None if node is None)."""
+    return (node._element._key, node._element._value) if node is not None else None
+
+  def _remove_node(self, node):
+    """Remove the item stored at node, as described for delete."""
+    if node._left is not None and node._right is not None:   # node has two children
+      replacement = self._node_last(node._left)
+      node._element = replacement._element
+      node = replacement
+    # now node has at most one child
+    parent = node._parent
+    self._delete_node(node)                            # inherited from LinkedBinaryTree
+    self._rebalance_delete(self._make_position(parent))   # if root deleted, parent is None
+    if self._filter is not None and len(self._filter) > 2 * len(self) + 64:
+      self.rebuild_filter()                            # mostly stale after deletions
+
   #--------------------- public methods providing "positional" support ---------------------
   def first(self):
     """Return the first Position in the tree (or None if empty)."""
-    return self._subtree_first_position(self.root()) if len(self) > 0 else None
+    return self._make_position(self._node_first(self._root)) if len(self) > 0 else None
 
   def last(self):
     """Return the last Position in the tree (or None if empty)."""
-    return self._subtree_last_position(self.root()) if len(self) > 0 else None
+    return self._make_position(self._node_last(self._root)) if len(self) > 0 else None
 
   def before(self, p):
     """Return the Position just before p in the natural order.
 
     Return None if p is the first position.
     """
-    self._validate(p)                            # inherited from LinkedBinaryTree
-    if self.left(p):
-      return self._subtree_last_position(self.left(p))
-    else:
-      # walk upward
-      walk = p
-      above = self.parent(walk)
-      while above is not None and walk == self.left(above):
-        walk = above
-        above = self.parent(walk)
-      return above
+    node = self._validate(p)                     # inherited from LinkedBinaryTree
+    return self._make_position(self._node_before(node))
 
   def after(self, p):
     """Return the Position just after p in the natural order.
 
     Return None if p is the last position.
     """
-    self._validate(p)                            # inherited from LinkedBinaryTree
-    if self.right(p):
-      return self._subtree_first_position(self.right(p))
-    else:
-      walk = p
-      above = self.parent(walk)
-      while above is not None and walk == self.right(above):
-        walk = above
-        above = self.parent(walk)
-      return above
+    node = self._validate(p)                     # inherited from LinkedBinaryTree
+    return self._make_position(self._node_after(node))
 
   def find_position(self, k):
     """Return position with key k, or else neighbor (or None if empty)."""
-    if self.is_empty():
-      return None
-    else:
-      p = self._subtree_search(self.root(), k)
-      self._rebalance_access(p)                  # hook for balanced tree subclasses
-      return p
+    return self._make_position(self._find_node(k))
 
   def delete(self, p):
     """Remove the item at given Position."""
-    self._validate(p)                            # inherited from LinkedBinaryTree
-    if self.left(p) and self.right(p):           # p has two children
-      replacement = self._subtree_last_position(self.left(p))
-      self._replace(p, replacement.element())    # from LinkedBinaryTree
-      p =  replacement
-    # now p has at most one child
-    parent = self.parent(p)
-    self._delete(p)                              # inherited from LinkedBinaryTree
-    self._rebalance_delete(parent)               # if root deleted, parent is None
-      
+    self._remove_node(self._validate(p))         # inherited from LinkedBinaryTree
+
   #--------------------- public methods for (standard) map interface ---------------------
   def __getitem__(self, k):
     """Return value associated with key k (raise KeyError if not found)."""
-    if self.is_empty():
+    if self._filter is not None and k not in self._filter:
+      raise KeyError('Key Error: ' + repr(k))      # definitely absent
+    node = self._find_node(k)
+    if node is None or k != node._element._key:
       raise KeyError('Key Error: ' + repr(k))
-    else:
-      p = self._subtree_search(self.root(), k)
-      self._rebalance_access(p)                  # hook for balanced tree subclasses
-      if k != p.key():
-        raise KeyError('Key Error: ' + repr(k))
-      return p.value()
+    return node._element._value
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    if self._filter is not None and k not in self._filter:
+      return False                               # definitely absent
+    node = self._find_node(k)
+    return node is not None and k == node._element._key
 
   def __setitem__(self, k, v):
     """Assign value v to key k, overwriting existing value if present."""
-    if self.is_empty():
+    if self._root is None:
       leaf = self._add_root(self._Item(k,v))     # from LinkedBinaryTree
     else:
-      p = self._subtree_search(self.root(), k)
-      if p.key() == k:
-        p.element()._value = v                   # replace existing item's value
-        self._rebalance_access(p)                # hook for balanced tree subclasses
+      node = self._node_search(self._root, k)
+      key = node._element._key
+      if key == k:
+        node._element._value = v                 # replace existing item's value
+        self._access_node(node)                  # hook for balanced tree subclasses
         return
       else:
-        item = self._Item(k,v)
-        if p.key() < k:
-          leaf = self._add_right(p, item)        # inherited from LinkedBinaryTree
-        else:
-          leaf = self._add_left(p, item)         # inherited from LinkedBinaryTree
+        child = self._add_child_node(node, self._Item(k,v), k < key)  # from LinkedBinaryTree
+        leaf = self._make_position(child)
     self._rebalance_insert(leaf)                 # hook for balanced tree subclasses
 
   def __delitem__(self, k):
     """Remove item associated with key k (raise KeyError if not found)."""
-    if not self.is_empty():
-      p = self._subtree_search(self.root(), k)
-      if k == p.key():
-        self.delete(p)                           # rely on positional version
+    if self._root is not None:
+      node = self._node_search(self._root, k)
+      if k == node._element._key:
+        self._remove_node(node)                  # rely on node-level version of delete
         return                                   # successful deletion complete
-      self._rebalance_access(p)                  # hook for balanced tree subclasses
+      self._access_node(node)                    # hook for balanced tree subclasses
     raise KeyError('Key Error: ' + repr(k))
 
   def __iter__(self):
     """Generate an iteration of all keys in the map in order."""
-    p = self.first()
-    while p is not None:
-      yield p.key()
-      p = self.after(p)
+    node = self._node_first(self._root) if self._root is not None else None
+    while node is not None:
+      yield node._element._key
+      node = self._node_after(node)
+
+  #--------------------- public methods for batched lookups ---------------------
+  def get_many(self, keys, default=None):
+    """Return list of the values associated with each of the given keys, in the same order.
+
+    default is reported for each key that is not in the map.  The keys are looked
+    up in sorted order, each search starting from where the previous one ended,
+    so m lookups take roughly O(m log(n/m)) time rather than O(m log n).
+    """
+    return [node._element._value if node is not None else default
+            for node in self._node_sweep(keys)]
+
+  def contains_many(self, keys):
+    """Return list of booleans reporting whether each of the given keys is in the map."""
+    return [node is not None for node in self._node_sweep(keys)]
+
+  def _node_sweep(self, keys):
+    """Return list of the nodes having each of the given keys (None if absent), in same order.
+
+    The rebalancing hooks are not called, so the tree is not modified.
+    """
+    keys = list(keys)
+    result = [None] * len(keys)
+    if self._root is None:
+      return result
+    node = self._root
+    for j in sorted(range(len(keys)), key=keys.__getitem__):
+      k = keys[j]
+      if k != node._element._key:                # else repeated key, found again
+        # climb to the nearest subtree whose key range includes k (the previous key
+        # is at least its lower bound); subtree of a left child ends below its parent
+        while node._parent is not None and not (node is node._parent._left
+                                                and k < node._parent._element._key):
+          node = node._parent
+        node = self._node_search(node, k)
+      if k == node._element._key:
+        result[j] = node
+    return result
 
   #--------------------- public methods for sorted map interface ---------------------
   def __reversed__(self):
     """Generate an iteration of all keys in the map in reverse order."""
-    p = self.last()
-    while p is not None:
-      yield p.key()
-      p = self.before(p)
+    node = self._node_last(self._root) if self._root is not None else None
+    while node is not None:
+      yield node._element._key
+      node = self._node_before(node)
 
   def find_min(self):
     """Return (key,value) pair with minimum key (or None if empty)."""
     if self.is_empty():
       return None
     else:
-      p = self.first()
-      return (p.key(), p.value())
+      return self._node_pair(self._node_first(self._root))
 
   def find_max(self):
     """Return (key,value) pair with maximum key (or None if empty)."""
     if self.is_empty():
       return None
     else:
-      p = self.last()
-      return (p.key(), p.value())
+      return self._node_pair(self._node_last(self._root))
 
   def find_le(self, k):
     """Return (key,value) pair with greatest key less than or equal to k.
 
     Return None if there does not exist such a key.
     """
-    if self.is_empty():
-      return None
-    else:
-      p = self.find_position(k)
-      if k < p.key():
-        p = self.before(p)
-      return (p.key(), p.value()) if p is not None else None
+    node = self._find_node(k)
+    if node is not None and k < node._element._key:
+      node = self._node_before(node)
+    return self._node_pair(node)
 
   def find_lt(self, k):
     """Return (key,value) pair with greatest key strictly less than k.
 
     Return None if there does not exist such a key.
     """
-    if self.is_empty():
-      return None
-    else:
-      p = self.find_position(k)
-      if not p.key() < k:
-        p = self.before(p)
-      return (p.key(), p.value()) if p is not None else None
+    node = self._find_node(k)
+    if node is not None and not node._element._key < k:
+      node = self._node_before(node)
+    return self._node_pair(node)
 
   def find_ge(self, k):
     """Return (key,value) pair with least key greater than or equal to k.
 
     Return None if there does not exist such a key.
     """
-    if self.is_empty():
-      return None
-    else:
-      p = self.find_position(k)                   # may not find exact match
-      if p.key() < k:                             # p's key is too small
-        p = self.after(p)
-      return (p.key(), p.value()) if p is not None else None
+    node = self._find_node(k)                      # may not find exact match
+    if node is not None and node._element._key < k:   # node's key is too small
+      node = self._node_after(node)
+    return self._node_pair(node)
 
   def find_gt(self, k):
     """Return (key,value) pair with least key strictly greater than k.
 
     Return None if there does not exist such a key.
     """
-    if self.is_empty():
-      return None
-    else:
-      p = self.find_position(k)
-      if not k < p.key():                   
-        p = self.after(p)
-      return (p.key(), p.value()) if p is not None else None
-  
-  def find_range(self, start, stop):
+    node = self._find_node(k)
+    if node is not None and not k < node._element._key:
+      node = self._node_after(node)
+    return self._node_pair(node)
+
+  def find_range(self, start, stop, reverse=False):
     """Iterate all (key,value) pairs such that start <= key < stop.
 
     If start is None, iteration begins with minimum key of map.
     If stop is None, iteration continues through the maximum key of map.
+    If reverse is True, the pairs are reported in decreasing order of key.
     """
-    if not self.is_empty():
+    if reverse:
+      for pair in self._find_range_reversed(start, stop):
+        yield pair
+    elif not self.is_empty():
       if start is None:
-        p = self.first()
+        node = self._node_first(self._root)
+      else:
+        # we initialize node with logic similar to find_ge
+        node = self._find_node(start)
+        if node._element._key < start:
+          node = self._node_after(node)
+      while node is not None and (stop is None or node._element._key < stop):
+        yield (node._element._key, node._element._value)
+        node = self._node_after(node)
+
+  def _find_range_reversed(self, start, stop):
+    """Iterate pairs described for find_range in decreasing order of key."""
+    if not self.is_empty():
+      if stop is None:
+        node = self._node_last(self._root)
       else:
-        # we initialize p with logic similar to find_ge
-        p = self.find_position(start)
-        if p.key() < start:
-          p = self.after(p)
-      while p is not None and (stop is None or p.key() < stop):
-        yield (p.key(), p.value())
-        p = self.after(p)
+        # we initialize node with logic similar to find_lt
+        node = self._find_node(stop)
+        if not node._element._key < stop:
+          node = self._node_before(node)
+      while node is not None and (start is None or not node._element._key < start):
+        yield (node._element._key, node._element._value)
+        node = self._node_before(node)
+
+  def cursor(self):
+    """Return a new TreeCursor over the map, positioned before its first item."""
+    return TreeCursor(self)
+
+  #--------------------- public methods for order statistics ---------------------
+  def rank(self, k):
+    """Return the number of keys in the map that are strictly less than k."""
+    count = 0
+    node = self._root
+    while node is not None:
+      if node._element._key < k:                 # node and its left subtree count
+        count += 1 + node.left_size()
+        node = node._right
+      else:
+        node = node._left
+    return count
+
+  def select(self, i):
+    """Return (key,value) pair with the i-th smallest key (counting from 0).
+
+    Negative indices count from the end, as for a list.
+    Raise IndexError if i is out of range.
+    """
+    if i < 0:
+      i += len(self)
+    if not 0 <= i < len(self):
+      raise IndexError('Index out of range: ' + repr(i))
+    node = self._root
+    while True:
+      left = node.left_size()
+      if i < left:                               # answer is in left subtree
+        node = node._left
+      elif i == left:                            # answer is node itself
+        return (node._element._key, node._element._value)
+      else:                                      # skip left subtree and node
+        i -= left + 1
+        node = node._right
+
+  #--------------------- public methods for bulk construction ---------------------
+  @classmethod
+  def from_sorted(cls, items):
+    """Return a new map holding the (key,value) pairs of items, built in linear time.
+
+    See bulk_load for a description of the accepted input.
+    """
+    tree = cls()
+    tree.bulk_load(items)
+    return tree
+
+  def bulk_load(self, items):
+    """Replace the contents of the map with the (key,value) pairs of items.
+
+    items may be a mapping or an iterable of (key,value) pairs.  When the pairs
+    are already in increasing key order the perfectly balanced tree is built in
+    O(n) time; otherwise they are sorted first.  For repeated keys the last value
+    wins, matching repeated calls to __setitem__.  The rebalancing hooks are not
+    called, as the resulting tree is balanced by construction.
+    """
+    unique = sorted_pairs(items)
+    self._deprecate_subtree(self._root)
+    self._reset_root(self._build_subtree(unique, 0, len(unique), None))
+    self.rebuild_filter()
+
+  def update_sorted(self, items):
+    """Assign the values of all (key,value) pairs of items, as a batch.
+
+    items is interpreted as for bulk_load (the last value wins for repeated keys),
+    and is sorted only once.  A batch of m items that is small relative to the map
+    is merged in by splitting and joining subtrees, in O(m log(n/m + 1)) time for
+    AVLTreeMap; a larger batch is merged with the in-order stream of the map and
+    the tree rebuilt, in O(n + m) time.  Positions of the map are no longer valid.
+    If a key cannot be compared with the others, TypeError is raised and the map
+    is left unchanged.
+    """
+    pairs = sorted_pairs(items)
+    if not pairs:
+      return
+    n = len(self)
+    if len(pairs) * n.bit_length() >= n:         # rebuilding is no more expensive
+      merged = list(merge_items(self.find_range(None, None), pairs, 'union'))
+      self._deprecate_subtree(self._root)
+      self._reset_root(self._build_subtree(merged, 0, len(merged), None))
+      self.rebuild_filter()
+    else:
+      self._compare_keys(pairs[0][0], pairs[-1][0])   # fail while the map is intact
+      root = self._root
+      self._reset_root(None)                     # rotations below may touch _root
+      added = []                                 # keys new to the map
+      self._reset_root(self._merge_nodes(root, pairs, 0, len(pairs), added))
+      if self._filter is not None:
+        for k in added:
+          self._filter_add(k)
+
+  #----------------- public methods for saving, loading and freezing maps -----------------
+  def save(self, path):
+    """Write the items of the map to a compact binary file at path (see map_file).
+
+    Keys and values must be picklable.
+    """
+    save_map(self, path)
+
+  @classmethod
+  def load(cls, path, mmap=True):
+    """Return a map with the items stored in the file at path, written by save.
+
+    If mmap is True, return a read-only MappedTreeMap that answers queries directly
+    from a memory map of the file, without reading it all.  Otherwise return a new
+    map of this class, built in linear time.  Only load files from trusted sources.
+    """
+    if mmap:
+      return MappedTreeMap(path)
+    return cls.from_sorted(load_items(path))
+
+  def freeze(self):
+    """Return an immutable FrozenTreeMap with the current items of the map, in O(n) time.
+
+    The frozen map stores keys and values in sorted arrays, which makes lookups
+    (in particular batches of them, with get_many) cheaper than in the tree.
+    """
+    return FrozenTreeMap(self.find_range(None, None))
+
+  #--------------------- public methods for the key filter ---------------------
+  def enable_filter(self, error_rate=0.01, capacity=None):
+    """Maintain a Bloom filter of the keys, so that most lookups of absent keys skip the search.
+
+    The filter is sized for capacity keys (by default, twice the current number)
+    at the given false positive rate.  It is rebuilt larger once more keys have
+    been added, and rebuilt from scratch once deletions have left it mostly stale.
+    Keys must be hashable.
+    """
+    if capacity is None:
+      capacity = max(2 * len(self), 64)
+    self._filter = BloomFilter(capacity, error_rate)
+    for k in self:
+      self._filter.add(k)
+
+  def disable_filter(self):
+    """Stop maintaining a Bloom filter of the keys."""
+    self._filter = None
+
+  def rebuild_filter(self, capacity=None):
+    """Rebuild the filter from the current keys (no effect if no filter is enabled)."""
+    if self._filter is not None:
+      self.enable_filter(self._filter.error_rate(), capacity)
+
+  def key_filter(self):
+    """Return the BloomFilter of keys (or None if not enabled).
+
+    Its false_positive_rate and memory_usage methods help to size it.
+    """
+    return self._filter
+
+  def _filter_add(self, k):
+    """Add key k to the filter, first rebuilding the filter larger if it is full."""
+    if len(self._filter) >= self._filter.capacity():
+      self.rebuild_filter(2 * (len(self) + 1))
+    self._filter.add(k)
+
+  def _split_filter(self, left, right):
+    """Give the halves left and right of a split a filter of their own keys, emptying this one."""
+    error_rate = self._filter.error_rate()
+    left.enable_filter(error_rate)
+    right.enable_filter(error_rate)
+    self.rebuild_filter()
+
+  def _add_root(self, e):
+    if self._filter is not None:                 # every new key passes through here
+      self._filter_add(e._key)
+    return super()._add_root(e)
+
+  def _add_child_node(self, node, e, make_left_child):
+    if self._filter is not None:                 # ... or through here
+      self._filter_add(e._key)
+    return super()._add_child_node(node, e, make_left_child)
+
+  #--------------------- public methods for bulk set operations ---------------------
+  def union(self, other, combine=None, processes=None):
+    """Return a new map with the items whose keys are in this map or in other.
+
+    For a key in both maps the value is combine(self_value, other_value), or the
+    value from other if combine is None.  If processes is greater than 1, the work
+    is split among that many worker processes, which read the items of both maps
+    from map files (see map_merge.merge_maps).  Runs in O(n + m) time.
+    """
+    return type(self).from_sorted(merge_maps(self, other, 'union', combine, processes))
+
+  def intersection(self, other, combine=None, processes=None):
+    """Return a new map with the items whose keys are in both this map and other.
+
+    Values are determined as described for union.
+    """
+    return type(self).from_sorted(merge_maps(self, other, 'intersection', combine, processes))
+
+  def difference(self, other, processes=None):
+    """Return a new map with the items of this map whose keys are not in other."""
+    return type(self).from_sorted(merge_maps(self, other, 'difference', None, processes))
+
+  def symmetric_difference(self, other, processes=None):
+    """Return a new map with the items whose keys are in exactly one of the two maps."""
+    return type(self).from_sorted(merge_maps(self, other, 'symmetric_difference', None, processes))
+
+  def _reset_root(self, node):
+    """Make node (possibly None) the root, replacing the current contents of the map."""
+    if node is not None:
+      node._parent = None
+    self._root = node
+    self._size = node._size if node is not None else 0
+    self._version += 1
+
+  def _build_subtree(self, pairs, start, stop, parent):
+    """Return root node of a balanced subtree holding pairs[start:stop]."""
+    if start >= stop:
+      return None
+    mid = (start + stop) // 2                    # median becomes subtree root
+    node = self._Node(self._Item(*pairs[mid]), parent)
+    node._left = self._build_subtree(pairs, start, mid, node)
+    node._right = self._build_subtree(pairs, mid + 1, stop, node)
+    self._refresh_node(node)                     # children are complete
+    return node
+
+  #--------------------- public methods for splitting and truncating maps ---------------------
+  def split(self, k):
+    """Split the map by key k and return the two halves as a (left,right) pair of maps.
+
+    left holds the items with keys less than k, and right those with keys greater
+    than or equal to k.  Runs in time proportional to the height of the tree, so
+    O(log n) for AVLTreeMap; if a key filter is enabled, each half gets its own,
+    built in O(n) time.  As a side effect, this map is set to empty, and
+    Positions of this map are no longer valid.
+    """
+    self._compare_keys(k)
+    root = self._root
+    self._reset_root(None)                          # rotations below may touch _root
+    below, beyond = self._split_nodes(root, k)
+    left, right = type(self)(), type(self)()
+    left._reset_root(below)
+    right._reset_root(beyond)
+    self._reset_root(None)
+    if self._filter is not None:
+      self._split_filter(left, right)
+    return left, right
+
+  def join(self, other):
+    """Move all items of other into this map.
+
+    The keys of other must all be less than, or all be greater than, those of this
+    map.  Runs in time proportional to the heights of the trees, so O(log n) for
+    AVLTreeMap.  As a side effect, other is set to empty.
+    Raise TypeError if other does not match the type of this map.
+    Raise ValueError if the key ranges of the two maps overlap.
+    """
+    if type(self) is not type(other):
+      raise TypeError('Map types must match')
+    if other is self or other.is_empty():
+      return
+    added = list(other) if self._filter is not None else ()
+    if self.is_empty():
+      root = other._root
+      other._reset_root(None)
+    else:
+      if self._node_last(self._root)._element < self._node_first(other._root)._element:
+        low, high = self, other
+      elif other._node_last(other._root)._element < self._node_first(self._root)._element:
+        low, high = other, self
+      else:
+        raise ValueError('Key ranges overlap')
+      root = self._concat_nodes(low._root, high._root)
+      low._reset_root(None)
+      high._reset_root(None)
+    self._reset_root(root)
+    for k in added:                                 # a rebuild on the way sees every key
+      self._filter_add(k)
+
+  def delete_range(self, start, stop):
+    """Remove all items such that start <= key < stop, and return how many were removed.
+
+    If start is None, removal begins with minimum key of map.
+    If stop is None, removal continues through the maximum key of map.
+    Cutting out the range takes time proportional to the height of the tree, so
+    O(log n) for AVLTreeMap; marking the Positions of the k removed items as no
+    longer valid takes O(k) more.
+    """
+    self._compare_keys(start, stop)
+    root = self._root
+    self._reset_root(None)                          # rotations below may touch _root
+    if start is None:
+      below, rest = None, root
+    else:
+      below, rest = self._split_nodes(root, start)
+    if stop is None:
+      middle, beyond = rest, None
+    else:
+      middle, beyond = self._split_nodes(rest, stop)
+    self._reset_root(self._concat_nodes(below, beyond))
+    return self._deprecate_subtree(middle)
+
+  def truncate_before(self, k):
+    """Remove all items with keys strictly less than k; return how many were removed."""
+    return self.delete_range(None, k)
+
+  def truncate_after(self, k):
+    """Remove all items with keys strictly greater than k; return how many were removed."""
+    self._compare_keys(k)
+    root = self._root
+    self._reset_root(None)
+    below, beyond = self._split_nodes(root, k, True)
+    self._reset_root(below)
+    return self._deprecate_subtree(beyond)
+
+  #------------------- nonpublic node-level utilities for split and join -------------------
+  def _compare_keys(self, *keys):
+    """Compare each given key (other than None) with keys of the tree.
+
+    Called before the root is detached, so that a key that cannot be compared
+    with those of the tree raises TypeError while the map is still intact.
+    """
+    if self._root is not None:
+      for k in keys:
+        if k is not None:
+          self._node_search(self._root, k)
+
+  def _deprecate_subtree(self, node):
+    """Mark all nodes of the detached subtree at node as deprecated; return how many."""
+    count = 0
+    stack = [node] if node is not None else []
+    while stack:
+      node = stack.pop()
+      for child in (node._left, node._right):
+        if child is not None:
+          stack.append(child)
+      node._parent = node                           # convention for deprecated node
+      count += 1
+    return count
+
+  def _join_nodes(self, left, mid, right):
+    """Join the detached trees rooted at left and right, with node mid between them.
+
+    All keys of left must be less than that of mid, which must be less than all
+    keys of right.  Return the root of the resulting tree.
+    """
+    mid._parent = None
+    self._relink(mid, left, True)
+    self._relink(mid, right, False)
+    self._refresh_node(mid)
+    return mid
+
+  def _split_nodes(self, node, k, inclusive=False):
+    """Split the detached tree rooted at node by key k.
+
+    Return roots of the trees of keys less than k and of keys greater than or equal
+    to k.  If inclusive is True, a key equal to k goes to the first tree instead.
+    """
+    path = []                                         # (node, goes left, kept subtree)
+    while node is not None:
+      left, right = node._left, node._right
+      for child in (left, right):                     # detach both subtrees
+        if child is not None:
+          child._parent = None
+      node._left = node._right = None
+      key = node._element._key
+      if key < k or (inclusive and key == k):         # node and left subtree go left
+        path.append((node, True, left))
+        node = right
+      else:                                           # node and right subtree go right
+        path.append((node, False, right))
+        node = left
+    below = beyond = None
+    for node, goes_left, kept in reversed(path):      # reassemble from the bottom up
+      if goes_left:
+        below = self._join_nodes(kept, node, below)
+      else:
+        beyond = self._join_nodes(beyond, node, kept)
+    return below, beyond
+
+  def _merge_nodes(self, node, pairs, start, stop, added):
+    """Return root of the detached tree at node, updated with sorted pairs[start:stop].
+
+    Keys not previously in the tree are appended to the list added.
+    """
+    if start >= stop:
+      return node
+    if node is None:
+      added.extend(k for k, v in pairs[start:stop])
+      return self._build_subtree(pairs, start, stop, None)
+    mid = (start + stop) // 2                       # median pair goes between the halves
+    k, v = pairs[mid]
+    below, beyond = self._split_nodes(node, k)
+    match, beyond = self._split_nodes(beyond, k, True)
+    if match is None:
+      match = self._Node(self._Item(k, v))
+      added.append(k)
+    else:
+      match._element = self._Item(k, v)             # item may be shared (see PersistentAVLTreeMap)
+    below = self._merge_nodes(below, pairs, start, mid, added)
+    beyond = self._merge_nodes(beyond, pairs, mid + 1, stop, added)
+    return self._join_nodes(below, match, beyond)
+
+  def _concat_nodes(self, left, right):
+    """Return root of the tree joining detached trees left and right (or None if both empty).
+
+    All keys of left must be less than all keys of right.
+    """
+    if left is None:
+      return right
+    if right is None:
+      return left
+    last = self._node_last(left)._element._key      # detach last node of left
+    rest, last = self._split_nodes(left, last)
+    return self._join_nodes(rest, last, right)
 
   #--------------------- hooks used by subclasses to balance a tree ---------------------
   def _rebalance_insert(self, p):
@@ -278,8 +765,12 @@ class TreeMap(LinkedBinaryTree, MapBase):
     """Call to indicate that a child of p has been removed."""
     pass
 
-  def _rebalance_access(self, p):
-    """Call to indicate that position p was recently accessed."""
+  def _access_node(self, node):
+    """Call to indicate that node was recently accessed.
+
+    The hook takes a node rather than a Position, so that lookups create no
+    Position unless a subclass (such as SplayTreeMap) needs one.
+    """
     pass
 
   #--------------------- nonpublic methods to support tree balancing ---------------------
@@ -322,6 +813,9 @@ class TreeMap(LinkedBinaryTree, MapBase):
     else:
       self._relink(y, x._left, False)             # x._left becomes right child of y
       self._relink(x, y, True)                    # y becomes left child of x
+    self._refresh_node(y)                         # y is now below x
+    self._refresh_node(x)
+    self._version += 1
 
   def _restructure(self, x):
     """Perform a trinode restructure among Position x, its parent, and its grandparent.
@@ -0,0 +1,162 @@
+"""Bloom filter for ruling out keys that are definitely absent, used by TreeMap and LSMStore."""
+
+import datetime
+import hashlib
+import math
+import numbers
+import struct
+
+_MASK = (1 << 64) - 1
+_HEADER = struct.Struct('<4sQQQQd')      # magic, bits, hashes, count, capacity, error rate
+
+def _mix(h):
+  """Return 64-bit scrambling of integer h (splitmix64 finalizer)."""
+  h &= _MASK
+  h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & _MASK
+  h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & _MASK
+  return h ^ (h >> 31)
+
+def _packed_hashes(parts):
+  """Return bytes holding the stable hashes of parts, in the given order."""
+  return b''.join(struct.pack('<Q', h) for h in parts)
+
+def stable_hash(key):
+  """Return a hash of key that is the same in every process, for filters saved to disk.
+
+  Numbers keep their built-in hash, which is computed the same way in every
+  process (and agrees between equal numbers of different types).  The built-in
+  hash of most other types is randomized per process, so str, bytes, None, dates
+  and times, tuples and frozensets are encoded explicitly and hashed with blake2b,
+  keys that compare equal being encoded alike.
+  Raise TypeError for a key of any other type.
+  """
+  if isinstance(key, numbers.Number):
+    return hash(key)
+  if isinstance(key, str):
+    data = key.encode('utf-8', 'surrogatepass')
+  elif isinstance(key, (bytes, bytearray)):
+    data = bytes(key)
+  elif isinstance(key, tuple):
+    data = _packed_hashes(stable_hash(part) & _MASK for part in key)
+  elif isinstance(key, (frozenset, set)):                # equal sets, whatever their order
+    data = b'set:' + _packed_hashes(sorted(stable_hash(part) & _MASK for part in key))
+  elif key is None:
+    data = b'none:'
+  elif isinstance(key, datetime.datetime):
+    if key.utcoffset() is not None:                      # aware times are equal by instant
+      data = b'utc:' + (key.replace(tzinfo=None) - key.utcoffset()).isoformat().encode('ascii')
+    else:
+      data = b'datetime:' + key.isoformat().encode('ascii')
+  elif isinstance(key, datetime.date):
+    data = b'date:' + key.isoformat().encode('ascii')
+  elif isinstance(key, datetime.time):
+    if key.utcoffset() is not None:
+      micros = ((key.hour * 60 + key.minute) * 60 + key.second) * 10**6 + key.microsecond
+      micros -= key.utcoffset() // datetime.timedelta(microseconds=1)
+      data = b'utctime:%d' % micros
+    else:
+      data = b'time:' + key.isoformat().encode('ascii')
+  elif isinstance(key, datetime.timedelta):
+    data = b'timedelta:%d:%d:%d' % (key.days, key.seconds, key.microseconds)
+  else:
+    raise TypeError('No stable hash for keys of type ' + type(key).__name__)
+  return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class BloomFilter:
+  """Set-like filter reporting whether a key may have been added, in O(1) space per key.
+
+  A filter never reports an added key as absent, but may report an absent key
+  as present (a false positive), with a probability of about error_rate while
+  no more than capacity keys have been added.  Keys cannot be removed.
+  """
+
+  def __init__(self, capacity, error_rate=0.01, hash=hash):
+    """Create an empty filter sized for capacity keys at the given false positive rate.
+
+    hash is the function used to hash keys (see stable_hash).
+    Raise ValueError if error_rate is not strictly between 0 and 1.
+    """
+    if not 0 < error_rate < 1:
+      raise ValueError('error_rate must be between 0 and 1')
+    capacity = max(capacity, 1)
+    self._capacity = capacity
+    self._error_rate = error_rate
+    self._hash = hash
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    self._bits = max(bits, 8)
+    self._hashes = max(1, round(self._bits / capacity * math.log(2)))
+    self._array = bytearray((self._bits + 7) // 8)
+    self._count = 0                       # number of keys added
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _positions(self, key):
+    """Generate the bit positions for key (by double hashing)."""
+    h = _mix(self._hash(key))
+    step = (h >> 32) | 1
+    h &= 0xffffffff
+    for j in range(self._hashes):
+      yield (h + j * step) % self._bits
+
+  #------------------------------- public methods -------------------------------
+  def add(self, key):
+    """Add key to the filter."""
+    array = self._array
+    for bit in self._positions(key):
+      array[bit >> 3] |= 1 << (bit & 7)
+    self._count += 1
+
+  def __contains__(self, key):
+    """Return False if key was definitely not added, and True if it may have been."""
+    array = self._array
+    for bit in self._positions(key):
+      if not array[bit >> 3] & (1 << (bit & 7)):
+        return False
+    return True
+
+  def __len__(self):
+    """Return number of keys added (counting repeated additions of a key)."""
+    return self._count
+
+  def capacity(self):
+    """Return number of keys for which the filter was sized."""
+    return self._capacity
+
+  def error_rate(self):
+    """Return the false positive rate for which the filter was sized."""
+    return self._error_rate
+
+  def false_positive_rate(self):
+    """Return the estimated probability that an absent key is reported as present.
+
+    The estimate is based on the fraction of bits currently set.
+    """
+    ones = sum(bin(byte).count('1') for byte in self._array)
+    return (ones / self._bits) ** self._hashes
+
+  def memory_usage(self):
+    """Return number of bytes used by the bit array."""
+    return len(self._array)
+
+  def to_bytes(self):
+    """Return a bytes representation of the filter, which from_bytes reconstructs."""
+    header = _HEADER.pack(b'BLMF', self._bits, self._hashes, self._count,
+                          self._capacity, self._error_rate)
+    return header + bytes(self._array)
+
+  @classmethod
+  def from_bytes(cls, data, hash=hash):
+    """Return filter represented by data, created by to_bytes with the same hash function.
+
+    Raise ValueError if data does not represent a filter.
+    """
+    if len(data) < _HEADER.size:
+      raise ValueError('not a Bloom filter')
+    magic, bits, hashes, count, capacity, error_rate = _HEADER.unpack_from(data, 0)
+    if magic != b'BLMF' or len(data) != _HEADER.size + (bits + 7) // 8:
+      raise ValueError('not a Bloom filter')
+    bloom = cls.__new__(cls)
+    bloom._capacity, bloom._error_rate, bloom._hash = capacity, error_rate, hash
+    bloom._bits, bloom._hashes, bloom._count = bits, hashes, count
+    bloom._array = bytearray(data[_HEADER.size:])
+    return bloom
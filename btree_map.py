@@ -0,0 +1,356 @@
+from bisect import bisect_left, bisect_right
+from map_base import MapBase
+
+class BTreeMap(MapBase):
+  """Sorted map implementation using an in-memory B+ tree.
+
+  Items are stored in leaves holding up to order keys (and values) in Python
+  lists, searched with bisect.  Leaves are linked in both directions, so ordered
+  iteration never revisits internal nodes.  Internal nodes hold up to order
+  children, separated by keys such that children[j] holds keys less than keys[j]
+  and children[j+1] holds keys greater than or equal to keys[j].
+
+  Compared with TreeMap, a search visits O(log n / log order) nodes and each
+  item costs two list slots rather than a node and an item object.
+  """
+
+  #-------------------------- nested node classes --------------------------
+  class _Leaf:
+    """Lightweight, nonpublic class for storing a leaf of the tree."""
+    __slots__ = '_keys', '_values', '_prev', '_next'
+
+    def __init__(self, keys, values, prev=None, next=None):
+      self._keys = keys
+      self._values = values
+      self._prev = prev
+      self._next = next
+
+  class _Internal:
+    """Lightweight, nonpublic class for storing an internal node of the tree."""
+    __slots__ = '_keys', '_children'
+
+    def __init__(self, keys, children):
+      self._keys = keys
+      self._children = children
+
+  #-------------------------- nested Position class --------------------------
+  class Position:
+    """An abstraction representing the location of a single item.
+
+    A Position is no longer valid once the map has been modified.
+    """
+
+    def __init__(self, leaf, index):
+      """Constructor should not be invoked by user."""
+      self._leaf = leaf
+      self._index = index
+
+    def key(self):
+      """Return key of map's key-value pair."""
+      return self._leaf._keys[self._index]
+
+    def value(self):
+      """Return value of map's key-value pair."""
+      return self._leaf._values[self._index]
+
+    def element(self):
+      """Return (key,value) pair stored at this Position."""
+      return (self.key(), self.value())
+
+    def __eq__(self, other):
+      """Return True if other is a Position representing the same location."""
+      return (type(other) is type(self) and other._leaf is self._leaf
+              and other._index == self._index)
+
+    def __ne__(self, other):
+      return not (self == other)
+
+  #------------------------------- map constructor -------------------------------
+  def __init__(self, order=64):
+    """Create an empty map whose nodes hold at most order keys (or children).
+
+    Raise ValueError if order is less than 4.
+    """
+    if order < 4:
+      raise ValueError('order must be at least 4')
+    self._order = order
+    self._min = order // 2            # fewest keys in a leaf, or children in an internal node
+    self._root = self._Leaf([], [])
+    self._size = 0
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _find_leaf(self, k):
+    """Return leaf that would contain key k."""
+    node = self._root
+    while type(node) is self._Internal:
+      node = node._children[bisect_right(node._keys, k)]
+    return node
+
+  def _find_path(self, k):
+    """Return leaf that would contain k, and list of (internal node, child index) above it."""
+    path = []
+    node = self._root
+    while type(node) is self._Internal:
+      j = bisect_right(node._keys, k)
+      path.append((node, j))
+      node = node._children[j]
+    return node, path
+
+  def _first_leaf(self):
+    node = self._root
+    while type(node) is self._Internal:
+      node = node._children[0]
+    return node
+
+  def _last_leaf(self):
+    node = self._root
+    while type(node) is self._Internal:
+      node = node._children[-1]
+    return node
+
+  def _split(self, node):
+    """Split overfull node in two; return (separator key, new right node)."""
+    if type(node) is self._Leaf:
+      mid = len(node._keys) // 2
+      right = self._Leaf(node._keys[mid:], node._values[mid:], node, node._next)
+      del node._keys[mid:]
+      del node._values[mid:]
+      if node._next is not None:
+        node._next._prev = right
+      node._next = right
+      return right._keys[0], right
+    else:
+      mid = len(node._keys) // 2
+      separator = node._keys[mid]
+      right = self._Internal(node._keys[mid+1:], node._children[mid+1:])
+      del node._keys[mid:]
+      del node._children[mid+1:]
+      return separator, right
+
+  def _overfull(self, node):
+    if type(node) is self._Leaf:
+      return len(node._keys) > self._order
+    return len(node._children) > self._order
+
+  def _underfull(self, node):
+    if type(node) is self._Leaf:
+      return len(node._keys) < self._min
+    return len(node._children) < self._min
+
+  def _fix_underflow(self, parent, j):
+    """Restore the minimum occupancy of parent._children[j], by borrowing or merging."""
+    child = parent._children[j]
+    left = parent._children[j-1] if j > 0 else None
+    right = parent._children[j+1] if j + 1 < len(parent._children) else None
+    if type(child) is self._Leaf:
+      if left is not None and len(left._keys) > self._min:          # borrow from left
+        child._keys.insert(0, left._keys.pop())
+        child._values.insert(0, left._values.pop())
+        parent._keys[j-1] = child._keys[0]
+      elif right is not None and len(right._keys) > self._min:      # borrow from right
+        child._keys.append(right._keys.pop(0))
+        child._values.append(right._values.pop(0))
+        parent._keys[j] = right._keys[0]
+      else:                                                         # merge two leaves
+        if left is None:
+          left, child, j = child, right, j + 1
+        left._keys.extend(child._keys)
+        left._values.extend(child._values)
+        left._next = child._next
+        if child._next is not None:
+          child._next._prev = left
+        del parent._keys[j-1]
+        del parent._children[j]
+    else:
+      if left is not None and len(left._children) > self._min:      # rotate from left
+        child._keys.insert(0, parent._keys[j-1])
+        child._children.insert(0, left._children.pop())
+        parent._keys[j-1] = left._keys.pop()
+      elif right is not None and len(right._children) > self._min:  # rotate from right
+        child._keys.append(parent._keys[j])
+        child._children.append(right._children.pop(0))
+        parent._keys[j] = right._keys.pop(0)
+      else:                                                         # merge two nodes
+        if left is None:
+          left, child, j = child, right, j + 1
+        left._keys.append(parent._keys.pop(j-1))                   # separator comes down
+        left._keys.extend(child._keys)
+        left._children.extend(child._children)
+        del parent._children[j]
+
+  def _pair_at(self, leaf, j):
+    """Return (key,value) pair at index j of leaf, moving to neighboring leaves as needed.
+
+    Return None if there is no such item.
+    """
+    if j < 0:
+      leaf = leaf._prev
+      return (leaf._keys[-1], leaf._values[-1]) if leaf is not None else None
+    if j >= len(leaf._keys):
+      leaf = leaf._next
+      return (leaf._keys[0], leaf._values[0]) if leaf is not None else None
+    return (leaf._keys[j], leaf._values[j])
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    return self._size
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    leaf = self._find_leaf(k)
+    j = bisect_left(leaf._keys, k)
+    if j == len(leaf._keys) or leaf._keys[j] != k:
+      raise KeyError('Key Error: ' + repr(k))
+    return leaf._values[j]
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    leaf = self._find_leaf(k)
+    j = bisect_left(leaf._keys, k)
+    return j < len(leaf._keys) and leaf._keys[j] == k
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    node, path = self._find_path(k)
+    j = bisect_left(node._keys, k)
+    if j < len(node._keys) and node._keys[j] == k:
+      node._values[j] = v                          # replace existing item's value
+      return
+    node._keys.insert(j, k)
+    node._values.insert(j, v)
+    self._size += 1
+    # split overfull nodes, from the leaf upward
+    while self._overfull(node):
+      separator, right = self._split(node)
+      if not path:                                 # root was split
+        self._root = self._Internal([separator], [node, right])
+        return
+      node, j = path.pop()
+      node._keys.insert(j, separator)
+      node._children.insert(j + 1, right)
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found)."""
+    node, path = self._find_path(k)
+    j = bisect_left(node._keys, k)
+    if j == len(node._keys) or node._keys[j] != k:
+      raise KeyError('Key Error: ' + repr(k))
+    del node._keys[j]
+    del node._values[j]
+    self._size -= 1
+    # repair underfull nodes, from the leaf upward
+    while path and self._underfull(node):
+      node, j = path.pop()
+      self._fix_underflow(node, j)
+    if type(self._root) is self._Internal and len(self._root._children) == 1:
+      self._root = self._root._children[0]         # tree loses a level
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map in order."""
+    leaf = self._first_leaf()
+    while leaf is not None:
+      for key in leaf._keys:
+        yield key
+      leaf = leaf._next
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the map in reverse order."""
+    leaf = self._last_leaf()
+    while leaf is not None:
+      for key in reversed(leaf._keys):
+        yield key
+      leaf = leaf._prev
+
+  def first(self):
+    """Return the first Position in the map (or None if empty)."""
+    return self.Position(self._first_leaf(), 0) if self._size > 0 else None
+
+  def last(self):
+    """Return the last Position in the map (or None if empty)."""
+    if self._size == 0:
+      return None
+    leaf = self._last_leaf()
+    return self.Position(leaf, len(leaf._keys) - 1)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    p = self.first()
+    return p.element() if p is not None else None
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    p = self.last()
+    return p.element() if p is not None else None
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_right(leaf._keys, k) - 1)
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_left(leaf._keys, k) - 1)
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_left(leaf._keys, k))
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_right(leaf._keys, k))
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of map.
+    If stop is None, iteration continues through the maximum key of map.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    if not reverse:
+      if start is None:
+        leaf, j = self._first_leaf(), 0
+      else:
+        leaf = self._find_leaf(start)
+        j = bisect_left(leaf._keys, start)
+      while leaf is not None:
+        keys, values = leaf._keys, leaf._values
+        end = len(keys) if stop is None else bisect_left(keys, stop, j)
+        for i in range(j, end):
+          yield (keys[i], values[i])
+        if end < len(keys):                        # reached stop within this leaf
+          return
+        leaf, j = leaf._next, 0
+    else:
+      if stop is None:
+        leaf = self._last_leaf()
+        j = len(leaf._keys)
+      else:
+        leaf = self._find_leaf(stop)
+        j = bisect_left(leaf._keys, stop)
+      while leaf is not None:
+        keys, values = leaf._keys, leaf._values
+        begin = 0 if start is None else bisect_left(keys, start, 0, j)
+        for i in range(j - 1, begin - 1, -1):
+          yield (keys[i], values[i])
+        if begin > 0:                              # reached start within this leaf
+          return
+        leaf = leaf._prev
+        if leaf is not None:
+          j = len(leaf._keys)
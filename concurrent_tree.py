@@ -0,0 +1,235 @@
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from avl_tree import AVLTreeMap
+from binary_search_tree import TreeMap
+
+class ReadWriteLock:
+  """Lock allowing either any number of readers or a single writer.
+
+  Waiting writers take precedence over newly arriving readers, so a steady
+  stream of readers cannot starve a writer.  The lock is not reentrant.
+  """
+
+  def __init__(self):
+    self._condition = threading.Condition(threading.Lock())
+    self._readers = 0             # number of active readers
+    self._writing = False         # is a writer active?
+    self._waiting = 0             # number of writers waiting
+
+  def acquire_read(self):
+    with self._condition:
+      while self._writing or self._waiting > 0:
+        self._condition.wait()
+      self._readers += 1
+
+  def release_read(self):
+    with self._condition:
+      self._readers -= 1
+      if self._readers == 0:
+        self._condition.notify_all()
+
+  def acquire_write(self):
+    with self._condition:
+      self._waiting += 1
+      while self._writing or self._readers > 0:
+        self._condition.wait()
+      self._waiting -= 1
+      self._writing = True
+
+  def release_write(self):
+    with self._condition:
+      self._writing = False
+      self._condition.notify_all()
+
+  @contextmanager
+  def reading(self):
+    """Context manager holding the lock for reading."""
+    self.acquire_read()
+    try:
+      yield
+    finally:
+      self.release_read()
+
+  @contextmanager
+  def writing(self):
+    """Context manager holding the lock for writing."""
+    self.acquire_write()
+    try:
+      yield
+    finally:
+      self.release_write()
+
+
+class ConcurrentTreeMap(MutableMapping):
+  """Thread-safe sorted map, guarding a TreeMap with a writer-preferring ReadWriteLock.
+
+  Lookups share the lock, so any number of threads may read at once, while each
+  update holds the lock exclusively (a rotation rewires several links, which no
+  reader may observe halfway).  If the underlying map restructures itself on
+  access, as SplayTreeMap does, lookups take the lock exclusively as well.
+
+  Methods reporting several items (iteration, items, values, find_range) collect
+  them while holding the lock, and so report a consistent view.  Functions passed to
+  compute_if_absent run while the lock is held, and must not use this map.
+  """
+
+  def __init__(self, tree=None):
+    """Create a map guarding the given TreeMap (by default, a new empty AVLTreeMap).
+
+    The tree must not be used directly once it is guarded.
+    """
+    self._tree = tree if tree is not None else AVLTreeMap()
+    self._lock = ReadWriteLock()
+    if type(self._tree)._access_node is TreeMap._access_node:
+      self._reading = self._lock.reading
+    else:                                     # lookups modify the tree
+      self._reading = self._lock.writing
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    with self._reading():
+      return len(self._tree)
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    with self._reading():
+      return self._tree[k]
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    with self._reading():
+      return k in self._tree
+
+  def get(self, k, default=None):
+    """Return value associated with key k, or default if not found."""
+    with self._reading():
+      return self._tree.get(k, default)
+
+  def get_many(self, keys, default=None):
+    """Return list of the values associated with each of the given keys, in the same order."""
+    with self._reading():
+      return self._tree.get_many(keys, default)
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    with self._lock.writing():
+      self._tree[k] = v
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found)."""
+    with self._lock.writing():
+      del self._tree[k]
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map (as of the call) in order."""
+    with self._reading():
+      keys = list(self._tree)
+    return iter(keys)
+
+  def items(self):
+    """Return list of all (key,value) pairs in the map (as of the call) in key order."""
+    with self._reading():
+      return list(self._tree.find_range(None, None))
+
+  def values(self):
+    """Return list of all values in the map (as of the call) in key order."""
+    with self._reading():
+      return [v for k, v in self._tree.find_range(None, None)]
+
+  #--------------------- public methods for atomic updates ---------------------
+  def compute_if_absent(self, k, function):
+    """Return value associated with key k, first assigning function(k) if k is not found.
+
+    The check and the assignment are performed atomically.
+    """
+    with self._reading():
+      if k in self._tree:
+        return self._tree[k]
+    with self._lock.writing():
+      if k not in self._tree:                 # another writer may have come first
+        self._tree[k] = function(k)
+      return self._tree[k]
+
+  def setdefault(self, k, default=None):
+    """Return value associated with key k, first assigning default if k is not found."""
+    return self.compute_if_absent(k, lambda k: default)
+
+  def pop(self, k, *default):
+    """Remove item with key k and return its value (or default if given and k not found)."""
+    with self._lock.writing():
+      if k in self._tree:
+        v = self._tree[k]
+        del self._tree[k]
+        return v
+    if default:
+      return default[0]
+    raise KeyError('Key Error: ' + repr(k))
+
+  def popitem(self):
+    """Remove and return the (key,value) pair with minimum key (raise KeyError if empty)."""
+    with self._lock.writing():
+      item = self._tree.find_min()
+      if item is None:
+        raise KeyError('Map is empty')
+      del self._tree[item[0]]
+      return item
+
+  def clear(self):
+    """Remove all items from the map."""
+    with self._lock.writing():
+      self._tree.delete_range(None, None)
+
+  def update(self, items=(), **kwargs):
+    """Assign the (key,value) pairs of items (a mapping or pairs) and kwargs, atomically."""
+    if hasattr(items, 'keys'):
+      items = items.items()
+    pairs = list(items) + list(kwargs.items())
+    with self._lock.writing():
+      self._tree.update_sorted(pairs)
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the map (as of the call) in reverse order."""
+    with self._reading():
+      keys = list(reversed(self._tree))
+    return iter(keys)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    with self._reading():
+      return self._tree.find_min()
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    with self._reading():
+      return self._tree.find_max()
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k (or None)."""
+    with self._reading():
+      return self._tree.find_le(k)
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k (or None)."""
+    with self._reading():
+      return self._tree.find_lt(k)
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k (or None)."""
+    with self._reading():
+      return self._tree.find_ge(k)
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k (or None)."""
+    with self._reading():
+      return self._tree.find_gt(k)
+
+  def find_range(self, start, stop, reverse=False):
+    """Return list of all (key,value) pairs such that start <= key < stop.
+
+    Bounds of None and reverse are interpreted as for TreeMap.find_range.
+    """
+    with self._reading():
+      return list(self._tree.find_range(start, stop, reverse))
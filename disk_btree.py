@@ -0,0 +1,473 @@
+import mmap
+import os
+import pickle
+import struct
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from map_base import MapBase
+from btree_map import BTreeMap
+
+_MAGIC = b'DBTREE01'
+_HEADER = struct.Struct('<8sIQQQQ')   # magic, page size, page count, root, free list, size
+_PAGE = struct.Struct('<BIQQ')        # kind, payload length, previous leaf, next leaf (or free)
+_FREE, _LEAF, _INTERNAL = 0, 1, 2     # kinds of page; page 0 holds the header
+
+class DiskBTreeMap(MapBase):
+  """Sorted map implementation using a B+ tree stored in a file of fixed-size pages.
+
+  Each node occupies one page, holding its keys and values (or child page numbers)
+  pickled, so a node holds as many items as fit in a page; page number 0 (the
+  header) doubles as a null link.  Leaves are linked to both neighbors, so range
+  scans move from leaf to leaf without revisiting internal nodes.
+
+  Pages are read through a memory map of the file, and decoded nodes are kept in
+  a cache of the cache_pages most recently used.  Modified nodes are written back
+  when evicted from the cache, and by flush (or close), so the file is consistent
+  only after a flush; it is not protected against crashes in between.
+  """
+
+  #-------------------------- nested node classes --------------------------
+  class _Leaf:
+    """Lightweight, nonpublic class for storing a leaf of the tree."""
+    __slots__ = '_page', '_keys', '_values', '_prev', '_next'
+
+    def __init__(self, page, keys, values, prev=0, next=0):
+      self._page = page
+      self._keys = keys
+      self._values = values
+      self._prev = prev
+      self._next = next
+
+  class _Internal:
+    """Lightweight, nonpublic class for storing an internal node of the tree."""
+    __slots__ = '_page', '_keys', '_children'
+
+    def __init__(self, page, keys, children):
+      self._page = page
+      self._keys = keys
+      self._children = children
+
+  Position = BTreeMap.Position        # a Position refers to a decoded leaf
+
+  #------------------------------- map constructor -------------------------------
+  def __init__(self, path, page_size=4096, cache_pages=1024):
+    """Open the map stored in the file at path, creating it if necessary.
+
+    page_size applies only when creating the file (and must be at least 512).
+    Raise ValueError if an existing file does not hold a map.
+    """
+    exists = os.path.exists(path) and os.path.getsize(path) > 0
+    self._file = open(path, 'r+b' if exists else 'w+b')
+    self._cache = OrderedDict()         # page number -> decoded node, least recent first
+    self._dirty = set()                 # pages of cached nodes modified since written
+    self._cache_pages = max(cache_pages, 8)
+    if exists:
+      header = self._file.read(_HEADER.size)
+      if len(header) < _HEADER.size or header[:8] != _MAGIC:
+        self._file.close()
+        raise ValueError('not a DiskBTreeMap file')
+      (magic, self._page_size, self._page_count, self._root,
+       self._free, self._size) = _HEADER.unpack(header)
+      self._mmap = mmap.mmap(self._file.fileno(), 0)
+    else:
+      if page_size < 512:
+        self._file.close()
+        raise ValueError('page_size must be at least 512')
+      self._page_size = page_size
+      self._file.truncate(16 * page_size)
+      self._mmap = mmap.mmap(self._file.fileno(), 0)
+      self._page_count = 1
+      self._free = 0
+      self._size = 0
+      root = self._Leaf(self._allocate(), [], [])
+      self._touch(root)
+      self._root = root._page
+      self.flush()
+
+  #------------------------------- nonpublic page management -------------------------------
+  def _allocate(self):
+    """Return number of an unused page."""
+    if self._free != 0:
+      page = self._free
+      self._free = _PAGE.unpack_from(self._mmap, page * self._page_size)[3]
+      return page
+    page = self._page_count
+    self._page_count += 1
+    if self._page_count * self._page_size > len(self._mmap):    # grow file geometrically
+      self._mmap.close()
+      self._file.truncate(2 * self._page_count * self._page_size)
+      self._mmap = mmap.mmap(self._file.fileno(), 0)
+    return page
+
+  def _release(self, node):
+    """Return page of node to the free list."""
+    page = node._page
+    self._cache.pop(page, None)
+    self._dirty.discard(page)
+    _PAGE.pack_into(self._mmap, page * self._page_size, _FREE, 0, 0, self._free)
+    self._free = page
+
+  def _encode(self, node):
+    if type(node) is self._Leaf:
+      payload = pickle.dumps((node._keys, node._values), pickle.HIGHEST_PROTOCOL)
+      return _PAGE.pack(_LEAF, len(payload), node._prev, node._next) + payload
+    payload = pickle.dumps((node._keys, node._children), pickle.HIGHEST_PROTOCOL)
+    return _PAGE.pack(_INTERNAL, len(payload), 0, 0) + payload
+
+  def _write(self, node):
+    data = self._encode(node)
+    start = node._page * self._page_size
+    self._mmap[start:start + len(data)] = data
+
+  def _node(self, page):
+    """Return decoded node stored in given page."""
+    node = self._cache.get(page)
+    if node is not None:
+      self._cache.move_to_end(page)
+      return node
+    start = page * self._page_size
+    kind, length, prev, next = _PAGE.unpack_from(self._mmap, start)
+    keys, items = pickle.loads(self._mmap[start + _PAGE.size:start + _PAGE.size + length])
+    if kind == _LEAF:
+      node = self._Leaf(page, keys, items, prev, next)
+    else:
+      node = self._Internal(page, keys, items)
+    self._cache[page] = node
+    return node
+
+  def _touch(self, node):
+    """Mark node as modified."""
+    self._cache[node._page] = node
+    self._dirty.add(node._page)
+
+  def _trim(self):
+    """Evict least recently used nodes beyond the capacity of the cache.
+
+    Called only between operations, so no node in use by an operation is evicted.
+    """
+    while len(self._cache) > self._cache_pages:
+      page, node = self._cache.popitem(last=False)
+      if page in self._dirty:
+        self._write(node)
+        self._dirty.discard(page)
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _fits(self, node):
+    return len(self._encode(node)) <= self._page_size
+
+  def _small(self, node):
+    return len(self._encode(node)) < self._page_size // 4
+
+  def _find_leaf(self, k):
+    """Return leaf that would contain key k."""
+    node = self._node(self._root)
+    while type(node) is self._Internal:
+      node = self._node(node._children[bisect_right(node._keys, k)])
+    return node
+
+  def _find_path(self, k):
+    """Return leaf that would contain k, and list of (internal node, child index) above it."""
+    path = []
+    node = self._node(self._root)
+    while type(node) is self._Internal:
+      j = bisect_right(node._keys, k)
+      path.append((node, j))
+      node = self._node(node._children[j])
+    return node, path
+
+  def _first_leaf(self):
+    node = self._node(self._root)
+    while type(node) is self._Internal:
+      node = self._node(node._children[0])
+    return node
+
+  def _last_leaf(self):
+    node = self._node(self._root)
+    while type(node) is self._Internal:
+      node = self._node(node._children[-1])
+    return node
+
+  def _split(self, node):
+    """Split overfull node in two, balancing their sizes; return (separator key, new right node)."""
+    if type(node) is self._Leaf:
+      sizes = [len(pickle.dumps(k)) + len(pickle.dumps(v)) for k, v in zip(node._keys, node._values)]
+    else:
+      sizes = [len(pickle.dumps(k)) for k in node._keys]
+    half, total, mid = sum(sizes) / 2, 0, 0
+    while mid < len(sizes) - 1 and total + sizes[mid] <= half:
+      total += sizes[mid]
+      mid += 1
+    mid = max(mid, 1)
+    if type(node) is self._Leaf:
+      right = self._Leaf(self._allocate(), node._keys[mid:], node._values[mid:],
+                         node._page, node._next)
+      del node._keys[mid:]
+      del node._values[mid:]
+      if node._next != 0:
+        following = self._node(node._next)
+        following._prev = right._page
+        self._touch(following)
+      node._next = right._page
+      self._touch(right)
+      return right._keys[0], right
+    else:
+      separator = node._keys[mid]
+      right = self._Internal(self._allocate(), node._keys[mid+1:], node._children[mid+1:])
+      del node._keys[mid:]
+      del node._children[mid+1:]
+      self._touch(right)
+      return separator, right
+
+  def _merge(self, parent, j):
+    """Merge parent's children j and j+1 if they fit in one page; return True if merged."""
+    left = self._node(parent._children[j])
+    right = self._node(parent._children[j+1])
+    if type(left) is self._Leaf:
+      merged = self._Leaf(left._page, left._keys + right._keys, left._values + right._values,
+                          left._prev, right._next)
+    else:
+      merged = self._Internal(left._page, left._keys + [parent._keys[j]] + right._keys,
+                              left._children + right._children)
+    if not self._fits(merged):
+      return False
+    if type(left) is self._Leaf and right._next != 0:
+      following = self._node(right._next)
+      following._prev = left._page
+      self._touch(following)
+    self._touch(merged)                           # replaces left within the cache
+    self._release(right)
+    del parent._keys[j]
+    del parent._children[j+1]
+    self._touch(parent)
+    return True
+
+  def _pair_at(self, leaf, j):
+    """Return (key,value) pair at index j of leaf, moving to neighboring leaves as needed.
+
+    Return None if there is no such item.
+    """
+    self._trim()
+    if j < 0:
+      if leaf._prev == 0:
+        return None
+      leaf = self._node(leaf._prev)
+      return (leaf._keys[-1], leaf._values[-1])
+    if j >= len(leaf._keys):
+      if leaf._next == 0:
+        return None
+      leaf = self._node(leaf._next)
+      return (leaf._keys[0], leaf._values[0])
+    return (leaf._keys[j], leaf._values[j])
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    return self._size
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    leaf = self._find_leaf(k)
+    self._trim()
+    j = bisect_left(leaf._keys, k)
+    if j == len(leaf._keys) or leaf._keys[j] != k:
+      raise KeyError('Key Error: ' + repr(k))
+    return leaf._values[j]
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    leaf = self._find_leaf(k)
+    self._trim()
+    j = bisect_left(leaf._keys, k)
+    return j < len(leaf._keys) and leaf._keys[j] == k
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present.
+
+    Raise ValueError if the item is too large (over a quarter of a page, pickled).
+    """
+    if len(pickle.dumps(k)) + len(pickle.dumps(v)) > self._page_size // 4:
+      raise ValueError('Item too large for page size')
+    node, path = self._find_path(k)
+    j = bisect_left(node._keys, k)
+    if j < len(node._keys) and node._keys[j] == k:
+      node._values[j] = v                          # replace existing item's value
+    else:
+      node._keys.insert(j, k)
+      node._values.insert(j, v)
+      self._size += 1
+    self._touch(node)
+    # split overfull nodes, from the leaf upward
+    while not self._fits(node):
+      separator, right = self._split(node)
+      if not path:                                 # root was split
+        root = self._Internal(self._allocate(), [separator], [node._page, right._page])
+        self._touch(root)
+        self._root = root._page
+        break
+      node, j = path.pop()
+      node._keys.insert(j, separator)
+      node._children.insert(j + 1, right._page)
+      self._touch(node)
+    self._trim()
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found)."""
+    node, path = self._find_path(k)
+    j = bisect_left(node._keys, k)
+    if j == len(node._keys) or node._keys[j] != k:
+      self._trim()
+      raise KeyError('Key Error: ' + repr(k))
+    del node._keys[j]
+    del node._values[j]
+    self._size -= 1
+    self._touch(node)
+    # merge small nodes with a neighbor, from the leaf upward
+    while path and self._small(node):
+      parent, j = path.pop()
+      if len(parent._children) > 1:
+        self._merge(parent, j if j + 1 < len(parent._children) else j - 1)
+      node = parent
+    root = self._node(self._root)
+    while type(root) is self._Internal and len(root._children) == 1:
+      self._root = root._children[0]               # tree loses a level
+      self._release(root)
+      root = self._node(self._root)
+    self._trim()
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map in order."""
+    leaf = self._first_leaf()
+    while True:
+      for key in leaf._keys:
+        yield key
+      if leaf._next == 0:
+        return
+      leaf = self._node(leaf._next)
+      self._trim()
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the map in reverse order."""
+    leaf = self._last_leaf()
+    while True:
+      for key in reversed(leaf._keys):
+        yield key
+      if leaf._prev == 0:
+        return
+      leaf = self._node(leaf._prev)
+      self._trim()
+
+  def first(self):
+    """Return the first Position in the map (or None if empty)."""
+    return self.Position(self._first_leaf(), 0) if self._size > 0 else None
+
+  def last(self):
+    """Return the last Position in the map (or None if empty)."""
+    if self._size == 0:
+      return None
+    leaf = self._last_leaf()
+    return self.Position(leaf, len(leaf._keys) - 1)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    p = self.first()
+    return p.element() if p is not None else None
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    p = self.last()
+    return p.element() if p is not None else None
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_right(leaf._keys, k) - 1)
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_left(leaf._keys, k) - 1)
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_left(leaf._keys, k))
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k.
+
+    Return None if there does not exist such a key.
+    """
+    leaf = self._find_leaf(k)
+    return self._pair_at(leaf, bisect_right(leaf._keys, k))
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of map.
+    If stop is None, iteration continues through the maximum key of map.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    if not reverse:
+      if start is None:
+        leaf, j = self._first_leaf(), 0
+      else:
+        leaf = self._find_leaf(start)
+        j = bisect_left(leaf._keys, start)
+      while True:
+        keys, values = leaf._keys, leaf._values
+        end = len(keys) if stop is None else bisect_left(keys, stop, j)
+        for i in range(j, end):
+          yield (keys[i], values[i])
+        if end < len(keys) or leaf._next == 0:     # reached stop, or end of map
+          return
+        leaf, j = self._node(leaf._next), 0
+        self._trim()
+    else:
+      if stop is None:
+        leaf = self._last_leaf()
+        j = len(leaf._keys)
+      else:
+        leaf = self._find_leaf(stop)
+        j = bisect_left(leaf._keys, stop)
+      while True:
+        keys, values = leaf._keys, leaf._values
+        begin = 0 if start is None else bisect_left(keys, start, 0, j)
+        for i in range(j - 1, begin - 1, -1):
+          yield (keys[i], values[i])
+        if begin > 0 or leaf._prev == 0:           # reached start, or beginning of map
+          return
+        leaf = self._node(leaf._prev)
+        j = len(leaf._keys)
+        self._trim()
+
+  #--------------------- public methods for managing the file ---------------------
+  def flush(self):
+    """Write all modified nodes, and the header, to the file."""
+    for page in self._dirty:
+      self._write(self._cache[page])
+    self._dirty.clear()
+    self._mmap[:_HEADER.size] = _HEADER.pack(_MAGIC, self._page_size, self._page_count,
+                                             self._root, self._free, self._size)
+    self._mmap.flush()
+
+  def close(self):
+    """Flush the map and close the file."""
+    self.flush()
+    self._mmap.close()
+    self._file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
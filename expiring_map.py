@@ -0,0 +1,128 @@
+import math
+import time
+from collections.abc import MutableMapping
+from avl_tree import AVLTreeMap
+
+_DEFAULT = object()               # marks a ttl left to the default time to live
+
+class ExpiringMap(MutableMapping):
+  """Map whose items expire a given time after being set, and sweeping them in O(k log n).
+
+  A dict maps each key to its value and deadline, and an AVLTreeMap orders the
+  items with deadlines by (deadline, serial number), where serial numbers are
+  issued in increasing order, so that keys themselves never need to be compared.
+  An item is absent from the map once its deadline has passed.
+
+  Lookups check the deadline of the item found, while iteration and len first
+  sweep expired items with expire, whose cost depends only on the number of
+  items removed.  Time is read from clock (by default time.monotonic).
+  """
+
+  def __init__(self, default_ttl=None, clock=time.monotonic):
+    """Create an empty map.
+
+    default_ttl is the time to live of items set without an explicit ttl, where
+    None means that such items never expire.
+    """
+    self._default_ttl = default_ttl
+    self._clock = clock
+    self._index = {}                # key -> [value, deadline, serial]
+    self._deadlines = AVLTreeMap()  # (deadline, serial) -> key
+    self._serial = 0
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _schedule(self, k, entry, ttl):
+    """Set deadline of entry for key k to ttl from now (never if ttl is None)."""
+    if entry[1] is not None:
+      del self._deadlines[(entry[1], entry[2])]
+    if ttl is None:
+      entry[1] = None
+    else:
+      self._serial += 1
+      entry[1], entry[2] = self._clock() + ttl, self._serial
+      self._deadlines[(entry[1], entry[2])] = k
+
+  def _entry(self, k):
+    """Return live entry for key k (raise KeyError if not found or expired)."""
+    entry = self._index[k]
+    if entry[1] is not None and entry[1] <= self._clock():
+      raise KeyError('Key Error: ' + repr(k))
+    return entry
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found or expired)."""
+    return self._entry(k)[0]
+
+  def __contains__(self, k):
+    """Return True if the map has an unexpired item with key k."""
+    try:
+      self._entry(k)
+    except KeyError:
+      return False
+    return True
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, expiring after the default time to live."""
+    self.set(k, v)
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found or expired)."""
+    entry = self._entry(k)
+    if entry[1] is not None:
+      del self._deadlines[(entry[1], entry[2])]
+    del self._index[k]
+
+  def __iter__(self):
+    """Generate an iteration of the keys of all unexpired items."""
+    self.expire()
+    return iter(list(self._index))
+
+  def __len__(self):
+    """Return number of unexpired items in the map."""
+    self.expire()
+    return len(self._index)
+
+  #--------------------- public methods for expiring items ---------------------
+  def set(self, k, v, ttl=_DEFAULT):
+    """Assign value v to key k, to expire ttl from now (by default, the default time to live).
+
+    A ttl of None means that the item never expires.
+    """
+    if ttl is _DEFAULT:
+      ttl = self._default_ttl
+    entry = self._index.get(k)
+    if entry is None:
+      entry = self._index[k] = [v, None, 0]
+    else:
+      entry[0] = v
+    self._schedule(k, entry, ttl)
+
+  def touch(self, k, ttl=_DEFAULT):
+    """Reset the deadline of the item with key k to ttl (by default, the default) from now.
+
+    A ttl of None means that the item never expires.
+    Raise KeyError if not found or expired.
+    """
+    if ttl is _DEFAULT:
+      ttl = self._default_ttl
+    self._schedule(k, self._entry(k), ttl)
+
+  def deadline(self, k):
+    """Return clock time at which item with key k expires (None if never).
+
+    Raise KeyError if not found or expired.
+    """
+    return self._entry(k)[1]
+
+  def expire(self, now=None):
+    """Remove all items whose deadline is at or before now (by default, the current time).
+
+    Return list of the (key,value) pairs removed, in order of deadline.
+    """
+    if now is None:
+      now = self._clock()
+    bound = (now, math.inf)                     # just beyond all deadlines equal to now
+    expired = [k for deadline, k in self._deadlines.find_range(None, bound)]
+    self._deadlines.delete_range(None, bound)
+    return [(k, self._index.pop(k)[0]) for k in expired]
@@ -0,0 +1,143 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from map_base import RankedMapMixin
+
+try:
+  import numpy                          # optional, for vectorized batch lookups
+except ImportError:
+  numpy = None
+
+class FrozenTreeMap(Mapping, RankedMapMixin):
+  """Immutable sorted map backed by contiguous arrays of keys and values.
+
+  Single lookups binary-search the sorted key list with bisect.  When NumPy is
+  available and the keys are numbers, a copy of the keys is also kept as a NumPy
+  array, so that get_many answers a whole batch of lookups with one call to
+  numpy.searchsorted rather than one search per key.  This applies only to a
+  batch of the same kind of number as the keys (integers, say), as NumPy would
+  otherwise compare converted values; other batches fall back to bisect.
+  """
+
+  def __init__(self, items):
+    """Create a map from an iteration of (key,value) pairs in strictly increasing key order."""
+    self._keys = []
+    self._values = []
+    for k, v in items:
+      self._keys.append(k)
+      self._values.append(v)
+    self._array = None
+    if numpy is not None and self._keys:
+      array = numpy.asarray(self._keys)
+      if array.ndim == 1 and array.dtype.kind in 'iuf' and array.tolist() == self._keys:
+        self._array = array                             # numbers, each held exactly
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _pair(self, j):
+    return (self._keys[j], self._values[j]) if 0 <= j < len(self._keys) else None
+
+  def _index(self, k):
+    """Return index of key k (or None if not found)."""
+    j = bisect_left(self._keys, k)
+    if j < len(self._keys) and self._keys[j] == k:
+      return j
+    return None
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    return len(self._keys)
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    j = self._index(k)
+    if j is None:
+      raise KeyError('Key Error: ' + repr(k))
+    return self._values[j]
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    return self._index(k) is not None
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map in order."""
+    return iter(self._keys)
+
+  def get_many(self, keys, default=None):
+    """Return list of the values associated with each of the given keys, in the same order.
+
+    default is reported for each key that is not in the map.
+    """
+    if self._array is not None:
+      probes = numpy.asarray(keys)
+      # mixed kinds would be compared after conversion (of int64 to float64, say)
+      if probes.ndim == 1 and probes.dtype.kind == self._array.dtype.kind and len(probes) > 0:
+        found = numpy.searchsorted(self._array, probes)            # one vectorized search
+        found = numpy.minimum(found, len(self._array) - 1)
+        hits = self._array[found] == probes
+        values = self._values
+        return [values[j] if hit else default
+                for j, hit in zip(found.tolist(), hits.tolist())]
+    result = []
+    for k in keys:                                                 # fall back to bisect
+      j = self._index(k)
+      result.append(self._values[j] if j is not None else default)
+    return result
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the map in reverse order."""
+    return reversed(self._keys)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    return self._pair(0)
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    return self._pair(len(self._keys) - 1)
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k (or None)."""
+    return self._pair(bisect_right(self._keys, k) - 1)
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k (or None)."""
+    return self._pair(bisect_left(self._keys, k) - 1)
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k (or None)."""
+    return self._pair(bisect_left(self._keys, k))
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k (or None)."""
+    return self._pair(bisect_right(self._keys, k))
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of map.
+    If stop is None, iteration continues through the maximum key of map.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    low = 0 if start is None else bisect_left(self._keys, start)
+    high = len(self._keys) if stop is None else bisect_left(self._keys, stop)
+    indices = range(high - 1, low - 1, -1) if reverse else range(low, high)
+    for j in indices:
+      yield (self._keys[j], self._values[j])
+
+  #--------------------- public methods for order statistics ---------------------
+  def rank(self, k):
+    """Return the number of keys in the map that are strictly less than k."""
+    return bisect_left(self._keys, k)
+
+  def select(self, i):
+    """Return (key,value) pair with the i-th smallest key (counting from 0).
+
+    Negative indices count from the end, as for a list.
+    Raise IndexError if i is out of range.
+    """
+    if i < 0:
+      i += len(self._keys)
+    if not 0 <= i < len(self._keys):
+      raise IndexError('Index out of range: ' + repr(i))
+    return self._pair(i)
@@ -0,0 +1,103 @@
+from avl_tree import AVLTreeMap
+from map_base import sorted_pairs
+
+class IntervalTreeMap(AVLTreeMap):
+  """AVL tree map whose keys are intervals, supporting efficient overlap queries.
+
+  Each key is a (start, end) pair describing the half-open interval start <= x < end,
+  so intervals are ordered by start (then by end), and several intervals may share
+  a start.  Each node caches the greatest end of the intervals in its subtree,
+  which lets queries skip every subtree ending at or before the query.  A query
+  reporting k intervals runs in O(log n + min(n, k log n)) time, as each reported
+  interval may cost a descent through subtrees holding no further overlaps.
+  """
+
+  _augmented = True               # refreshed up to the root after each update
+
+  #-------------------------- nested _Node class --------------------------
+  class _Node(AVLTreeMap._Node):
+    """Node class for IntervalTreeMap maintains greatest end within its subtree."""
+    __slots__ = '_max_end'        # additional data member to store greatest end
+
+    def __init__(self, element, parent=None, left=None, right=None):
+      super().__init__(element, parent, left, right)
+      self._max_end = element._key[1]   # will be recomputed during balancing
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _refresh_node(self, node):
+    super()._refresh_node(node)
+    max_end = node._element._key[1]
+    for child in (node._left, node._right):
+      if child is not None and max_end < child._max_end:
+        max_end = child._max_end
+    node._max_end = max_end
+
+  def _checked_pairs(self, items):
+    """Return sorted_pairs(items), raising ValueError if any interval ends before it starts."""
+    pairs = sorted_pairs(items)
+    for k, v in pairs:
+      start, end = k
+      if end < start:
+        raise ValueError('Interval ends before it starts: ' + repr(k))
+    return pairs
+
+  def _overlaps(self, lo, hi, closed):
+    """Generate items with end > lo and start < hi (or start <= hi if closed), in order."""
+    stack = []
+    node = self._root
+    while True:
+      if node is not None and lo < node._max_end:   # subtree may hold overlaps
+        stack.append(node)
+        node = node._left
+      elif stack:
+        node = stack.pop()
+        start, end = node._element._key
+        if hi < start or (start == hi and not closed):
+          return                                    # all later intervals start too late
+        if lo < end:
+          yield (node._element._key, node._element._value)
+        node = node._right
+      else:
+        return
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __setitem__(self, k, v):
+    """Assign value v to interval k = (start, end), overwriting existing value if present.
+
+    Raise ValueError if end is less than start.
+    """
+    start, end = k
+    if end < start:
+      raise ValueError('Interval ends before it starts: ' + repr(k))
+    super().__setitem__(k, v)
+
+  #--------------------- public methods for bulk construction ---------------------
+  def bulk_load(self, items):
+    """Replace the contents of the map with the (interval,value) pairs of items.
+
+    Raise ValueError, leaving the map unchanged, if an interval ends before it starts.
+    """
+    super().bulk_load(self._checked_pairs(items))
+
+  def update_sorted(self, items):
+    """Assign the values of all (interval,value) pairs of items, as a batch.
+
+    Raise ValueError, leaving the map unchanged, if an interval ends before it starts.
+    """
+    super().update_sorted(self._checked_pairs(items))
+
+  #--------------------- public methods for interval queries ---------------------
+  def overlapping(self, lo, hi):
+    """Generate ((start,end),value) pairs of all intervals overlapping lo <= x < hi.
+
+    These are the intervals with start < hi and end > lo, reported in key order,
+    in O(log n + min(n, k log n)) time for k reported intervals.
+    """
+    return self._overlaps(lo, hi, False)
+
+  def stabbing(self, point):
+    """Generate ((start,end),value) pairs of all intervals containing point, in key order.
+
+    Runs in O(log n + min(n, k log n)) time for k reported intervals.
+    """
+    return self._overlaps(point, point, True)
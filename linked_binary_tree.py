@@ -27,13 +27,20 @@ class LinkedBinaryTree(BinaryTree):
   #-------------------------- nested _Node class --------------------------
   class _Node:
     """Lightweight, nonpublic class for storing a node."""
-    __slots__ = '_element', '_parent', '_left', '_right' # streamline memory usage
+    __slots__ = '_element', '_parent', '_left', '_right', '_size' # streamline memory usage
 
     def __init__(self, element, parent=None, left=None, right=None):
       self._element = element
       self._parent = parent
       self._left = left
       self._right = right
+      self._size = 1 + self.left_size() + self.right_size()   # nodes in this subtree
+
+    def left_size(self):
+      return self._left._size if self._left is not None else 0
+
+    def right_size(self):
+      return self._right._size if self._right is not None else 0
 
   #-------------------------- nested Position class --------------------------
   class Position(BinaryTree.Position):
@@ -67,11 +74,22 @@ class LinkedBinaryTree(BinaryTree):
     """Return Position instance for given node (or None if no node)."""
     return self.Position(self, node) if node is not None else None
 
+  def _refresh_node(self, node):
+    """Recompute auxiliary data stored at node from that of its children."""
+    node._size = 1 + node.left_size() + node.right_size()
+
+  def _adjust_sizes(self, node, delta):
+    """Add delta to the subtree size of node and of each of its ancestors."""
+    while node is not None:
+      node._size += delta
+      node = node._parent
+
   #-------------------------- binary tree constructor --------------------------
   def __init__(self):
     """Create an initially empty binary tree."""
     self._root = None
     self._size = 0
+    self._version = 0                 # incremented whenever links between nodes change
 
   #-------------------------- public accessors --------------------------
   def __len__(self):
@@ -117,6 +135,7 @@ class LinkedBinaryTree(BinaryTree):
       raise ValueError('Root exists')
     self._size = 1
     self._root = self._Node(e)
+    self._version += 1
     return self._make_position(self._root)
 
   def _add_left(self, p, e):
@@ -128,9 +147,7 @@ class LinkedBinaryTree(BinaryTree):
     node = self._validate(p)
     if node._left is not None:
       raise ValueError('Left child exists')
-    self._size += 1
-    node._left = self._Node(e, node)                  # node is its parent
-    return self._make_position(node._left)
+    return self._make_position(self._add_child_node(node, e, True))
 
   def _add_right(self, p, e):
     """Create a new right child for Position p, storing element e.
@@ -141,9 +158,23 @@ class LinkedBinaryTree(BinaryTree):
     node = self._validate(p)
     if node._right is not None:
       raise ValueError('Right child exists')
+    return self._make_position(self._add_child_node(node, e, False))
+
+  def _add_child_node(self, node, e, make_left_child):
+    """Create a new child for node storing element e, and return the new node.
+
+    The child is a left child if make_left_child is True, and a right child otherwise.
+    Caller must ensure that node does not already have such a child.
+    """
+    child = self._Node(e, node)                       # node is its parent
+    if make_left_child:
+      node._left = child
+    else:
+      node._right = child
     self._size += 1
-    node._right = self._Node(e, node)                 # node is its parent
-    return self._make_position(node._right)
+    self._adjust_sizes(node, 1)
+    self._version += 1
+    return child
 
   def _replace(self, p, e):
     """Replace the element at position p with e, and return old element."""
@@ -161,6 +192,13 @@ class LinkedBinaryTree(BinaryTree):
     node = self._validate(p)
     if self.num_children(p) == 2:
       raise ValueError('Position has two children')
+    return self._delete_node(node)
+
+  def _delete_node(self, node):
+    """Delete node, which has at most one child, and replace it with its child, if any.
+
+    Return the element that had been stored at node.
+    """
     child = node._left if node._left else node._right  # might be None
     if child is not None:
       child._parent = node._parent   # child's grandparent becomes parent
@@ -172,7 +210,9 @@ class LinkedBinaryTree(BinaryTree):
         parent._left = child
       else:
         parent._right = child
+      self._adjust_sizes(parent, -1)
     self._size -= 1
+    self._version += 1
     node._parent = node              # convention for deprecated node
     return node._element
   
@@ -189,6 +229,8 @@ class LinkedBinaryTree(BinaryTree):
     if not type(self) is type(t1) is type(t2):    # all 3 trees must be same type
       raise TypeError('Tree types must match')
     self._size += len(t1) + len(t2)
+    self._adjust_sizes(node, len(t1) + len(t2))
+    self._version += 1
     if not t1.is_empty():         # attached t1 as left subtree of node
       t1._root._parent = node
       node._left = t1._root
@@ -0,0 +1,394 @@
+"""Log-structured sorted map, keeping recent updates in memory and older ones in sorted run files."""
+
+import heapq
+import os
+import threading
+from bisect import bisect_right
+from collections.abc import MutableMapping
+from avl_tree import AVLTreeMap
+from bloom_filter import BloomFilter, stable_hash
+from map_file import save_items, sync_directory, MappedTreeMap
+
+_FENCE_SPACING = 64               # keys per block of a run's sparse index
+_ABSENT = object()                # result of a lookup finding no record of a key
+
+class _Tombstone:
+  """Marker stored in place of a value to record the deletion of a key."""
+  __slots__ = ()
+
+  def __reduce__(self):
+    return '_TOMBSTONE'           # unpickles as the module's single instance
+
+_TOMBSTONE = _Tombstone()
+
+
+class _Run:
+  """Nonpublic view of an immutable run file, with a sparse index and a Bloom filter.
+
+  The file (name.tmap, in map_file format) holds the sorted records of a memtable
+  or of a compaction, and the filter of its keys is kept alongside (name.bloom).
+  The sparse index holds every _FENCE_SPACING-th key, so that a lookup reads at
+  most log2(_FENCE_SPACING) keys from the file.
+  """
+
+  def __init__(self, directory, name):
+    self._base = os.path.join(directory, name)
+    self.name = name
+    self._map = MappedTreeMap(self._base + '.tmap')
+    with open(self._base + '.bloom', 'rb') as f:
+      self._filter = BloomFilter.from_bytes(f.read(), stable_hash)
+    self._fences = [self._map._key(j) for j in range(0, len(self._map), _FENCE_SPACING)]
+
+  @classmethod
+  def create(cls, directory, name, items, capacity, error_rate):
+    """Write a run of the sorted (key,value) pairs of items, at most capacity; return it."""
+    bloom = BloomFilter(capacity, error_rate, stable_hash)
+    def filtered():
+      for pair in items:
+        bloom.add(pair[0])
+        yield pair
+    base = os.path.join(directory, name)
+    save_items(filtered(), base + '.tmap')       # synced, with its directory
+    with open(base + '.bloom', 'wb') as f:
+      f.write(bloom.to_bytes())
+      f.flush()
+      os.fsync(f.fileno())
+    sync_directory(directory)               # before any manifest may name the run
+    return cls(directory, name)
+
+  def __len__(self):
+    return len(self._map)
+
+  def get(self, k):
+    """Return value (or tombstone) recorded for key k, or _ABSENT if none."""
+    if k not in self._filter:
+      return _ABSENT
+    block = bisect_right(self._fences, k) - 1
+    if block < 0:
+      return _ABSENT
+    low = block * _FENCE_SPACING
+    high = min(low + _FENCE_SPACING, len(self._map))
+    j = self._map._bisect(k, False, low, high)
+    if j < high and self._map._key(j) == k:
+      return self._map._value(j)
+    return _ABSENT
+
+  def find_range(self, start, stop, reverse=False):
+    return self._map.find_range(start, stop, reverse)
+
+  def close(self):
+    """Release the memory map of the run file."""
+    self._map.close()
+
+  def remove(self):
+    """Delete the files of the run (which stays readable while mapped, on POSIX systems)."""
+    for suffix in ('.tmap', '.bloom'):
+      try:
+        os.remove(self._base + suffix)
+      except FileNotFoundError:
+        pass
+
+
+def _tagged(stream, tag):
+  for k, v in stream:
+    yield (k, tag, v)
+
+def _merge_streams(streams, reverse):
+  """Merge sorted (key,value) streams, ordered newest first, keeping the newest record per key."""
+  sign = -1 if reverse else 1               # newest stream must come first among equal keys
+  merged = heapq.merge(*[_tagged(stream, sign * j) for j, stream in enumerate(streams)],
+                       reverse=reverse)
+  last = _ABSENT
+  for k, tag, v in merged:
+    if last is _ABSENT or k != last:
+      yield (k, v)
+      last = k
+
+
+class LSMStore(MutableMapping):
+  """Persistent sorted map optimized for writes, organized as a log-structured merge tree.
+
+  Updates (and deletion markers) go to an AVLTreeMap memtable.  Once it holds
+  memtable_size keys, the memtable is written out as an immutable sorted run
+  file.  Lookups consult the memtable, then the runs from newest to oldest,
+  skipping each run whose Bloom filter rules the key out.
+
+  Runs are compacted in size tiers: tier 0 holds runs of up to memtable_size
+  keys, and each further tier runs up to max_runs times larger.  Once max_runs
+  adjacent runs share a tier, a background thread merges just those into one
+  run of the next tier, discarding overwritten values (and deletion markers, if
+  no older run remains).  So each record is rewritten about once per tier,
+  O(log(n / memtable_size) / log(max_runs)) times, rather than at every merge.
+
+  The list of live runs is kept in a MANIFEST file, which only ever names runs
+  already synced to disk, so a store reopened from the same directory sees all
+  flushed updates, even after a crash.  Updates still in the memtable are lost
+  if the process ends without flush or close (see WriteAheadLog).  An error in
+  the compaction thread is reported by the next flush.
+
+  Keys must be comparable and picklable, and hashable by stable_hash; values must
+  be picklable.  Apart from its compaction thread, a store must be used by one
+  thread at a time, and must not be modified while iterating over it.
+  """
+
+  def __init__(self, directory, memtable_size=65536, max_runs=4, error_rate=0.01,
+               background=True):
+    """Open (or create) the store kept in the given directory.
+
+    If background is False, runs are only merged by explicit calls to compact.
+    """
+    os.makedirs(directory, exist_ok=True)
+    self._directory = directory
+    self._memtable_size = memtable_size
+    self._max_runs = max_runs
+    self._error_rate = error_rate
+    self._memtable = AVLTreeMap()
+    self._lock = threading.Lock()           # guards _runs, _next_id and the manifest
+    self._wake = threading.Condition(self._lock)
+    self._compacting = threading.Lock()     # held by the one compaction in progress
+    self._closed = False
+    self._failure = None                    # error of the last background compaction, if it failed
+    self._runs = []                         # newest first; replaced, never modified
+    self._readers = 0                       # lookups and iterations in progress
+    self._retired = []                      # runs merged away, closed once no reader remains
+    self._next_id = 1
+    self._load_manifest()
+    self._worker = None
+    if background:
+      self._worker = threading.Thread(target=self._compaction_loop, daemon=True)
+      self._worker.start()
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _load_manifest(self):
+    """Open the runs listed in the manifest, and delete files of any other runs."""
+    path = os.path.join(self._directory, 'MANIFEST')
+    names = []
+    if os.path.exists(path):
+      with open(path) as f:
+        names = f.read().split()
+    for filename in os.listdir(self._directory):
+      if filename.startswith('run-'):
+        name = filename.split('.')[0]
+        self._next_id = max(self._next_id, int(name[4:]) + 1)
+        if name not in names:               # left behind by an interrupted flush or compaction
+          os.remove(os.path.join(self._directory, filename))
+    self._runs = [_Run(self._directory, name) for name in names]
+
+  def _write_manifest(self):
+    """Record the current runs in the manifest, atomically (lock must be held)."""
+    path = os.path.join(self._directory, 'MANIFEST')
+    with open(path + '.tmp', 'w') as f:
+      f.write('\n'.join(run.name for run in self._runs))
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    sync_directory(self._directory)
+
+  def _new_name(self):
+    """Return a new run name (lock must be held)."""
+    name = 'run-%08d' % self._next_id
+    self._next_id += 1
+    return name
+
+  def _tier(self, run):
+    """Return the size tier of run."""
+    tier, bound = 0, self._memtable_size
+    while len(run) > bound:
+      tier += 1
+      bound *= self._max_runs
+    return tier
+
+  def _select_runs(self, runs):
+    """Return (start,stop) of the newest max_runs or more adjacent runs sharing a tier, or None."""
+    start = 0
+    for stop in range(1, len(runs) + 1):
+      if stop == len(runs) or self._tier(runs[stop]) != self._tier(runs[start]):
+        if stop - start >= self._max_runs:
+          return (start, stop)
+        start = stop
+    return None
+
+  def _acquire_runs(self):
+    """Return the current runs, which stay open until the matching _release_runs."""
+    with self._lock:
+      self._readers += 1
+      return self._runs
+
+  def _release_runs(self):
+    with self._lock:
+      self._readers -= 1
+      if self._readers == 0:
+        self._close_retired()
+
+  def _close_retired(self):
+    """Close the runs merged away by compactions (lock must be held, with no readers)."""
+    for run in self._retired:
+      run.close()
+    self._retired = []
+
+  def _lookup(self, k):
+    """Return newest value (or tombstone) recorded for key k, or _ABSENT if none."""
+    v = self._memtable.get(k, _ABSENT)
+    if v is not _ABSENT:
+      return v
+    runs = self._acquire_runs()
+    try:
+      for run in runs:
+        v = run.get(k)
+        if v is not _ABSENT:
+          return v
+      return _ABSENT
+    finally:
+      self._release_runs()
+
+  def _write(self, k, v):
+    stable_hash(k)                          # raise TypeError now, rather than at the next flush
+    self._memtable[k] = v
+    if len(self._memtable) >= self._memtable_size:
+      self.flush()
+
+  def _compaction_loop(self):
+    while True:
+      with self._wake:
+        while not self._closed and (self._select_runs(self._runs) is None or self._failure is not None):
+          self._wake.wait()
+        if self._closed:
+          return
+      try:
+        self.compact()
+      except Exception as e:                # reported (and retried) by the next flush
+        with self._lock:
+          self._failure = e
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    v = self._lookup(k)
+    if v is _ABSENT or v is _TOMBSTONE:
+      raise KeyError('Key Error: ' + repr(k))
+    return v
+
+  def __contains__(self, k):
+    """Return True if the store has an item with key k."""
+    v = self._lookup(k)
+    return v is not _ABSENT and v is not _TOMBSTONE
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    self._write(k, v)
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found)."""
+    if k not in self:
+      raise KeyError('Key Error: ' + repr(k))
+    self._write(k, _TOMBSTONE)
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the store in order."""
+    for k, v in self.find_range(None, None):
+      yield k
+
+  def __len__(self):
+    """Return number of items in the store (this requires a scan of all items)."""
+    return sum(1 for k in self)
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the store in reverse order."""
+    for k, v in self.find_range(None, None, True):
+      yield k
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of store.
+    If stop is None, iteration continues through the maximum key of store.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    runs = self._acquire_runs()
+    try:
+      streams = [self._memtable.find_range(start, stop, reverse)]
+      streams += [run.find_range(start, stop, reverse) for run in runs]
+      for k, v in _merge_streams(streams, reverse):
+        if v is not _TOMBSTONE:
+          yield (k, v)
+    finally:
+      self._release_runs()
+
+  #--------------------- public methods for managing storage ---------------------
+  def flush(self):
+    """Write the contents of the memtable to a new run.
+
+    Raise RuntimeError, once the memtable is written, if a background compaction
+    has failed since the previous flush; the compaction is then tried again.
+    """
+    if not self._memtable.is_empty():
+      with self._lock:
+        name = self._new_name()
+      run = _Run.create(self._directory, name, self._memtable.find_range(None, None),
+                        len(self._memtable), self._error_rate)
+      with self._lock:
+        self._runs = [run] + self._runs
+        self._write_manifest()
+      self._memtable = AVLTreeMap()
+    with self._lock:
+      failure, self._failure = self._failure, None
+      self._wake.notify()
+    if failure is not None:
+      raise RuntimeError('background compaction failed') from failure
+
+  def compact(self, major=False):
+    """Merge the newest tier of max_runs or more runs of similar size into one run.
+
+    If major is True, merge all current runs into one instead.  Overwritten values
+    are discarded, and so are deletions if the oldest run is among those merged.
+    Return True if any runs were merged.
+    """
+    with self._compacting:
+      with self._lock:
+        runs = self._runs
+        selected = (0, len(runs)) if major else self._select_runs(runs)
+        if selected is None or selected[1] - selected[0] < 2:
+          return False
+        name = self._new_name()
+      start, stop = selected
+      merged = _merge_streams([run.find_range(None, None) for run in runs[start:stop]], False)
+      if stop == len(runs):                     # nothing older remains
+        merged = (pair for pair in merged if pair[1] is not _TOMBSTONE)
+      run = _Run.create(self._directory, name, merged,
+                        sum(len(run) for run in runs[start:stop]), self._error_rate)
+      with self._lock:
+        # runs flushed in the meantime were placed in front of those merged
+        offset = len(self._runs) - len(runs)
+        self._runs = self._runs[:offset + start] + [run] + self._runs[offset + stop:]
+        self._write_manifest()
+        self._retired.extend(runs[start:stop])
+        if self._readers == 0:
+          self._close_retired()
+      for old in runs[start:stop]:
+        old.remove()
+      return True
+
+  def close(self):
+    """Flush the memtable, stop the compaction thread and close the run files.
+
+    Raise RuntimeError if a background compaction has failed (see flush).
+    """
+    try:
+      self.flush()
+    finally:
+      with self._lock:
+        self._closed = True
+        self._wake.notify()
+      if self._worker is not None:
+        self._worker.join()
+      with self._lock:
+        for run in self._runs + self._retired:
+          run.close()
+        self._retired = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
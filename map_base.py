@@ -19,7 +19,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from collections import MutableMapping
+from collections.abc import MutableMapping
 
 class MapBase(MutableMapping):
   """Our own abstract base class that includes a nonpublic _Item class."""
@@ -41,3 +41,41 @@ class MapBase(MutableMapping):
 
     def __lt__(self, other):               
       return self._key < other._key    # compare items based on their keys
+
+
+class RankedMapMixin:
+  """Mixin for sorted maps that support len and rank (the number of keys less than k)."""
+  __slots__ = ()
+
+  def count_range(self, start, stop):
+    """Return the number of keys such that start <= key < stop.
+
+    If start is None, counting begins with minimum key of map.
+    If stop is None, counting continues through the maximum key of map.
+    """
+    high = len(self) if stop is None else self.rank(stop)
+    low = 0 if start is None else self.rank(start)
+    return max(high - low, 0)
+
+
+def sorted_pairs(items):
+  """Return list of the (key,value) pairs of items in increasing key order, without repeats.
+
+  items may be a mapping or an iterable of (key,value) pairs.  Pairs already in
+  increasing key order are taken in O(n) time; otherwise they are sorted first.
+  For repeated keys the last value wins.
+  """
+  if hasattr(items, 'keys'):                   # same convention as dict.update
+    items = items.items()
+  pairs = list(items)
+  for j in range(1, len(pairs)):
+    if pairs[j][0] < pairs[j-1][0]:            # input is not sorted
+      pairs.sort(key=lambda pair: pair[0])     # stable, so last value still wins
+      break
+  unique = []
+  for pair in pairs:                           # collapse runs of equal keys
+    if unique and not unique[-1][0] < pair[0]:
+      unique[-1] = pair
+    else:
+      unique.append(pair)
+  return unique
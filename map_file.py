@@ -0,0 +1,266 @@
+"""Compact binary files holding the items of a sorted map, used by TreeMap.save and load.
+
+A file consists of a fixed header, a table of offsets, and the pickled keys and
+values in increasing key order:
+
+  header   magic b'TMAP', format version (2 bytes), reserved (2 bytes), item count n (8 bytes)
+  table    2n+1 file offsets (8 bytes each); record j spans table[2j] to table[2j+2],
+           with its key ending (and its value starting) at table[2j+1]
+  records  pickle of key 0, pickle of value 0, pickle of key 1, ...
+
+All integers are little-endian.  The shape of a balanced tree is implied by the
+order of the keys (the median of any range is the root of its subtree), so no
+other structural information is stored: a tree is rebuilt in linear time, and a
+binary search over the offsets table visits the same keys a tree search would.
+
+Files are read with pickle, so they must only be loaded from trusted sources.
+"""
+
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+from collections.abc import Mapping
+from map_base import RankedMapMixin
+
+_MAGIC = b'TMAP'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHQ')
+_OFFSET = struct.Struct('<Q')
+
+def save_map(source, path):
+  """Write the items of sorted map source to the file at path.
+
+  source must support len and find_range, and its keys and values must be picklable.
+  """
+  save_items(source.find_range(None, None), path, len(source))
+
+def save_items(items, path, count=None):
+  """Write an iteration of (key,value) pairs in strictly increasing key order to path.
+
+  count is the number of pairs, if known.  Otherwise the records are first spooled
+  to a temporary file, as the offsets table precedes them.  The file is written
+  beside path, synced and then renamed over path, so that after a crash path holds
+  either its previous contents or all of the new ones.
+  """
+  temporary = path + '.tmp'
+  try:
+    with open(temporary, 'wb') as f:
+      _write_items(items, f, count)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(temporary, path)
+  except BaseException:
+    if os.path.exists(temporary):
+      os.remove(temporary)
+    raise
+  sync_directory(os.path.dirname(os.path.abspath(path)))
+
+def _write_items(items, f, count):
+  """Write header, offsets table and records for the pairs of items to file f."""
+  if count is None:
+    with tempfile.TemporaryFile() as spool:
+      offsets = _write_records(items, spool, 0)
+      spool.seek(0)
+      _write_table(f, offsets, True)
+      shutil.copyfileobj(spool, f)
+  else:
+    f.seek(_HEADER.size + (2*count + 1) * _OFFSET.size)   # table is written last
+    offsets = _write_records(items, f, f.tell())
+    if len(offsets) != 2*count + 1:
+      raise RuntimeError('map changed size during save')
+    f.seek(0)
+    _write_table(f, offsets, False)
+
+def _write_records(items, f, position):
+  """Write pickled keys and values to f, starting at given position; return their offsets."""
+  offsets = []
+  for key, value in items:
+    for part in (key, value):
+      offsets.append(position)
+      position += f.write(pickle.dumps(part, pickle.HIGHEST_PROTOCOL))
+  offsets.append(position)
+  return offsets
+
+def _write_table(f, offsets, relative):
+  """Write header and offsets table to f (shifting offsets past the table if relative)."""
+  n = (len(offsets) - 1) // 2
+  f.write(_HEADER.pack(_MAGIC, _VERSION, 0, n))
+  shift = _HEADER.size + len(offsets) * _OFFSET.size if relative else 0
+  f.write(struct.pack('<%dQ' % len(offsets), *[offset + shift for offset in offsets]))
+
+def sync_directory(directory):
+  """Make files created, renamed or removed in directory durable (where the platform supports it)."""
+  if hasattr(os, 'O_DIRECTORY'):
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+      os.fsync(fd)
+    finally:
+      os.close(fd)
+
+def _read_header(buffer):
+  """Return item count from header at start of buffer (raise ValueError if invalid)."""
+  if len(buffer) < _HEADER.size:
+    raise ValueError('not a map file')
+  magic, version, reserved, n = _HEADER.unpack_from(buffer, 0)
+  if magic != _MAGIC:
+    raise ValueError('not a map file')
+  if version != _VERSION:
+    raise ValueError('unsupported map file version: ' + repr(version))
+  return n
+
+def load_items(path):
+  """Return list of (key,value) pairs stored in the file at path, in key order."""
+  with open(path, 'rb') as f:
+    data = f.read()
+  n = _read_header(data)
+  offsets = struct.unpack_from('<%dQ' % (2*n + 1), data, _HEADER.size)
+  loads = pickle.loads
+  view = memoryview(data)
+  return [(loads(view[offsets[2*j]:offsets[2*j+1]]),
+           loads(view[offsets[2*j+1]:offsets[2*j+2]])) for j in range(n)]
+
+
+class MappedTreeMap(Mapping, RankedMapMixin):
+  """Read-only sorted map answering queries directly from a memory-mapped map file.
+
+  Opening the map reads only the header; keys and values are unpickled on demand,
+  so a search unpickles O(log n) keys.  Call close (or use a with statement) to
+  release the file.
+  """
+
+  def __init__(self, path):
+    """Open the map file at path (raise ValueError if it is not a valid map file)."""
+    with open(path, 'rb') as f:
+      self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    self._path = path
+    try:
+      self._size = _read_header(self._mmap)
+    except ValueError:
+      self._mmap.close()
+      raise
+
+  def close(self):
+    """Release the underlying memory map."""
+    self._mmap.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _offset(self, j):
+    return _OFFSET.unpack_from(self._mmap, _HEADER.size + j * _OFFSET.size)[0]
+
+  def _key(self, j):
+    """Return key of the j-th item."""
+    return pickle.loads(self._mmap[self._offset(2*j):self._offset(2*j+1)])
+
+  def _value(self, j):
+    """Return value of the j-th item."""
+    return pickle.loads(self._mmap[self._offset(2*j+1):self._offset(2*j+2)])
+
+  def _pair(self, j):
+    return (self._key(j), self._value(j)) if 0 <= j < self._size else None
+
+  def _bisect(self, k, inclusive, low=0, high=None):
+    """Return number of keys less than k (or less than or equal to k if inclusive).
+
+    The search may be confined to items low through high-1.
+    """
+    if high is None:
+      high = self._size
+    while low < high:
+      mid = (low + high) // 2
+      key = self._key(mid)
+      if key < k or (inclusive and key == k):
+        low = mid + 1
+      else:
+        high = mid
+    return low
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    return self._size
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    j = self._bisect(k, False)
+    if j == self._size or self._key(j) != k:
+      raise KeyError('Key Error: ' + repr(k))
+    return self._value(j)
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    j = self._bisect(k, False)
+    return j < self._size and self._key(j) == k
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map in order."""
+    for j in range(self._size):
+      yield self._key(j)
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the map in reverse order."""
+    for j in range(self._size - 1, -1, -1):
+      yield self._key(j)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    return self._pair(0)
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    return self._pair(self._size - 1)
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k (or None)."""
+    return self._pair(self._bisect(k, True) - 1)
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k (or None)."""
+    return self._pair(self._bisect(k, False) - 1)
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k (or None)."""
+    return self._pair(self._bisect(k, False))
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k (or None)."""
+    return self._pair(self._bisect(k, True))
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of map.
+    If stop is None, iteration continues through the maximum key of map.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    low = 0 if start is None else self._bisect(start, False)
+    high = self._size if stop is None else self._bisect(stop, False)
+    indices = range(high - 1, low - 1, -1) if reverse else range(low, high)
+    for j in indices:
+      yield self._pair(j)
+
+  #--------------------- public methods for order statistics ---------------------
+  def rank(self, k):
+    """Return the number of keys in the map that are strictly less than k."""
+    return self._bisect(k, False)
+
+  def select(self, i):
+    """Return (key,value) pair with the i-th smallest key (counting from 0).
+
+    Negative indices count from the end, as for a list.
+    Raise IndexError if i is out of range.
+    """
+    if i < 0:
+      i += self._size
+    if not 0 <= i < self._size:
+      raise IndexError('Index out of range: ' + repr(i))
+    return self._pair(i)
@@ -0,0 +1,93 @@
+"""Linear-time merging of sorted (key,value) streams, used by TreeMap set operations."""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from map_file import save_map, MappedTreeMap
+
+# for each operation: keep items found only in first, only in second, in both
+_OPERATIONS = {
+  'union':                (True, True, True),
+  'intersection':         (False, False, True),
+  'difference':           (True, False, False),
+  'symmetric_difference': (True, True, False),
+}
+
+def merge_items(first, second, operation, combine=None):
+  """Generate the (key,value) pairs resulting from a set operation on two sorted streams.
+
+  first and second must each be iterations of (key,value) pairs in increasing key
+  order, without repeated keys.  operation is one of 'union', 'intersection',
+  'difference' or 'symmetric_difference'.  For a key present in both streams the
+  value is combine(first_value, second_value), or second_value if combine is None.
+  """
+  only_first, only_second, both = _OPERATIONS[operation]
+  first, second = iter(first), iter(second)
+  a = next(first, None)
+  b = next(second, None)
+  while a is not None and b is not None:
+    if a[0] < b[0]:                           # key only in first
+      if only_first:
+        yield a
+      a = next(first, None)
+    elif b[0] < a[0]:                         # key only in second
+      if only_second:
+        yield b
+      b = next(second, None)
+    else:                                     # key in both
+      if both:
+        yield (a[0], combine(a[1], b[1]) if combine is not None else b[1])
+      a = next(first, None)
+      b = next(second, None)
+  while a is not None and only_first:         # leftovers of first
+    yield a
+    a = next(first, None)
+  while b is not None and only_second:        # leftovers of second
+    yield b
+    b = next(second, None)
+
+def _merge_partition(first_path, second_path, start, stop, operation, combine):
+  """Return list of merged pairs with start <= key < stop of two map files (run in a worker process)."""
+  with MappedTreeMap(first_path) as first, MappedTreeMap(second_path) as second:
+    return list(merge_items(first.find_range(start, stop), second.find_range(start, stop),
+                            operation, combine))
+
+def _map_path(source, directory, name):
+  """Return path of a map file holding the items of source, saving it in directory if need be."""
+  if isinstance(source, MappedTreeMap):
+    return source._path                       # already a file; read in place
+  path = os.path.join(directory, name)
+  save_map(source, path)
+  return path
+
+def merge_maps(first, second, operation, combine=None, processes=None):
+  """Return list of (key,value) pairs resulting from a set operation on two sorted maps.
+
+  Both maps must support find_range, and first must also support len and select.
+  If processes is greater than 1, the key space is cut into that many partitions
+  of first, which are merged in parallel by a ProcessPoolExecutor.  Each worker
+  receives only the bounds of its partition, and reads its items directly from
+  map files (see map_file): a MappedTreeMap is read in place, and any other map
+  is first saved to a temporary file.  Parallelism therefore pays off mainly when
+  both maps are MappedTreeMaps, such as those returned by TreeMap.load, so that no
+  item passes through this process.  Keys, values and combine must be picklable
+  (combine must be defined at module level).
+  """
+  if operation not in _OPERATIONS:
+    raise ValueError('Unknown operation: ' + repr(operation))
+  if processes is None or processes <= 1 or len(first) < processes:
+    return list(merge_items(first.find_range(None, None),
+                            second.find_range(None, None), operation, combine))
+  n = len(first)
+  bounds = [None] + [first.select(j * n // processes)[0] for j in range(1, processes)] + [None]
+  with tempfile.TemporaryDirectory() as directory:
+    first_path = _map_path(first, directory, 'first.tmap')
+    second_path = _map_path(second, directory, 'second.tmap')
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+      futures = [executor.submit(_merge_partition, first_path, second_path,
+                                 bounds[j], bounds[j+1], operation, combine)
+                 for j in range(processes)]
+      result = []
+      for future in futures:                  # partitions are already in key order
+        result.extend(future.result())
+  return result
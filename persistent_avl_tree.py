@@ -0,0 +1,281 @@
+from collections.abc import Mapping
+from avl_tree import AVLTreeMap
+from binary_search_tree import TreeMap
+from map_base import RankedMapMixin
+from tree_cursor import TreeCursor
+
+class PersistentAVLTreeMap(AVLTreeMap):
+  """AVL tree map supporting O(1) immutable snapshots through path copying.
+
+  Taking a snapshot freezes every node currently in the tree.  A later update
+  copies the frozen nodes it would modify (the O(log n) nodes on the path from
+  the root, plus those involved in rotations) instead of changing them, so each
+  snapshot keeps seeing the tree as it was when it was taken.
+
+  Snapshots traverse the tree using child links only.  The writer is free to
+  redirect the parent links of frozen nodes, which is what lets a copied node
+  share its subtrees with any number of snapshots.
+  """
+
+  _clock = 0                      # epoch shared by all maps; advanced by each snapshot
+
+  #-------------------------- nested _Node class --------------------------
+  class _Node(AVLTreeMap._Node):
+    """Node class records the epoch during which it was created."""
+    __slots__ = '_epoch'
+
+    def __init__(self, element, parent=None, left=None, right=None):
+      super().__init__(element, parent, left, right)
+      self._epoch = PersistentAVLTreeMap._clock
+
+  #------------------------------- map constructor -------------------------------
+  def __init__(self):
+    """Create an initially empty map."""
+    super().__init__()
+    self._frozen_before = 0       # nodes from an earlier epoch belong to snapshots
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _own(self, node):
+    """Return a version of node (and its ancestors) that may be modified in place.
+
+    If node is frozen, it is replaced within the tree by a copy, which is returned.
+    The original node is marked as deprecated, invalidating Positions that refer to it,
+    and cursors holding it re-seek before their next move.
+    """
+    if node._epoch >= self._frozen_before:          # created since last snapshot
+      return node                                   # ancestors are then unfrozen too
+    parent = node._parent
+    if parent is not None:
+      parent = self._own(parent)                    # copy path from the top down
+    copy = self._Node(node._element, parent, node._left, node._right)
+    copy._height = node._height
+    if parent is None:
+      self._root = copy
+    elif parent._left is node:
+      parent._left = copy
+    else:
+      parent._right = copy
+    for child in (node._left, node._right):         # snapshots never use these links
+      if child is not None:
+        child._parent = copy
+    node._parent = node                             # convention for deprecated node
+    self._version += 1                              # cursor paths may hold the original
+    return copy
+
+  def _subtree_root(self, node):
+    """Return root of the (possibly detached) tree containing node."""
+    while node._parent is not None:
+      node = node._parent
+    return node
+
+  def _freeze(self):
+    """Begin a new epoch, so that all nodes currently in the tree become frozen."""
+    PersistentAVLTreeMap._clock += 1
+    self._frozen_before = PersistentAVLTreeMap._clock
+
+  #--------------------- override mutators to copy frozen nodes ---------------------
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    if self._root is None:
+      self._rebalance_insert(self._add_root(self._Item(k,v)))
+      return
+    node = self._node_search(self._root, k)
+    key = node._element._key
+    if key == k:                                    # items are never modified in place,
+      self._own(node)._element = self._Item(k,v)    # as snapshots may share them
+    else:
+      child = self._add_child_node(self._own(node), self._Item(k,v), k < key)
+      self._rebalance_insert(self._make_position(child))
+
+  def _remove_node(self, node):
+    node = self._own(node)
+    if node._left is not None and node._right is not None:
+      self._own(self._node_last(node._left))        # replacement is modified as well
+    super()._remove_node(node)
+
+  def _restructure(self, x):
+    # x may lie off the updated path when rebalancing after a deletion
+    return super()._restructure(self._make_position(self._own(x._node)))
+
+  def _join_nodes(self, left, mid, right):
+    # copy the spine that the inherited join will descend and modify
+    left_height, right_height = self._node_height(left), self._node_height(right)
+    if left_height > right_height + 1:
+      walk = left
+      while self._node_height(walk._right) > right_height + 1:
+        walk = walk._right
+      left = self._subtree_root(self._own(walk))
+    elif right_height > left_height + 1:
+      walk = right
+      while self._node_height(walk._left) > left_height + 1:
+        walk = walk._left
+      right = self._subtree_root(self._own(walk))
+    return super()._join_nodes(left, mid, right)
+
+  def _split_nodes(self, node, k, inclusive=False):
+    # copy the search path that the inherited split will take apart
+    last = walk = node
+    while walk is not None:
+      last = walk
+      key = walk._element._key
+      walk = walk._right if key < k or (inclusive and key == k) else walk._left
+    if last is not None:
+      node = self._subtree_root(self._own(last))
+    return super()._split_nodes(node, k, inclusive)
+
+  def split(self, k):
+    left, right = super().split(k)
+    left._frozen_before = right._frozen_before = self._frozen_before
+    return left, right
+
+  def join(self, other):
+    if type(self) is type(other):                   # both sets of frozen nodes persist
+      self._frozen_before = max(self._frozen_before, other._frozen_before)
+    super().join(other)
+
+  #--------------------- public methods for snapshots ---------------------
+  def snapshot(self):
+    """Return an immutable TreeSnapshot of the current contents of the map, in O(1) time.
+
+    Later updates to the map are not visible through the snapshot, which may be read
+    by other threads while this map continues to be modified.
+    """
+    snap = TreeSnapshot(self._root, self._size)
+    self._freeze()
+    return snap
+
+
+class TreeSnapshot(Mapping, RankedMapMixin):
+  """Read-only sorted map over a frozen tree of a PersistentAVLTreeMap."""
+
+  def __init__(self, root, size):
+    """Constructor should not be invoked by user."""
+    self._root = root
+    self._size = size
+    self._version = 0                   # never changes, for the benefit of cursors
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _bound(self, k, forward, inclusive):
+    """Return (key,value) pair nearest to k in the given direction (or None)."""
+    best = None
+    node = self._root
+    while node is not None:
+      key = node._element._key
+      if forward:
+        if key < k or (not inclusive and key == k):
+          node = node._right
+        else:
+          best, node = node, node._left
+      else:
+        if k < key or (not inclusive and key == k):
+          node = node._left
+        else:
+          best, node = node, node._right
+    return (best._element._key, best._element._value) if best is not None else None
+
+  def _scan(self, reverse, extract):
+    """Generate extracted items of the whole snapshot, in the given order."""
+    cursor = self.cursor()
+    if not reverse:
+      item = cursor.next()
+      while item is not None:
+        yield extract(item)
+        item = cursor.next()
+    else:
+      cursor.seek_last()
+      item = cursor.item()
+      while item is not None:
+        yield extract(item)
+        item = cursor.prev()
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the snapshot."""
+    return self._size
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    node = self._root
+    while node is not None:
+      key = node._element._key
+      if k == key:
+        return node._element._value
+      node = node._left if k < key else node._right
+    raise KeyError('Key Error: ' + repr(k))
+
+  def __contains__(self, k):
+    """Return True if the snapshot has an item with key k."""
+    try:
+      self[k]
+    except KeyError:
+      return False
+    return True
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the snapshot in order."""
+    return self._scan(False, lambda item: item[0])
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def __reversed__(self):
+    """Generate an iteration of all keys in the snapshot in reverse order."""
+    return self._scan(True, lambda item: item[0])
+
+  def cursor(self):
+    """Return a new TreeCursor over the snapshot, positioned before its first item."""
+    return TreeCursor(self)
+
+  def find_min(self):
+    """Return (key,value) pair with minimum key (or None if empty)."""
+    return self.cursor().next()
+
+  def find_max(self):
+    """Return (key,value) pair with maximum key (or None if empty)."""
+    cursor = self.cursor()
+    cursor.seek_last()
+    return cursor.item()
+
+  def find_le(self, k):
+    """Return (key,value) pair with greatest key less than or equal to k (or None)."""
+    return self._bound(k, False, True)
+
+  def find_lt(self, k):
+    """Return (key,value) pair with greatest key strictly less than k (or None)."""
+    return self._bound(k, False, False)
+
+  def find_ge(self, k):
+    """Return (key,value) pair with least key greater than or equal to k (or None)."""
+    return self._bound(k, True, True)
+
+  def find_gt(self, k):
+    """Return (key,value) pair with least key strictly greater than k (or None)."""
+    return self._bound(k, True, False)
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop.
+
+    If start is None, iteration begins with minimum key of snapshot.
+    If stop is None, iteration continues through the maximum key of snapshot.
+    If reverse is True, the pairs are reported in decreasing order of key.
+    """
+    cursor = self.cursor()
+    if not reverse:
+      if start is not None:
+        cursor.seek(start)
+      item = cursor.item() if start is not None else cursor.next()
+      while item is not None and (stop is None or item[0] < stop):
+        yield item
+        item = cursor.next()
+    else:
+      if stop is not None:
+        cursor.seek(stop)
+        item = cursor.prev()
+      else:
+        cursor.seek_last()
+        item = cursor.item()
+      while item is not None and (start is None or not item[0] < start):
+        yield item
+        item = cursor.prev()
+
+  # order statistics depend only on child links and subtree sizes
+  rank = TreeMap.rank
+  select = TreeMap.select
@@ -0,0 +1,38 @@
+from binary_search_tree import TreeMap
+
+class SplayTreeMap(TreeMap):
+  """Sorted map implementation using a splay tree.
+
+  Each accessed, inserted or updated item is moved to the root, and so is the
+  parent of a removed one.  Repeated accesses to a small set of keys are therefore
+  very fast, and any sequence of operations takes O(log n) amortized time each.
+  """
+
+  #--------------------------------- splay operation --------------------------------
+  def _splay(self, p):
+    x = p._node
+    while x._parent is not None:
+      parent = x._parent
+      grand = parent._parent
+      if grand is None:
+        # zig case
+        self._rotate(p)
+      elif (parent is grand._left) == (x is parent._left):
+        # zig-zig case
+        self._rotate(self._make_position(parent))   # move PARENT up
+        self._rotate(p)                             # then move p up
+      else:
+        # zig-zag case
+        self._rotate(p)                             # move p up
+        self._rotate(p)                             # move p up again
+
+  #---------------------------- override balancing hooks ----------------------------
+  def _rebalance_insert(self, p):
+    self._splay(p)
+
+  def _rebalance_delete(self, p):
+    if p is not None:
+      self._splay(p)
+
+  def _access_node(self, node):
+    self._splay(self._make_position(node))
@@ -0,0 +1,69 @@
+import contextlib
+import io
+import random
+import unittest
+
+with contextlib.redirect_stdout(io.StringIO()):      # the module prints a demonstration
+  from AVL import AVL
+
+def check_balance_factors(tree):
+  """Assert parent links, order and balance factors of an AVL tree; return its height."""
+  def walk(node, parent, lo, hi):
+    if node is None:
+      return -1
+    assert node.parent is parent, 'broken parent link'
+    assert lo is None or lo < node.element, 'elements out of order'
+    assert hi is None or node.element < hi, 'elements out of order'
+    left = walk(node.left, node, lo, node.element)
+    right = walk(node.right, node, node.element, hi)
+    assert node.balanceFactor == left - right, 'wrong balance factor'
+    assert abs(node.balanceFactor) <= 1, 'unbalanced'
+    return 1 + max(left, right)
+  return walk(tree.root, None, None, None)
+
+
+class TestAVL(unittest.TestCase):
+
+  def test_random_inserts_and_deletes(self):
+    random.seed(16)
+    tree = AVL()
+    present = set()
+    for j in range(3000):
+      k = random.randint(0, 300)
+      if random.random() < 0.6:
+        tree.insert(k)
+        present.add(k)
+      elif k in present:
+        tree.delete(tree.search(k))
+        present.remove(k)
+      else:
+        self.assertIsNone(tree.search(k))
+      if j % 100 == 0:
+        check_balance_factors(tree)
+    height = check_balance_factors(tree)
+    self.assertLessEqual(height, 1.45 * len(present).bit_length())
+    for k in present:
+      self.assertEqual(tree.search(k).element, k)
+
+  def test_heights_follow_balance_factors(self):
+    tree = AVL()
+    for k in range(100):
+      tree.insert(k)
+    node = tree.root
+    self.assertEqual(node._height(), check_balance_factors(tree))
+    self.assertEqual(node.left_height() - node.right_height(), node.balanceFactor)
+    tree.recompute_balanceFactor(tree.search(0))     # recomputing changes nothing
+    check_balance_factors(tree)
+
+  def test_delete_down_to_empty(self):
+    tree = AVL()
+    for k in range(50):
+      tree.insert(k)
+    for k in random.sample(range(50), 50):
+      tree.delete(tree.search(k))
+      check_balance_factors(tree)
+    self.assertIsNone(tree.root)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,54 @@
+import random
+import unittest
+from aggregate_tree import AggregateTreeMap, MinTreeMap, MaxTreeMap
+from test_binary_search_tree import check_tree
+
+class LastValueTreeMap(AggregateTreeMap):
+  """Aggregate reporting the value of the greatest key (associative, not commutative)."""
+
+  def combine(self, a, b):
+    return b
+
+
+class TestAggregateTreeMap(unittest.TestCase):
+
+  def test_aggregates_follow_random_updates(self):
+    random.seed(4)
+    for cls, combine in ((AggregateTreeMap, sum), (MinTreeMap, min), (MaxTreeMap, max)):
+      tree, expected = cls(), {}
+      for j in range(400):
+        k = random.randint(0, 100)
+        if k in expected and random.random() < 0.4:
+          del tree[k]
+          del expected[k]
+        else:
+          tree[k] = expected[k] = random.randint(-1000, 1000)
+        check_tree(tree)
+        start, stop = sorted(random.sample(range(-5, 106), 2))
+        values = [v for key, v in expected.items() if start <= key < stop]
+        self.assertEqual(tree.aggregate(start, stop), combine(values) if values else None)
+        self.assertEqual(tree.aggregate(), combine(expected.values()) if expected else None)
+
+  def test_aggregates_after_bulk_operations(self):
+    tree = AggregateTreeMap.from_sorted((k, k) for k in range(100))
+    tree.delete_range(10, 20)
+    tree.update_sorted((k, 1) for k in range(50, 60))
+    left, right = tree.split(40)
+    self.assertEqual(left.aggregate(), sum(range(10)) + sum(range(20, 40)))
+    self.assertEqual(right.aggregate(), sum(range(40, 50)) + 10 + sum(range(60, 100)))
+    left.join(right)
+    self.assertEqual(left.aggregate(30, 55), sum(range(30, 50)) + 5)
+
+  def test_custom_combine_survives_new_maps(self):
+    tree = LastValueTreeMap.from_sorted((k, str(k)) for k in range(50))
+    tree[20] = 'twenty'
+    self.assertEqual(tree.aggregate(10, 21), 'twenty')
+    self.assertEqual(tree.aggregate(10, 30), '29')
+    left, right = tree.split(25)
+    self.assertIsInstance(left, LastValueTreeMap)
+    self.assertEqual(left.aggregate(), '24')
+    self.assertEqual(right.aggregate(None, 26), '25')
+
+
+if __name__ == '__main__':
+  unittest.main()
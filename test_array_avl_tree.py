@@ -0,0 +1,203 @@
+import os
+import random
+import tempfile
+import unittest
+from array_avl_tree import ArrayAVLTreeMap
+from avl_tree import AVLTreeMap
+
+def check_arrays(tree):
+  """Assert the structural invariants of an ArrayAVLTreeMap; return its height."""
+  def walk(j, parent, lo, hi):
+    if j == -1:
+      return 0, 0
+    assert tree._parent[j] == parent, 'broken parent link'
+    key = tree._keys[j]
+    assert lo is None or lo < key, 'keys out of order'
+    assert hi is None or key < hi, 'keys out of order'
+    left_count, left_height = walk(tree._left[j], j, lo, key)
+    right_count, right_height = walk(tree._right[j], j, key, hi)
+    assert tree._count[j] == 1 + left_count + right_count, 'wrong subtree size'
+    assert tree._height[j] == 1 + max(left_height, right_height), 'wrong height'
+    assert abs(left_height - right_height) <= 1, 'unbalanced'
+    return 1 + left_count + right_count, 1 + max(left_height, right_height)
+  count, height = walk(tree._root, -1, None, None)
+  assert count == len(tree), 'wrong size'
+  return height
+
+
+class TestArrayAVLTreeMap(unittest.TestCase):
+
+  def test_random_updates_match_avl_tree(self):
+    random.seed(6)
+    tree, expected = ArrayAVLTreeMap(), AVLTreeMap()
+    for j in range(3000):
+      k = random.randint(0, 300)
+      if random.random() < 0.6:
+        tree[k] = expected[k] = j
+      elif k in expected:
+        del tree[k]
+        del expected[k]
+    check_arrays(tree)
+    self.assertEqual(list(tree.items()), list(expected.items()))
+    for k in range(-1, 302):
+      self.assertEqual(tree.find_lt(k), expected.find_lt(k))
+      self.assertEqual(tree.find_ge(k), expected.find_ge(k))
+      self.assertEqual(tree.count_range(k, k + 20), expected.count_range(k, k + 20))
+    self.assertEqual(list(tree.find_range(50, 150, True)), list(expected.find_range(50, 150, True)))
+    self.assertEqual(list(tree.find_range(None, None, True)), list(expected.items())[::-1])
+
+  def test_batched_lookups_and_updates(self):
+    tree = ArrayAVLTreeMap.from_sorted((k, k) for k in range(0, 1000, 2))
+    self.assertEqual(tree.get_many([4, 5, 998, -1], 'none'), [4, 'none', 998, 'none'])
+    self.assertEqual(tree.contains_many([4, 5]), [True, False])
+    expected = dict(tree.items())
+    for size in (1, 10, 2000):
+      batch = [(random.randint(-10, 1010), size) for j in range(size)]
+      tree.update_sorted(batch)
+      expected.update(batch)
+      check_arrays(tree)
+      self.assertEqual(list(tree.items()), sorted(expected.items()))
+    with self.assertRaises(TypeError):
+      tree.update_sorted([('a', 1)])
+    self.assertEqual(list(tree.items()), sorted(expected.items()))
+
+  def test_delete_range_and_truncate(self):
+    for n in (10, 1000):                              # small and large removals
+      tree = ArrayAVLTreeMap.from_sorted((k, k) for k in range(n))
+      expected = AVLTreeMap.from_sorted((k, k) for k in range(n))
+      for operation in (lambda m: m.delete_range(2, 5), lambda m: m.truncate_before(1),
+                        lambda m: m.truncate_after(n - 3), lambda m: m.delete_range(n // 2, None),
+                        lambda m: m.delete_range(7, 3)):
+        self.assertEqual(operation(tree), operation(expected))
+        check_arrays(tree)
+        self.assertEqual(list(tree.items()), list(expected.items()))
+      with self.assertRaises(TypeError):
+        tree.delete_range('a', None)
+      self.assertEqual(len(tree), len(expected))
+
+  def test_set_operations(self):
+    first = ArrayAVLTreeMap.from_sorted((k, 'a') for k in range(0, 30, 2))
+    second = ArrayAVLTreeMap.from_sorted((k, 'b') for k in range(0, 30, 3))
+    union = first.union(second, lambda a, b: a + b)
+    self.assertIsInstance(union, ArrayAVLTreeMap)
+    self.assertEqual(union[6], 'ab')
+    self.assertEqual(list(first.intersection(second)), [0, 6, 12, 18, 24])
+    self.assertEqual(len(first.difference(second)), 10)
+    self.assertEqual(len(first.symmetric_difference(second)), 15)
+
+  def test_save_load_and_freeze(self):
+    tree = ArrayAVLTreeMap.from_sorted((k, str(k)) for k in range(100))
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'array.tmap')
+      tree.save(path)
+      loaded = ArrayAVLTreeMap.load(path, mmap=False)
+    self.assertIsInstance(loaded, ArrayAVLTreeMap)
+    self.assertEqual(list(loaded.items()), list(tree.items()))
+    self.assertEqual(tree.freeze().get_many([5, 500]), ['5', None])
+
+  def test_positions(self):
+    tree = ArrayAVLTreeMap.from_sorted((k, k) for k in range(10))
+    p = tree.find_position(4)
+    self.assertEqual((p.key(), p.value()), (4, 4))
+    self.assertEqual(tree.after(p).key(), 5)
+    self.assertEqual(tree.before(p).key(), 3)
+    self.assertEqual(p, tree.find_position(4))
+    self.assertIn(tree.find_position(4.5).key(), (4, 5))   # a neighbor
+    self.assertIsNone(tree.before(tree.first()))
+    self.assertIsNone(tree.after(tree.last()))
+    tree.delete(p)
+    self.assertNotIn(4, tree)
+    check_arrays(tree)
+    tree[4] = 'again'                                 # may reuse the slot of p
+    with self.assertRaises(ValueError):
+      tree.before(p)
+    with self.assertRaises(ValueError):
+      tree.delete(p)
+    q = tree.find_position(7)
+    tree.bulk_load((k, k) for k in range(10))
+    with self.assertRaises(ValueError):
+      q.key()
+    with self.assertRaises(ValueError):
+      ArrayAVLTreeMap().delete(tree.first())
+    self.assertIsNone(ArrayAVLTreeMap().first())
+
+  def test_split_then_join(self):
+    for k in (0, 100, 700, 1000, 2000):
+      tree = ArrayAVLTreeMap.from_sorted((j, j) for j in range(1000))
+      left, right = tree.split(k)
+      self.assertEqual(len(tree), 0)
+      check_arrays(left)
+      check_arrays(right)
+      self.assertEqual(list(left), list(range(min(k, 1000))))
+      self.assertEqual(list(right), list(range(min(k, 1000), 1000)))
+      right.join(left)
+      check_arrays(right)
+      self.assertEqual(list(right.items()), [(j, j) for j in range(1000)])
+      self.assertEqual(len(left), 0)
+    with self.assertRaises(TypeError):
+      right.split('a')
+    self.assertEqual(len(right), 1000)
+
+  def test_join_rejects_overlapping_ranges(self):
+    first = ArrayAVLTreeMap.from_sorted((k, k) for k in range(10))
+    second = ArrayAVLTreeMap.from_sorted((k, k) for k in range(5, 15))
+    with self.assertRaises(ValueError):
+      first.join(second)
+    self.assertEqual(len(first), 10)
+    self.assertEqual(len(second), 10)
+
+  def test_key_filter(self):
+    tree = ArrayAVLTreeMap.from_sorted((k, k) for k in range(0, 200, 2))
+    tree.enable_filter(0.01)
+    for k in range(200, 400, 2):
+      tree[k] = k
+    self.assertTrue(all(k in tree for k in range(0, 400, 2)))
+    self.assertLess(sum(k in tree.key_filter() for k in range(1, 400, 2)), 20)
+    for k in range(0, 380, 2):
+      del tree[k]
+    self.assertLessEqual(len(tree.key_filter()), 2 * len(tree) + 64)   # rebuilt once stale
+    small = ArrayAVLTreeMap.from_sorted((k, k) for k in range(1000, 1005))
+    tree.join(small)
+    self.assertEqual([k in tree for k in (380, 1004, 1005)], [True, True, False])
+    tree.join(ArrayAVLTreeMap.from_sorted((k, k) for k in range(2000, 2500)))   # the larger map
+    self.assertTrue(all(k in tree for k in list(range(380, 400, 2)) + list(range(2000, 2500))))
+    with self.assertRaises(KeyError):
+      tree[381]
+    left, right = tree.split(2100)
+    self.assertTrue(all(k in left for k in range(2000, 2100)))
+    self.assertTrue(all(k in right for k in range(2100, 2500)))
+    self.assertEqual(len(left.key_filter()), len(left))
+    self.assertEqual(len(right.key_filter()), len(right))
+
+
+class TestArrayTreeCursor(unittest.TestCase):
+
+  def test_paging_in_both_directions(self):
+    tree = ArrayAVLTreeMap.from_sorted((k, k) for k in range(10))
+    cursor = tree.cursor()
+    self.assertEqual(cursor.items(4), [(0, 0), (1, 1), (2, 2), (3, 3)])
+    self.assertEqual(cursor.keys(3), [4, 5, 6])
+    self.assertEqual(cursor.prev(), (6, 6))
+    self.assertEqual(cursor.values(3, reverse=True), [6, 5, 4])
+    self.assertTrue(cursor.seek_last())
+    self.assertIsNone(cursor.next())
+    self.assertEqual(cursor.prev(), (9, 9))
+
+  def test_cursor_after_mutation(self):
+    tree = ArrayAVLTreeMap.from_sorted((k, k) for k in range(0, 20, 2))
+    cursor = tree.cursor()
+    cursor.seek(6)
+    tree[6] = 'new'                                   # value replaced in place
+    tree[7] = 7                                       # rotations move no keys
+    self.assertEqual(cursor.item(), (6, 'new'))
+    self.assertEqual(cursor.next(), (7, 7))
+    del tree[7]                                       # current item removed
+    del tree[4]                                       # ... and a slot reused by another key
+    self.assertEqual(cursor.next(), (8, 8))
+    self.assertEqual(cursor.prev(), (6, 'new'))
+    tree.bulk_load((k, -k) for k in range(5))
+    self.assertEqual(cursor.prev(), (4, -4))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,337 @@
+import random
+import sys
+import unittest
+from binary_search_tree import TreeMap
+from avl_tree import AVLTreeMap
+from splay_tree import SplayTreeMap
+
+def check_tree(tree):
+  """Assert the structural invariants of tree (order, links, sizes, AVL heights)."""
+  def walk(node, parent, lo, hi):
+    if node is None:
+      return 0, 0
+    assert node._parent is parent, 'broken parent link'
+    key = node._element._key
+    assert lo is None or lo < key, 'keys out of order'
+    assert hi is None or key < hi, 'keys out of order'
+    left_count, left_height = walk(node._left, node, lo, key)
+    right_count, right_height = walk(node._right, node, key, hi)
+    assert node._size == 1 + left_count + right_count, 'wrong subtree size'
+    if hasattr(node, '_height'):
+      assert node._height == 1 + max(left_height, right_height), 'wrong height'
+      assert abs(left_height - right_height) <= 1, 'unbalanced'
+    return 1 + left_count + right_count, 1 + max(left_height, right_height)
+  count, height = walk(tree._root, None, None, None)
+  assert count == len(tree), 'wrong size'
+  return height
+
+
+class TestBulkConstruction(unittest.TestCase):
+
+  def test_sorted_input_builds_balanced_tree(self):
+    for cls in (TreeMap, AVLTreeMap):
+      for n in (0, 1, 2, 3, 10, 1000):
+        tree = cls.from_sorted((k, 2*k) for k in range(n))
+        height = check_tree(tree)
+        self.assertEqual(list(tree), list(range(n)))
+        self.assertEqual(height, n.bit_length())
+        self.assertEqual([tree[k] for k in range(n)], [2*k for k in range(n)])
+
+  def test_unsorted_input_and_repeated_keys(self):
+    random.seed(1)
+    pairs = [(random.randint(0, 50), j) for j in range(300)]
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls.from_sorted(pairs)
+      check_tree(tree)
+      self.assertEqual(dict(tree.items()), dict(pairs))   # last value wins
+
+  def test_mapping_input(self):
+    tree = AVLTreeMap.from_sorted({'b': 2, 'a': 1, 'c': 3})
+    self.assertEqual(list(tree.items()), [('a', 1), ('b', 2), ('c', 3)])
+
+  def test_bulk_load_replaces_contents(self):
+    tree = AVLTreeMap()
+    for k in range(20):
+      tree[k] = k
+    tree.bulk_load([(100, 'x'), (101, 'y')])
+    self.assertEqual(list(tree.items()), [(100, 'x'), (101, 'y')])
+
+  def test_updates_after_bulk_load_keep_tree_balanced(self):
+    random.seed(2)
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(0, 200, 2))
+    for j in range(300):
+      tree[random.randint(-50, 250)] = j
+      k = random.randint(-50, 250)
+      if k in tree:
+        del tree[k]
+      check_tree(tree)
+
+
+class TestLookupsAndUpdates(unittest.TestCase):
+
+  def test_random_operations_against_dict(self):
+    random.seed(9)
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls()
+      expected = {}
+      for j in range(2000):
+        k = random.randint(0, 100)
+        if random.random() < 0.6:
+          tree[k] = j
+          expected[k] = j
+        elif random.random() < 0.5:
+          self.assertEqual(k in tree, k in expected)
+          self.assertEqual(tree.get(k), expected.get(k))
+        elif k in expected:
+          del tree[k]
+          del expected[k]
+        else:
+          with self.assertRaises(KeyError):
+            del tree[k]
+      check_tree(tree)
+      ordered = sorted(expected)
+      self.assertEqual(list(tree), ordered)
+      self.assertEqual(list(reversed(tree)), ordered[::-1])
+      for k in range(-1, 102):
+        self.assertEqual(tree.find_le(k), max(((key, expected[key]) for key in ordered if key <= k), default=None))
+        self.assertEqual(tree.find_gt(k), min(((key, expected[key]) for key in ordered if key > k), default=None))
+
+  def test_positions(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(10))
+    p = tree.find_position(4)
+    self.assertEqual(p.key(), 4)
+    self.assertEqual(tree.after(p).key(), 5)
+    self.assertEqual(tree.before(p).key(), 3)
+    self.assertIn(tree.find_position(4.5).key(), (4, 5))   # a neighbor
+    self.assertIsNone(tree.before(tree.first()))
+    tree.delete(p)
+    self.assertNotIn(4, tree)
+    check_tree(tree)
+
+  def test_degenerate_tree_does_not_recurse(self):
+    tree = TreeMap()
+    n = 3 * sys.getrecursionlimit()
+    for k in range(n):                                # a single path of n nodes
+      tree[k] = k
+    self.assertEqual(tree[n - 1], n - 1)
+    self.assertEqual(tree.find_lt(n), (n - 1, n - 1))
+    self.assertEqual(tree.rank(n), n)
+    for k in range(n - 1, n // 2, -1):
+      del tree[k]
+    self.assertEqual(len(tree), n // 2 + 1)
+
+  def test_lookups_create_no_positions(self):
+    tree = TreeMap.from_sorted((k, k) for k in range(0, 100, 2))
+    def fail(node):
+      raise AssertionError('Position created')
+    tree._make_position = fail
+    self.assertEqual(tree[40], 40)
+    self.assertNotIn(41, tree)
+    self.assertEqual(tree.find_ge(41), (42, 42))
+    tree[40] = 'forty'                                # replaces the value in place
+    with self.assertRaises(KeyError):
+      del tree[41]
+    self.assertEqual(tree.get(40), 'forty')
+
+
+class TestOrderStatistics(unittest.TestCase):
+
+  def test_rank_select_and_count_range_after_updates(self):
+    random.seed(8)
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls()
+      keys = set()
+      for j in range(1500):
+        k = random.randint(0, 200)
+        if random.random() < 0.6:
+          tree[k] = j
+          keys.add(k)
+        elif k in keys:
+          del tree[k]
+          keys.remove(k)
+      check_tree(tree)
+      ordered = sorted(keys)
+      self.assertEqual([tree.select(i)[0] for i in range(len(ordered))], ordered)
+      self.assertEqual(tree.select(-1)[0], ordered[-1])
+      for k in range(-1, 202, 7):
+        self.assertEqual(tree.rank(k), sum(1 for key in ordered if key < k))
+        self.assertEqual(tree.count_range(k, k + 30), sum(1 for key in ordered if k <= key < k + 30))
+      self.assertEqual(tree.count_range(None, None), len(ordered))
+      self.assertEqual(tree.count_range(100, 50), 0)
+
+  def test_select_out_of_range(self):
+    tree = TreeMap.from_sorted((k, k) for k in range(3))
+    for i in (3, -4):
+      with self.assertRaises(IndexError):
+        tree.select(i)
+
+
+class TestBatchedLookups(unittest.TestCase):
+
+  def test_get_many_matches_single_lookups(self):
+    random.seed(13)
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls.from_sorted((k, str(k)) for k in range(0, 1000, 3))
+      keys = [random.randint(-10, 1010) for j in range(300)] + [3, 3, 6]
+      self.assertEqual(tree.get_many(keys, 'none'), [tree.get(k, 'none') for k in keys])
+      self.assertEqual(tree.contains_many(keys), [k in tree for k in keys])
+      self.assertEqual(tree.get_many([]), [])
+    self.assertEqual(AVLTreeMap().get_many([1, 2]), [None, None])
+
+  def test_get_many_does_not_restructure(self):
+    tree = SplayTreeMap.from_sorted((k, k) for k in range(100))
+    root = tree._root
+    self.assertEqual(tree.get_many([5, 95, 50]), [5, 95, 50])
+    self.assertIs(tree._root, root)
+
+
+class TestKeyFilter(unittest.TestCase):
+
+  def test_filter_never_hides_a_key(self):
+    random.seed(14)
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(50))
+    tree.enable_filter(0.05, capacity=16)            # too small; rebuilt as keys are added
+    expected = dict(tree.items())
+    for j in range(3000):
+      k = random.randint(0, 2000)
+      if random.random() < 0.7:
+        tree[k] = j
+        expected[k] = j
+      elif k in expected:
+        del tree[k]
+        del expected[k]
+      if j % 500 == 0:
+        tree.update_sorted((random.randint(0, 2000), j) for i in range(random.choice([3, 1000])))
+        expected = dict(tree.items())
+    self.assertGreater(tree.key_filter().capacity(), len(tree))
+    for k in range(2001):
+      self.assertEqual(k in tree, k in expected)
+      self.assertEqual(tree.get(k), expected.get(k))
+
+  def test_bulk_load_and_disable(self):
+    tree = TreeMap()
+    tree.enable_filter()
+    tree.bulk_load((k, k) for k in range(0, 100, 2))
+    self.assertTrue(all(k in tree for k in range(0, 100, 2)))
+    self.assertLessEqual(sum(1 for k in range(1, 100, 2) if k in tree.key_filter()), 10)
+    tree.disable_filter()
+    self.assertIsNone(tree.key_filter())
+    self.assertIn(2, tree)
+
+  def test_small_batch_adds_only_new_keys(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(1000))
+    tree.enable_filter()
+    tree.update_sorted([(5, 'a'), (500, 'b'), (1500, 'c')])
+    self.assertEqual(len(tree.key_filter()), 1001)
+    self.assertEqual([tree[5], tree[500], tree[1500]], ['a', 'b', 'c'])
+
+  def test_split_and_join_keep_filters(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(0, 400, 2))
+    tree.enable_filter(0.02)
+    left, right = tree.split(100)
+    for half, keys in ((left, range(0, 100, 2)), (right, range(100, 400, 2))):
+      self.assertEqual(half.key_filter().error_rate(), 0.02)
+      self.assertEqual(len(half.key_filter()), len(keys))
+      self.assertTrue(all(k in half for k in keys))
+      self.assertLess(sum(k in half.key_filter() for k in range(1, 400, 2)), 20)
+    left.enable_filter(capacity=len(left))            # full, so the join must rebuild it
+    left.join(right)
+    self.assertTrue(all(k in left for k in range(0, 400, 2)))
+    self.assertGreater(left.key_filter().capacity(), len(left))
+
+
+class TestUpdateSorted(unittest.TestCase):
+
+  def test_small_and_large_batches(self):
+    random.seed(3)
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls.from_sorted((k, k) for k in range(0, 2000, 2))
+      expected = dict(tree.items())
+      for size in (1, 5, 50, 3000):
+        batch = [(random.randint(-100, 2100), size) for j in range(size)]
+        tree.update_sorted(batch)
+        expected.update(batch)
+        check_tree(tree)
+        self.assertEqual(dict(tree.items()), expected)
+
+  def test_incomparable_keys_leave_map_intact(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(100))
+    for batch in ([('x', 1)], [(1, 1), ('x', 2)], [('x', j) for j in range(200)]):
+      with self.assertRaises(TypeError):
+        tree.update_sorted(batch)
+      self.assertEqual(len(tree), 100)
+      check_tree(tree)
+    self.assertEqual(list(tree.items()), [(k, k) for k in range(100)])
+
+  def test_positions_become_invalid_after_rebuild(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(10))
+    p = tree.find_position(5)
+    tree.update_sorted((k, -k) for k in range(10, 30))     # large batch: rebuilt
+    with self.assertRaises(ValueError):
+      tree.delete(p)
+    self.assertEqual(len(tree), 30)
+
+
+class TestRangeDeletion(unittest.TestCase):
+
+  def test_delete_range_and_truncate(self):
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls.from_sorted((k, k) for k in range(100))
+      self.assertEqual(tree.delete_range(10, 20), 10)
+      self.assertEqual(tree.truncate_before(5), 5)
+      self.assertEqual(tree.truncate_after(89), 10)
+      self.assertEqual(tree.delete_range(50, None), 40)
+      check_tree(tree)
+      self.assertEqual(list(tree), list(range(5, 10)) + list(range(20, 50)))
+
+  def test_positions_of_removed_items_become_invalid(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(100))
+    inside = tree.find_position(40)
+    outside = tree.find_position(80)
+    tree.delete_range(30, 70)
+    with self.assertRaises(ValueError):
+      tree.delete(inside)
+    with self.assertRaises(ValueError):
+      tree.before(inside)
+    tree.delete(outside)
+    check_tree(tree)
+    self.assertEqual(len(tree), 59)
+    self.assertEqual(len(list(tree)), 59)
+
+  def test_incomparable_bounds_leave_map_intact(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(100))
+    for operation in (lambda: tree.delete_range('a', 'b'), lambda: tree.delete_range(10, 'b'),
+                      lambda: tree.truncate_before('a'), lambda: tree.truncate_after('a'),
+                      lambda: tree.split('a')):
+      with self.assertRaises(TypeError):
+        operation()
+      self.assertEqual(len(tree), 100)
+      check_tree(tree)
+
+
+class TestSplitJoin(unittest.TestCase):
+
+  def test_split_then_join(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(1000))
+    left, right = tree.split(400)
+    self.assertEqual(len(tree), 0)
+    check_tree(left)
+    check_tree(right)
+    self.assertEqual(list(left), list(range(400)))
+    self.assertEqual(list(right), list(range(400, 1000)))
+    right.join(left)
+    check_tree(right)
+    self.assertEqual(list(right), list(range(1000)))
+    self.assertEqual(len(left), 0)
+
+  def test_join_rejects_overlapping_ranges(self):
+    first = AVLTreeMap.from_sorted((k, k) for k in range(10))
+    second = AVLTreeMap.from_sorted((k, k) for k in range(5, 15))
+    with self.assertRaises(ValueError):
+      first.join(second)
+    self.assertEqual(len(first), 10)
+    self.assertEqual(len(second), 10)
+
+
+if __name__ == '__main__':
+  unittest.main()
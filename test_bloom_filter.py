@@ -0,0 +1,55 @@
+import datetime
+import unittest
+from bloom_filter import BloomFilter, stable_hash
+
+class TestStableHash(unittest.TestCase):
+
+  def test_equal_keys_hash_alike(self):
+    self.assertEqual(stable_hash(1), stable_hash(1.0))
+    self.assertEqual(stable_hash((1, 'a')), stable_hash((1.0, 'a')))
+    self.assertEqual(stable_hash(frozenset({3, 'x', (1, 2)})), stable_hash(frozenset({(1, 2), 'x', 3})))
+    utc = datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc)
+    east = utc.astimezone(datetime.timezone(datetime.timedelta(hours=5)))
+    self.assertEqual(utc, east)
+    self.assertEqual(stable_hash(utc), stable_hash(east))
+
+  def test_known_values(self):
+    # hashes must never change, as they are saved with the filters of LSMStore runs
+    self.assertEqual(stable_hash(12345), 12345)
+    self.assertEqual(stable_hash('key'), stable_hash(b'key'))
+    self.assertNotEqual(stable_hash(datetime.date(2020, 1, 1)), stable_hash(datetime.date(2020, 1, 2)))
+    self.assertNotEqual(stable_hash(None), stable_hash(0))
+
+  def test_unsupported_types_raise(self):
+    class Key:
+      pass
+    for key in (object(), Key(), (1, object())):
+      with self.assertRaises(TypeError):
+        stable_hash(key)
+
+
+class TestBloomFilter(unittest.TestCase):
+
+  def test_no_false_negatives_and_few_false_positives(self):
+    bloom = BloomFilter(1000, 0.01, stable_hash)
+    for k in range(1000):
+      bloom.add('key%d' % k)
+    self.assertTrue(all('key%d' % k in bloom for k in range(1000)))
+    false = sum('other%d' % k in bloom for k in range(10000))
+    self.assertLess(false, 300)
+
+  def test_round_trip_through_bytes(self):
+    bloom = BloomFilter(100, 0.05, stable_hash)
+    for k in range(50):
+      bloom.add(datetime.date(2020, 1, 1) + datetime.timedelta(days=k))
+    copy = BloomFilter.from_bytes(bloom.to_bytes(), stable_hash)
+    self.assertEqual(len(copy), 50)
+    self.assertEqual(copy.capacity(), 100)
+    self.assertTrue(all(datetime.date(2020, 1, 1) + datetime.timedelta(days=k) in copy
+                        for k in range(50)))
+    with self.assertRaises(ValueError):
+      BloomFilter.from_bytes(b'junk', stable_hash)
+
+
+if __name__ == '__main__':
+  unittest.main()
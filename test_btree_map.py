@@ -0,0 +1,80 @@
+import random
+import unittest
+from btree_map import BTreeMap
+
+def check_btree(tree):
+  """Assert the structural invariants of a BTreeMap (ordering, occupancy, depth, leaf links)."""
+  leaves = []
+  def walk(node, lo, hi, depth):
+    keys = node._keys
+    assert keys == sorted(keys), 'keys out of order'
+    assert all((lo is None or lo <= k) and (hi is None or k < hi) for k in keys), 'key outside separators'
+    if type(node) is BTreeMap._Leaf:
+      assert len(node._values) == len(keys)
+      assert node is tree._root or tree._min <= len(keys) <= tree._order, 'leaf occupancy'
+      leaves.append(node)
+      return depth
+    children = node._children
+    assert len(children) == len(keys) + 1
+    assert node is tree._root or tree._min <= len(children) <= tree._order, 'node occupancy'
+    bounds = [lo] + keys + [hi]
+    depths = {walk(child, bounds[j], bounds[j+1], depth + 1) for j, child in enumerate(children)}
+    assert len(depths) == 1, 'leaves at different depths'
+    return depths.pop()
+  walk(tree._root, None, None, 0)
+  for left, right in zip(leaves, leaves[1:]):
+    assert left._next is right and right._prev is left, 'broken leaf links'
+  assert leaves[0]._prev is None and leaves[-1]._next is None
+  assert sum(len(leaf._keys) for leaf in leaves) == len(tree), 'wrong size'
+
+
+class TestBTreeMap(unittest.TestCase):
+
+  def test_random_operations_against_dict(self):
+    random.seed(12)
+    for order in (4, 5, 64):
+      tree = BTreeMap(order)
+      expected = {}
+      for j in range(3000):
+        k = random.randint(0, 400)
+        if random.random() < 0.55:
+          tree[k] = j
+          expected[k] = j
+        elif k in expected:
+          self.assertEqual(tree[k], expected[k])
+          del tree[k]
+          del expected[k]
+        else:
+          self.assertNotIn(k, tree)
+      check_btree(tree)
+      ordered = sorted(expected)
+      self.assertEqual(list(tree), ordered)
+      self.assertEqual(list(reversed(tree)), ordered[::-1])
+      for k in range(-1, 402, 3):
+        below = [key for key in ordered if key < k]
+        above = [key for key in ordered if key > k]
+        self.assertEqual(tree.find_lt(k), (below[-1], expected[below[-1]]) if below else None)
+        self.assertEqual(tree.find_gt(k), (above[0], expected[above[0]]) if above else None)
+        found = [key for key in ordered if k <= key < k + 40]
+        self.assertEqual([key for key, v in tree.find_range(k, k + 40)], found)
+        self.assertEqual([key for key, v in tree.find_range(k, k + 40, True)], found[::-1])
+
+  def test_deleting_everything_shrinks_tree(self):
+    tree = BTreeMap(4)
+    for k in range(200):
+      tree[k] = k
+    for k in random.sample(range(200), 200):
+      del tree[k]
+      check_btree(tree)
+    self.assertIs(type(tree._root), BTreeMap._Leaf)
+    self.assertIsNone(tree.find_min())
+    self.assertIsNone(tree.find_gt(0))
+    self.assertEqual(list(tree.find_range(None, None, True)), [])
+
+  def test_small_order_is_rejected(self):
+    with self.assertRaises(ValueError):
+      BTreeMap(3)
+
+
+if __name__ == '__main__':
+  unittest.main()
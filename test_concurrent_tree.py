@@ -0,0 +1,133 @@
+import threading
+import unittest
+from concurrent_tree import ConcurrentTreeMap, ReadWriteLock
+from splay_tree import SplayTreeMap
+from test_binary_search_tree import check_tree
+
+class TestConcurrentTreeMap(unittest.TestCase):
+
+  def test_concurrent_writers_and_readers(self):
+    m = ConcurrentTreeMap()
+    errors = []
+    def write(base):
+      for k in range(base, base + 500):
+        m[k] = k
+      for k in range(base, base + 500, 2):
+        del m[k]
+    def read():
+      try:
+        for j in range(200):
+          keys = list(m)
+          assert keys == sorted(keys)
+          pairs = m.find_range(100, 900)
+          assert all(k == v for k, v in pairs)
+      except AssertionError as e:
+        errors.append(e)
+    threads = [threading.Thread(target=write, args=(base,)) for base in (0, 500, 1000)]
+    threads += [threading.Thread(target=read) for j in range(3)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(errors, [])
+    check_tree(m._tree)
+    self.assertEqual(list(m), list(range(1, 1500, 2)))
+
+  def test_items_during_deletes(self):
+    m = ConcurrentTreeMap()
+    m.update((k, k) for k in range(2000))
+    errors = []
+    def delete():
+      for k in range(0, 2000, 2):
+        del m[k]
+      while len(m) > 500:
+        m.popitem()
+    def read():
+      try:
+        for j in range(100):
+          pairs = list(m.items())
+          assert all(k == v for k, v in pairs)
+          assert [k for k, v in pairs] == sorted(k for k, v in pairs)
+          assert sum(1 for v in m.values()) <= 2000
+      except (AssertionError, KeyError) as e:
+        errors.append(e)
+    threads = [threading.Thread(target=delete)]
+    threads += [threading.Thread(target=read) for j in range(3)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(errors, [])
+    self.assertEqual(len(m), 500)
+    first = m.find_min()
+    self.assertEqual(m.popitem(), first)
+    self.assertNotIn(first[0], m)
+    check_tree(m._tree)
+    m.clear()
+    self.assertEqual(m.items(), [])
+    with self.assertRaises(KeyError):
+      m.popitem()
+
+  def test_compute_if_absent_runs_once(self):
+    m = ConcurrentTreeMap()
+    calls = []
+    def compute(k):
+      calls.append(k)
+      return k * k
+    threads = [threading.Thread(target=m.compute_if_absent, args=(7, compute)) for j in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(calls, [7])
+    self.assertEqual(m[7], 49)
+    self.assertEqual(m.setdefault(7, 0), 49)
+    self.assertEqual(m.pop(7), 49)
+    self.assertEqual(m.pop(7, None), None)
+    with self.assertRaises(KeyError):
+      m.pop(7)
+
+  def test_update_with_incomparable_key_leaves_map_intact(self):
+    m = ConcurrentTreeMap()
+    m.update({1: 1, 2: 2})
+    with self.assertRaises(TypeError):
+      m.update([(3, 3), ('a', 4)])
+    self.assertEqual(list(m.items()), [(1, 1), (2, 2)])
+    m[3] = 3                                          # the lock was released
+    self.assertEqual(len(m), 3)
+
+  def test_splay_tree_lookups_are_exclusive(self):
+    m = ConcurrentTreeMap(SplayTreeMap())
+    self.assertEqual(m._reading, m._lock.writing)
+    m[1] = 1
+    self.assertEqual(m[1], 1)
+    m = ConcurrentTreeMap()
+    self.assertEqual(m._reading, m._lock.reading)
+
+
+class TestReadWriteLock(unittest.TestCase):
+
+  def test_waiting_writer_blocks_new_readers(self):
+    lock = ReadWriteLock()
+    lock.acquire_read()
+    order = []
+    def writer():
+      with lock.writing():
+        order.append('writer')
+    def reader():
+      with lock.reading():
+        order.append('reader')
+    w = threading.Thread(target=writer)
+    w.start()
+    while lock._waiting == 0:                         # writer is queued behind our read
+      pass
+    r = threading.Thread(target=reader)
+    r.start()
+    lock.release_read()
+    w.join()
+    r.join()
+    self.assertEqual(order, ['writer', 'reader'])
+
+
+if __name__ == '__main__':
+  unittest.main()
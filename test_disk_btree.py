@@ -0,0 +1,77 @@
+import os
+import random
+import tempfile
+import unittest
+from disk_btree import DiskBTreeMap
+
+class TestDiskBTreeMap(unittest.TestCase):
+
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self._tmp.name, 'map.db')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_random_operations_and_reopen(self):
+    random.seed(15)
+    expected = {}
+    with DiskBTreeMap(self.path, page_size=512, cache_pages=8) as m:   # many evictions
+      for j in range(3000):
+        k = random.randint(0, 1000)
+        if random.random() < 0.6:
+          m[k] = 'value %d' % j
+          expected[k] = 'value %d' % j
+        elif k in expected:
+          self.assertEqual(m[k], expected[k])
+          del m[k]
+          del expected[k]
+        else:
+          self.assertNotIn(k, m)
+      self.assertEqual(len(m), len(expected))
+    with DiskBTreeMap(self.path) as m:
+      ordered = sorted(expected.items())
+      self.assertEqual(len(m), len(ordered))
+      self.assertEqual(list(m.items()), ordered)
+      self.assertEqual(list(reversed(m)), [k for k, v in reversed(ordered)])
+      self.assertEqual(list(m.find_range(100, 200)), [(k, v) for k, v in ordered if 100 <= k < 200])
+      self.assertEqual(list(m.find_range(100, 200, True)),
+                       [(k, v) for k, v in reversed(ordered) if 100 <= k < 200])
+      for k in range(-1, 1002, 11):
+        below = [pair for pair in ordered if pair[0] <= k]
+        above = [pair for pair in ordered if pair[0] > k]
+        self.assertEqual(m.find_le(k), below[-1] if below else None)
+        self.assertEqual(m.find_gt(k), above[0] if above else None)
+
+  def test_flush_makes_updates_visible_to_a_reader(self):
+    m = DiskBTreeMap(self.path)
+    for k in range(100):
+      m[k] = k
+    m.flush()
+    with DiskBTreeMap(self.path) as reader:
+      self.assertEqual(list(reader), list(range(100)))
+    m.close()
+
+  def test_emptied_map_reuses_pages(self):
+    with DiskBTreeMap(self.path, page_size=512) as m:
+      for k in range(2000):
+        m[k] = k
+      for k in range(2000):
+        del m[k]
+      self.assertEqual(len(m), 0)
+      self.assertIsNone(m.find_min())
+    size = os.path.getsize(self.path)
+    with DiskBTreeMap(self.path) as m:
+      for k in range(2000):
+        m[k] = k
+    self.assertEqual(os.path.getsize(self.path), size)
+
+  def test_invalid_file_is_rejected(self):
+    with open(self.path, 'wb') as f:
+      f.write(b'x' * 100)
+    with self.assertRaises(ValueError):
+      DiskBTreeMap(self.path)
+
+
+if __name__ == '__main__':
+  unittest.main()
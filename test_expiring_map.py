@@ -0,0 +1,81 @@
+import unittest
+from expiring_map import ExpiringMap
+
+class FakeClock:
+  """Clock advanced explicitly by the test."""
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class TestExpiringMap(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.m = ExpiringMap(default_ttl=10, clock=self.clock)
+
+  def test_items_expire_at_their_deadline(self):
+    self.m['a'] = 1
+    self.m.set('b', 2, ttl=5)
+    self.assertEqual(self.m.deadline('b'), 5)
+    self.clock.now = 5
+    self.assertNotIn('b', self.m)
+    with self.assertRaises(KeyError):
+      self.m['b']
+    self.assertEqual(self.m['a'], 1)
+    self.assertEqual(len(self.m), 1)
+    self.clock.now = 10
+    self.assertEqual(list(self.m), [])
+
+  def test_expire_reports_items_in_deadline_order(self):
+    m = ExpiringMap(clock=self.clock)                 # items never expire by default
+    for j, k in enumerate('dcba'):
+      m.set(k, j, ttl=j + 1)
+    m['z'] = 'never'
+    self.assertEqual(m.expire(2.5), [('d', 0), ('c', 1)])
+    self.assertEqual(m.expire(2.5), [])
+    self.clock.now = 100
+    self.assertEqual(m.expire(), [('b', 2), ('a', 3)])
+    self.assertEqual(dict(m.items()), {'z': 'never'})
+
+  def test_overwrite_and_touch_reschedule(self):
+    self.m['a'] = 1
+    self.clock.now = 8
+    self.m['a'] = 2                                   # deadline now 18
+    self.m['b'] = 3
+    self.m.touch('b', ttl=1)                          # deadline now 9
+    self.clock.now = 12
+    self.assertEqual(self.m.expire(), [('b', 3)])
+    self.assertEqual(self.m['a'], 2)
+    self.m.touch('a')                                 # default time to live
+    self.assertEqual(self.m.deadline('a'), 22)
+    self.clock.now = 22
+    self.assertNotIn('a', self.m)
+
+  def test_explicit_none_never_expires(self):
+    self.m.set('a', 1, ttl=None)
+    self.m['b'] = 2
+    self.m.touch('b', ttl=None)
+    self.assertIsNone(self.m.deadline('a'))
+    self.assertIsNone(self.m.deadline('b'))
+    self.clock.now = 1000
+    self.assertEqual(self.m.expire(), [])
+    self.assertEqual(dict(self.m.items()), {'a': 1, 'b': 2})
+    self.m.touch('a')                                 # back to the default time to live
+    self.assertEqual(self.m.deadline('a'), 1010)
+
+  def test_delete(self):
+    self.m['a'] = 1
+    del self.m['a']
+    self.assertEqual(self.m.expire(1000), [])
+    self.m['b'] = 2
+    self.clock.now = 20
+    with self.assertRaises(KeyError):
+      del self.m['b']                                 # expired, though not yet swept
+
+
+if __name__ == '__main__':
+  unittest.main()
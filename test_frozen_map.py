@@ -0,0 +1,49 @@
+import unittest
+from avl_tree import AVLTreeMap
+from frozen_map import FrozenTreeMap, numpy
+
+class TestFrozenTreeMap(unittest.TestCase):
+
+  def test_lookups_and_order_statistics(self):
+    frozen = FrozenTreeMap((k, str(k)) for k in range(0, 100, 5))
+    self.assertEqual(len(frozen), 20)
+    self.assertEqual(frozen[35], '35')
+    self.assertNotIn(36, frozen)
+    self.assertEqual(list(frozen.find_range(10, 25, True)), [(20, '20'), (15, '15'), (10, '10')])
+    self.assertEqual(frozen.rank(36), 8)
+    self.assertEqual(frozen.select(-1), (95, '95'))
+    self.assertEqual(frozen.count_range(10, 36), 6)
+    self.assertEqual(frozen.count_range(None, None), 20)
+    self.assertEqual(frozen.count_range(50, 10), 0)
+
+  def test_freeze_copies_current_items(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(10))
+    frozen = tree.freeze()
+    tree[20] = 20
+    del tree[3]
+    self.assertIsInstance(frozen, FrozenTreeMap)
+    self.assertEqual(list(frozen.items()), [(k, k) for k in range(10)])
+    self.assertEqual(frozen.find_le(3), (3, 3))
+
+  def test_get_many_compares_keys_exactly(self):
+    big = 2 ** 53 + 1                                 # not representable as a float
+    frozen = FrozenTreeMap([(1, 'one'), (big, 'big')])
+    self.assertEqual(frozen.get_many([float(2 ** 53), 1.0, big, 2]), [None, 'one', 'big', None])
+    self.assertEqual(frozen.get_many([1.5, 1], 'none'), ['none', 'one'])
+
+  def test_get_many_with_other_keys(self):
+    frozen = FrozenTreeMap([('a', 1), ('b', 2)])
+    self.assertEqual(frozen.get_many(['b', 'c', 'a']), [2, None, 1])
+
+  @unittest.skipIf(numpy is None, 'requires NumPy')
+  def test_vectorized_lookups_match_bisect(self):
+    frozen = FrozenTreeMap((k, k) for k in range(0, 1000, 3))
+    self.assertIsNotNone(frozen._array)
+    probes = list(range(-5, 1005))
+    self.assertEqual(frozen.get_many(probes), [k if k % 3 == 0 and 0 <= k < 1000 else None
+                                               for k in probes])
+    self.assertEqual(frozen.get_many(numpy.array([3.0, 3.5])), [3, None])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,45 @@
+import random
+import unittest
+from interval_tree import IntervalTreeMap
+from test_binary_search_tree import check_tree
+
+class TestIntervalTreeMap(unittest.TestCase):
+
+  def test_queries_follow_random_updates(self):
+    random.seed(5)
+    tree, expected = IntervalTreeMap(), {}
+    for j in range(400):
+      start = random.randint(0, 100)
+      key = (start, start + random.randint(0, 20))
+      if key in expected and random.random() < 0.5:
+        del tree[key]
+        del expected[key]
+      else:
+        tree[key] = expected[key] = j
+      check_tree(tree)
+      lo, hi = sorted(random.sample(range(0, 130), 2))
+      self.assertEqual(list(tree.overlapping(lo, hi)),
+                       sorted((k, v) for k, v in expected.items() if k[0] < hi and lo < k[1]))
+      self.assertEqual(list(tree.stabbing(lo)),
+                       sorted((k, v) for k, v in expected.items() if k[0] <= lo < k[1]))
+
+  def test_rejects_reversed_interval(self):
+    tree = IntervalTreeMap()
+    with self.assertRaises(ValueError):
+      tree[(5, 3)] = 'x'
+    self.assertEqual(len(tree), 0)
+
+  def test_bulk_methods_reject_reversed_interval(self):
+    tree = IntervalTreeMap.from_sorted([((1, 4), 'a'), ((2, 3), 'b')])
+    with self.assertRaises(ValueError):
+      IntervalTreeMap.from_sorted([((1, 4), 'a'), ((5, 3), 'b')])
+    with self.assertRaises(ValueError):
+      tree.bulk_load([((5, 3), 'x')])
+    with self.assertRaises(ValueError):
+      tree.update_sorted([((0, 9), 'y'), ((5, 3), 'x')])
+    self.assertEqual(list(tree.items()), [((1, 4), 'a'), ((2, 3), 'b')])
+    check_tree(tree)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,135 @@
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from lsm_store import LSMStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# run in child processes, so that the store is written and read under different hash seeds
+WRITER = """
+import datetime, sys
+from lsm_store import LSMStore
+with LSMStore(sys.argv[1], memtable_size=16, background=False) as store:
+  for j in range(100):
+    store[datetime.date(2020, 1, 1) + datetime.timedelta(days=j)] = j
+"""
+
+READER = """
+import datetime, sys
+from lsm_store import LSMStore
+with LSMStore(sys.argv[1], background=False) as store:
+  days = [datetime.date(2020, 1, 1) + datetime.timedelta(days=j) for j in range(100)]
+  assert len(store) == 100
+  assert [store.get(day) for day in days] == list(range(100))
+"""
+
+def run_with_seed(script, directory, seed):
+  environment = dict(os.environ, PYTHONHASHSEED=str(seed))
+  subprocess.run([sys.executable, '-c', script, directory], cwd=HERE, env=environment, check=True)
+
+class TestLSMStore(unittest.TestCase):
+
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.directory = self._tmp.name
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_reopen_under_different_hash_seed(self):
+    run_with_seed(WRITER, self.directory, 1)
+    run_with_seed(READER, self.directory, 2)
+
+  def test_failed_compaction_is_reported_by_flush(self):
+    store = LSMStore(self.directory, memtable_size=4, max_runs=2)
+    def fail():
+      raise OSError('disk full')
+    store.compact = fail                          # called by the compaction thread
+    for k in range(8):
+      store[k] = k                                # two flushes wake the thread
+    deadline = time.time() + 10
+    while store._failure is None and time.time() < deadline:
+      time.sleep(0.01)
+    del store.compact                             # the retry will succeed
+    store[8] = 8
+    with self.assertRaises(RuntimeError) as raised:
+      store.flush()
+    self.assertIsInstance(raised.exception.__cause__, OSError)
+    deadline = time.time() + 10
+    while len(store._runs) > 1 and time.time() < deadline:
+      time.sleep(0.01)
+    self.assertEqual(len(store._runs), 1)
+    store.close()
+    with LSMStore(self.directory, background=False) as store:
+      self.assertEqual(list(store.items()), [(k, k) for k in range(9)])
+
+  def test_compaction_merges_runs_of_similar_size(self):
+    store = LSMStore(self.directory, memtable_size=4, max_runs=3, background=False)
+    for k in range(28):
+      store[k] = k
+      if k % 4 == 3:
+        store.flush()
+        while store.compact():
+          pass
+    self.assertEqual([len(run) for run in store._runs], [4, 12, 12])
+    oldest = store._runs[-1]
+    for k in range(28, 36):                       # two more flushes fill tier 0 again
+      store[k] = k
+      if k % 4 == 3:
+        store.flush()
+    self.assertTrue(store.compact())
+    self.assertIs(store._runs[-1], oldest)        # larger runs are not rewritten
+    self.assertEqual([len(run) for run in store._runs], [12, 12, 12])
+    self.assertTrue(store.compact())              # a full tier of its own
+    self.assertEqual([len(run) for run in store._runs], [36])
+    self.assertEqual(list(store.items()), [(k, k) for k in range(36)])
+    store.close()
+
+  def test_deletions_outlive_merges_of_newer_runs(self):
+    store = LSMStore(self.directory, memtable_size=4, max_runs=2, background=False)
+    for k in range(16):
+      store[k] = k
+    store.flush()
+    store.compact(major=True)
+    for k in range(0, 8, 2):
+      del store[k]
+    store.flush()
+    for k in range(20, 24):
+      store[k] = k
+    store.flush()
+    self.assertTrue(store.compact())              # merges the two newest runs only
+    self.assertEqual(len(store._runs), 2)
+    self.assertEqual(list(store), [1, 3, 5, 7] + list(range(8, 16)) + list(range(20, 24)))
+    self.assertTrue(store.compact(major=True))
+    self.assertEqual(len(store._runs[0]), 16)
+    store.close()
+
+  def test_runs_are_closed_once_readers_are_done(self):
+    store = LSMStore(self.directory, memtable_size=4, max_runs=2, background=False)
+    for k in range(8):
+      store[k] = k
+    store.flush()
+    runs = store._runs
+    scan = store.find_range(None, None)
+    self.assertEqual(next(scan), (0, 0))
+    self.assertTrue(store.compact())
+    self.assertFalse(any(run._map._mmap.closed for run in runs))   # still read by scan
+    self.assertEqual(list(scan), [(k, k) for k in range(1, 8)])
+    self.assertTrue(all(run._map._mmap.closed for run in runs))
+    merged = store._runs[0]
+    store.close()
+    self.assertTrue(merged._map._mmap.closed)
+
+  def test_key_without_stable_hash_is_rejected(self):
+    with LSMStore(self.directory, background=False) as store:
+      with self.assertRaises(TypeError):
+        store[object()] = 1
+      self.assertEqual(len(store), 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from avl_tree import AVLTreeMap
+from map_file import save_items, load_items, MappedTreeMap
+
+class TestMapFile(unittest.TestCase):
+
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self._tmp.name, 'map.tmap')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_save_and_load_round_trip(self):
+    tree = AVLTreeMap.from_sorted((k, [k] * 3) for k in range(0, 500, 5))
+    tree.save(self.path)
+    loaded = AVLTreeMap.load(self.path, mmap=False)
+    self.assertIsInstance(loaded, AVLTreeMap)
+    self.assertEqual(list(loaded.items()), list(tree.items()))
+    self.assertEqual(load_items(self.path), list(tree.items()))
+
+  def test_mapped_queries_match_tree(self):
+    tree = AVLTreeMap.from_sorted((k, str(k)) for k in range(0, 500, 5))
+    tree.save(self.path)
+    with AVLTreeMap.load(self.path) as mapped:
+      self.assertIsInstance(mapped, MappedTreeMap)
+      self.assertEqual(len(mapped), 100)
+      self.assertEqual(mapped[35], '35')
+      self.assertNotIn(36, mapped)
+      self.assertEqual(list(mapped), list(tree))
+      self.assertEqual(list(reversed(mapped)), list(reversed(tree)))
+      for k in range(-1, 502, 7):
+        self.assertEqual(mapped.find_le(k), tree.find_le(k))
+        self.assertEqual(mapped.find_gt(k), tree.find_gt(k))
+        self.assertEqual(mapped.rank(k), tree.rank(k))
+        self.assertEqual(mapped.count_range(k, k + 50), tree.count_range(k, k + 50))
+      self.assertEqual(list(mapped.find_range(40, 80, True)), list(tree.find_range(40, 80, True)))
+      self.assertEqual(mapped.select(-1), tree.select(-1))
+
+  def test_items_of_unknown_count_and_empty_map(self):
+    save_items(iter([(1, 'a'), (2, 'b')]), self.path)    # spooled, as count is unknown
+    self.assertEqual(load_items(self.path), [(1, 'a'), (2, 'b')])
+    AVLTreeMap().save(self.path)
+    with MappedTreeMap(self.path) as mapped:
+      self.assertEqual(len(mapped), 0)
+      self.assertIsNone(mapped.find_min())
+      self.assertEqual(list(mapped.find_range(None, None)), [])
+
+  def test_failed_save_leaves_previous_file(self):
+    AVLTreeMap.from_sorted((k, k) for k in range(10)).save(self.path)
+    with self.assertRaises(Exception):
+      AVLTreeMap.from_sorted([(1, 'a'), (2, lambda: None)]).save(self.path)   # not picklable
+    self.assertEqual(load_items(self.path), [(k, k) for k in range(10)])
+    self.assertEqual(os.listdir(self._tmp.name), ['map.tmap'])
+
+  def test_invalid_file_is_rejected(self):
+    with open(self.path, 'wb') as f:
+      f.write(b'not a map file at all')
+    with self.assertRaises(ValueError):
+      MappedTreeMap(self.path)
+    with self.assertRaises(ValueError):
+      load_items(self.path)
+
+
+if __name__ == '__main__':
+  unittest.main()
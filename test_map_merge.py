@@ -0,0 +1,78 @@
+import operator
+import os
+import random
+import tempfile
+import unittest
+from avl_tree import AVLTreeMap
+from map_file import MappedTreeMap
+from map_merge import merge_items, merge_maps
+
+def expected_merge(first, second, operation, combine):
+  """Return the result of a set operation on two dicts, computed directly."""
+  keys = {'union': first.keys() | second.keys(), 'intersection': first.keys() & second.keys(),
+          'difference': first.keys() - second.keys(),
+          'symmetric_difference': first.keys() ^ second.keys()}[operation]
+  result = []
+  for k in sorted(keys):
+    if k in first and k in second:
+      result.append((k, combine(first[k], second[k])))
+    else:
+      result.append((k, first[k] if k in first else second[k]))
+  return result
+
+
+class TestMergeItems(unittest.TestCase):
+
+  def test_operations_against_dicts(self):
+    random.seed(10)
+    for trial in range(50):
+      first = {random.randint(0, 60): random.random() for j in range(random.randint(0, 40))}
+      second = {random.randint(0, 60): random.random() for j in range(random.randint(0, 40))}
+      for operation in ('union', 'intersection', 'difference', 'symmetric_difference'):
+        merged = merge_items(sorted(first.items()), sorted(second.items()), operation, operator.add)
+        self.assertEqual(list(merged), expected_merge(first, second, operation, operator.add))
+
+  def test_second_value_wins_without_combine(self):
+    merged = merge_items([(1, 'a'), (2, 'b')], [(2, 'c')], 'union')
+    self.assertEqual(list(merged), [(1, 'a'), (2, 'c')])
+
+  def test_unknown_operation(self):
+    with self.assertRaises(ValueError):
+      merge_maps(AVLTreeMap(), AVLTreeMap(), 'merge')
+
+
+class TestTreeMapSetOperations(unittest.TestCase):
+
+  def test_methods_return_maps_of_same_type(self):
+    first = AVLTreeMap.from_sorted((k, 1) for k in range(0, 30, 2))
+    second = AVLTreeMap.from_sorted((k, 2) for k in range(0, 30, 3))
+    union = first.union(second, operator.add)
+    self.assertIsInstance(union, AVLTreeMap)
+    self.assertEqual(union[6], 3)
+    self.assertEqual(union[4], 1)
+    self.assertEqual(list(first.intersection(second)), [0, 6, 12, 18, 24])
+    self.assertEqual(len(first.difference(second)), 10)
+    self.assertEqual(len(first.symmetric_difference(second)), 15)
+
+  def test_parallel_merge_matches_sequential(self):
+    first = AVLTreeMap.from_sorted((k, k) for k in range(0, 400, 2))
+    second = AVLTreeMap.from_sorted((k, -k) for k in range(0, 400, 3))
+    for operation in ('union', 'intersection', 'symmetric_difference'):
+      self.assertEqual(merge_maps(first, second, operation, operator.add, processes=2),
+                       merge_maps(first, second, operation, operator.add))
+
+  def test_parallel_merge_reads_saved_maps_in_place(self):
+    first = AVLTreeMap.from_sorted((k, k) for k in range(0, 400, 2))
+    second = AVLTreeMap.from_sorted((k, -k) for k in range(0, 400, 3))
+    with tempfile.TemporaryDirectory() as directory:
+      paths = [os.path.join(directory, name) for name in ('first.tmap', 'second.tmap')]
+      first.save(paths[0])
+      second.save(paths[1])
+      with MappedTreeMap(paths[0]) as mapped_first, MappedTreeMap(paths[1]) as mapped_second:
+        self.assertEqual(merge_maps(mapped_first, mapped_second, 'union', operator.add, processes=3),
+                         merge_maps(first, second, 'union', operator.add))
+      self.assertEqual(sorted(os.listdir(directory)), ['first.tmap', 'second.tmap'])
+
+
+if __name__ == '__main__':
+  unittest.main()
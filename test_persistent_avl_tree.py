@@ -0,0 +1,54 @@
+import random
+import unittest
+from persistent_avl_tree import PersistentAVLTreeMap
+from test_binary_search_tree import check_tree
+
+class TestPersistentAVLTreeMap(unittest.TestCase):
+
+  def test_snapshots_are_unaffected_by_later_updates(self):
+    random.seed(5)
+    tree = PersistentAVLTreeMap()
+    expected = {}
+    snapshots = []
+    for j in range(1000):
+      k = random.randint(0, 200)
+      if random.random() < 0.7:
+        tree[k] = j
+        expected[k] = j
+      elif k in expected:
+        del tree[k]
+        del expected[k]
+      if j % 100 == 0:
+        snapshots.append((tree.snapshot(), sorted(expected.items())))
+    check_tree(tree)
+    self.assertEqual(list(tree.items()), sorted(expected.items()))
+    for snap, items in snapshots:
+      self.assertEqual(len(snap), len(items))
+      self.assertEqual(list(snap.find_range(None, None)), items)
+      self.assertEqual(list(reversed(snap)), [k for k, v in reversed(items)])
+
+  def test_cursor_sees_update_of_copied_node(self):
+    tree = PersistentAVLTreeMap()
+    for k in range(10):
+      tree[k] = k
+    cursor = tree.cursor()
+    cursor.seek(5)
+    snap = tree.snapshot()
+    tree[5] = 'new'                                   # copies the frozen node
+    self.assertEqual(cursor.item(), (5, 'new'))
+    self.assertEqual(cursor.next(), (6, 6))
+    self.assertEqual(snap[5], 5)
+
+  def test_cursor_after_deletion_below_snapshot(self):
+    tree = PersistentAVLTreeMap()
+    for k in range(20):
+      tree[k] = k
+    cursor = tree.cursor()
+    cursor.seek(10)
+    tree.snapshot()
+    del tree[11]
+    self.assertEqual(cursor.next(), (12, 12))
+
+
+if __name__ == '__main__':
+  unittest.main()
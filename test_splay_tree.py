@@ -0,0 +1,45 @@
+import random
+import unittest
+from splay_tree import SplayTreeMap
+from test_binary_search_tree import check_tree
+
+class TestSplayTreeMap(unittest.TestCase):
+
+  def test_random_operations_against_dict(self):
+    random.seed(11)
+    tree = SplayTreeMap()
+    expected = {}
+    for j in range(2000):
+      k = random.randint(0, 150)
+      if random.random() < 0.6:
+        tree[k] = j
+        expected[k] = j
+      elif k in expected:
+        self.assertEqual(tree[k], expected[k])
+        del tree[k]
+        del expected[k]
+    check_tree(tree)
+    self.assertEqual(list(tree.items()), sorted(expected.items()))
+    self.assertEqual(tree.rank(75), sum(1 for k in expected if k < 75))
+
+  def test_access_moves_item_to_root(self):
+    tree = SplayTreeMap()
+    for k in range(100):
+      tree[k] = k
+      self.assertEqual(tree._root._element._key, k)
+    tree[17]
+    self.assertEqual(tree._root._element._key, 17)
+    tree[42] = 'new'
+    self.assertEqual(tree._root._element._key, 42)
+    check_tree(tree)
+
+  def test_bulk_operations(self):
+    tree = SplayTreeMap.from_sorted((k, k) for k in range(100))
+    self.assertEqual(tree.delete_range(10, 90), 80)
+    tree.update_sorted((k, -k) for k in range(5, 15))
+    check_tree(tree)
+    self.assertEqual(list(tree), list(range(15)) + list(range(90, 100)))
+
+
+if __name__ == '__main__':
+  unittest.main()
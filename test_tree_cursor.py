@@ -0,0 +1,53 @@
+import unittest
+from avl_tree import AVLTreeMap
+from binary_search_tree import TreeMap
+
+class TestTreeCursor(unittest.TestCase):
+
+  def test_paging_in_both_directions(self):
+    for cls in (TreeMap, AVLTreeMap):
+      tree = cls.from_sorted((k, str(k)) for k in range(10))
+      cursor = tree.cursor()
+      self.assertIsNone(cursor.item())
+      self.assertEqual(cursor.items(4), [(0, '0'), (1, '1'), (2, '2'), (3, '3')])
+      self.assertEqual(cursor.keys(3), [4, 5, 6])
+      self.assertEqual(cursor.key(), 7)
+      self.assertEqual(cursor.values(3, reverse=True), ['7', '6', '5'])
+      self.assertEqual(cursor.item(), (4, '4'))
+      self.assertEqual(cursor.keys(100), list(range(4, 10)))
+      self.assertIsNone(cursor.next())
+      self.assertEqual(cursor.prev(), (9, '9'))
+
+  def test_seek(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(0, 20, 2))
+    cursor = tree.cursor()
+    self.assertTrue(cursor.seek(7))
+    self.assertEqual(cursor.key(), 8)
+    self.assertFalse(cursor.seek(19))
+    with self.assertRaises(KeyError):
+      cursor.key()
+    self.assertEqual(cursor.prev(), (18, 18))
+    self.assertTrue(cursor.seek_first())
+    self.assertIsNone(cursor.prev())
+    self.assertEqual(cursor.next(), (0, 0))
+    self.assertFalse(AVLTreeMap().cursor().seek_last())
+
+  def test_cursor_resumes_after_restructuring(self):
+    tree = AVLTreeMap.from_sorted((k, k) for k in range(0, 100, 2))
+    cursor = tree.cursor()
+    cursor.seek(40)
+    for k in range(41, 61, 2):                        # rotations reshape the path
+      tree[k] = k
+    self.assertEqual(cursor.next(), (41, 41))
+    del tree[41]
+    del tree[42]
+    self.assertEqual(cursor.next(), (43, 43))
+    self.assertEqual(cursor.prev(), (40, 40))
+    tree.delete_range(None, None)
+    self.assertIsNone(cursor.next())
+    tree[1] = 1
+    self.assertEqual(cursor.prev(), (1, 1))
+
+
+if __name__ == '__main__':
+  unittest.main()
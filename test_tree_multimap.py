@@ -0,0 +1,116 @@
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+from tree_multimap import TreeMultiMap, TreeMultiSet
+from test_binary_search_tree import check_tree
+
+def check_totals(tree):
+  """Assert the cached value counts of every subtree of a TreeMultiMap."""
+  def walk(node):
+    if node is None:
+      return 0
+    total = tree._multiplicity(node._element._value) + walk(node._left) + walk(node._right)
+    assert node._total == total, 'wrong subtree total'
+    return total
+  check_tree(tree)
+  return walk(tree._root)
+
+
+class TestTreeMultiMap(unittest.TestCase):
+
+  def test_random_updates_against_lists(self):
+    random.seed(4)
+    tree = TreeMultiMap()
+    expected = {}
+    for j in range(2000):
+      k = random.randint(0, 40)
+      if random.random() < 0.6:
+        tree.add(k, j)
+        expected.setdefault(k, []).append(j)
+      elif k in expected:
+        self.assertEqual(tree.remove_one(k), expected[k].pop(0))
+        if not expected[k]:
+          del expected[k]
+      self.assertEqual(check_totals(tree), tree.total())
+    self.assertEqual(list(tree.entries()),
+                     [(k, v) for k in sorted(expected) for v in expected[k]])
+
+  def test_bulk_load_keeps_every_pair(self):
+    tree = TreeMultiMap.from_sorted([(2, 'x'), (1, 'y'), (2, 'z')])
+    check_totals(tree)
+    self.assertEqual(list(tree.entries()), [(1, 'y'), (2, 'x'), (2, 'z')])
+    self.assertEqual(tree.total(), 3)
+
+  def test_update_sorted_adds_values(self):
+    tree = TreeMultiMap.from_sorted((k, k) for k in range(10))
+    tree.update_sorted([(3, 'a'), (20, 'b'), (3, 'c')])
+    self.assertEqual(tree[3], [3, 'a', 'c'])
+    self.assertEqual(tree[20], ['b'])
+    self.assertEqual(tree.total(), 13)
+    self.assertEqual(check_totals(tree), 13)
+
+  def test_update_sorted_with_incomparable_key_leaves_map_intact(self):
+    tree = TreeMultiMap.from_sorted((k, k) for k in range(10))
+    with self.assertRaises(TypeError):
+      tree.update_sorted([('a', 1)])
+    self.assertEqual(list(tree.entries()), [(k, k) for k in range(10)])
+
+  def test_set_operations_merge_buckets(self):
+    first = TreeMultiMap.from_sorted([(1, 'a'), (1, 'b'), (2, 'c')])
+    second = TreeMultiMap.from_sorted([(1, 'd'), (3, 'e')])
+    union = first.union(second)
+    self.assertEqual(list(union.entries()), [(1, 'a'), (1, 'b'), (1, 'd'), (2, 'c'), (3, 'e')])
+    self.assertEqual(check_totals(union), union.total())
+    self.assertEqual(list(first.intersection(second).entries()), [(1, 'a'), (1, 'b'), (1, 'd')])
+    self.assertEqual(list(first.difference(second).entries()), [(2, 'c')])
+    union.add(2, 'f')                                 # the buckets of first are not shared
+    self.assertEqual(first[2], ['c'])
+    with self.assertRaises(TypeError):
+      first.union(TreeMultiSet())
+
+  def test_get_many_and_freeze_report_lists(self):
+    tree = TreeMultiMap.from_sorted([(1, 'a'), (1, 'b')])
+    self.assertEqual(tree.get_many([1, 2], 'none'), [['a', 'b'], 'none'])
+    self.assertEqual(tree.freeze()[1], ['a', 'b'])
+
+  def test_save_and_load(self):
+    tree = TreeMultiMap.from_sorted([(1, 'a'), (1, 'b'), (2, 'c')])
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'multi.tmap')
+      tree.save(path)
+      loaded = TreeMultiMap.load(path, mmap=False)
+    self.assertEqual(list(loaded.entries()), list(tree.entries()))
+    self.assertEqual(check_totals(loaded), 3)
+
+
+class TestTreeMultiSet(unittest.TestCase):
+
+  def test_bulk_load_takes_counts(self):
+    tree = TreeMultiSet.from_sorted(Counter('abracadabra'))
+    self.assertEqual(tree['a'], 5)
+    self.assertEqual(tree.total(), 11)
+    tree.bulk_load([('x', 2), ('w', 1), ('x', 1)])
+    self.assertEqual(list(tree.items()), [('w', 1), ('x', 3)])
+    with self.assertRaises(ValueError):
+      tree.bulk_load([('x', 0)])
+
+  def test_update_sorted_adds_counts(self):
+    tree = TreeMultiSet.from_sorted([('a', 1), ('b', 2)])
+    tree.update_sorted([('b', 3), ('c', 1)])
+    self.assertEqual(list(tree.items()), [('a', 1), ('b', 5), ('c', 1)])
+    self.assertEqual(check_totals(tree), 7)
+
+  def test_set_operations_sum_counts(self):
+    first = TreeMultiSet.from_sorted([('a', 2), ('b', 1)])
+    second = TreeMultiSet.from_sorted([('a', 3), ('c', 1)])
+    union = first.union(second)
+    self.assertEqual(list(union.items()), [('a', 5), ('b', 1), ('c', 1)])
+    self.assertEqual(union.total(), 7)
+    self.assertEqual(list(first.intersection(second, min).items()), [('a', 2)])
+    self.assertEqual(first.get_many(['a', 'z'], 0), [2, 0])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from write_ahead_log import WriteAheadLog, DurableTreeMap
+
+class TestWriteAheadLog(unittest.TestCase):
+
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self._tmp.name, 'test.log')
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_replay_returns_committed_records_in_order(self):
+    log = WriteAheadLog(self.path)
+    sequences = [log.append(('set', k, k * k)) for k in range(10)]
+    self.assertEqual(sequences, list(range(1, 11)))
+    log.close()
+    self.assertEqual(list(WriteAheadLog.replay(self.path)), [('set', k, k * k) for k in range(10)])
+
+  def test_torn_tail_is_discarded_on_open(self):
+    log = WriteAheadLog(self.path)
+    for k in range(3):
+      log.append(k)
+    log.close()
+    size = os.path.getsize(self.path)
+    with open(self.path, 'ab') as f:
+      f.write(b'\x40\x00\x00\x00garbage')          # header of a record that never made it
+    self.assertEqual(list(WriteAheadLog.replay(self.path)), [0, 1, 2])
+    log = WriteAheadLog(self.path)
+    self.assertEqual(os.path.getsize(self.path), size)
+    log.append(3)
+    log.close()
+    self.assertEqual(list(WriteAheadLog.replay(self.path)), [0, 1, 2, 3])
+
+
+class TestDurableTreeMap(unittest.TestCase):
+
+  def setUp(self):
+    self._tmp = tempfile.TemporaryDirectory()
+    self.directory = self._tmp.name
+
+  def tearDown(self):
+    self._tmp.cleanup()
+
+  def test_reopen_replays_updates(self):
+    with DurableTreeMap(self.directory) as m:
+      for k in range(50):
+        m[k] = str(k)
+      for k in range(0, 50, 3):
+        del m[k]
+    with DurableTreeMap(self.directory) as m:
+      self.assertEqual(list(m.items()), [(k, str(k)) for k in range(50) if k % 3])
+
+  def test_reopen_after_compaction(self):
+    with DurableTreeMap(self.directory, compact_after=10, background=False) as m:
+      for k in range(35):
+        m[k] = k
+      del m[7]
+    self.assertTrue(os.path.exists(os.path.join(self.directory, 'snapshot.tmap')))
+    with DurableTreeMap(self.directory) as m:
+      self.assertEqual(list(m), [k for k in range(35) if k != 7])
+
+  def test_failed_update_is_not_logged(self):
+    with DurableTreeMap(self.directory) as m:
+      m[1] = 1
+      with self.assertRaises(TypeError):
+        m['a'] = 2                                   # cannot be compared to 1
+      with self.assertRaises(Exception):
+        m[2] = lambda: None                          # cannot be pickled
+      self.assertEqual(list(m.items()), [(1, 1)])
+      m[3] = 3
+    with DurableTreeMap(self.directory) as m:
+      self.assertEqual(list(m.items()), [(1, 1), (3, 3)])
+
+  def test_failed_overwrite_restores_old_value(self):
+    with DurableTreeMap(self.directory) as m:
+      m[1] = 'old'
+      with self.assertRaises(Exception):
+        m[1] = lambda: None
+      self.assertEqual(m[1], 'old')
+
+  def test_failed_compaction_is_reported_and_retried(self):
+    previous = os.path.join(self.directory, 'previous.log')
+    m = DurableTreeMap(self.directory, compact_after=10)
+    def fail(snapshot):
+      raise OSError('disk full')
+    m._compact = fail                                # called by the compaction thread
+    for k in range(10):
+      m[k] = k                                       # the tenth update starts a compaction
+    m._compactor.join()
+    self.assertFalse(m._compacting)
+    self.assertTrue(os.path.exists(previous))        # kept until a compaction succeeds
+    with self.assertRaises(RuntimeError) as raised:
+      m[10] = 10
+    self.assertIsInstance(raised.exception.__cause__, OSError)
+    self.assertNotIn(10, m)
+    del m._compact                                   # the retry will succeed
+    for k in range(10, 25):
+      m[k] = k
+    m._compactor.join()
+    self.assertFalse(os.path.exists(previous))
+    m._compact = fail
+    compactor, k = m._compactor, 25
+    while m._compactor is compactor:                 # until the log is full again
+      m[k] = k
+      k += 1
+    with self.assertRaises(RuntimeError):
+      m.close()
+    with DurableTreeMap(self.directory) as m:
+      self.assertEqual(list(m.items()), [(j, j) for j in range(k)])
+
+  def test_replay_skips_records_that_cannot_be_applied(self):
+    log = WriteAheadLog(os.path.join(self.directory, 'current.log'))
+    for record in (('set', 1, 1), ('set', 'a', 2), ('set', 3, 3)):
+      log.append(record)
+    log.close()
+    with DurableTreeMap(self.directory) as m:
+      self.assertEqual(list(m.items()), [(1, 1), (3, 3)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,184 @@
+class TreeCursor:
+  """Bidirectional cursor over the items of a TreeMap, in key order.
+
+  The cursor keeps the path of nodes from the root down to its current item, so
+  that moving to a neighboring item takes O(1) amortized time and never climbs
+  parent links.  A cursor is either on an item, or off one end of the map.
+
+  A cursor may be left idle and resumed later.  If the structure of the map has
+  changed in the meantime, the cursor silently re-seeks by key before moving.
+  """
+  __slots__ = '_tree', '_path', '_past_end', '_key', '_version'
+
+  def __init__(self, tree):
+    """Create a cursor positioned just before the first item of tree."""
+    self._tree = tree
+    self._path = []                     # nodes from root to current item
+    self._past_end = False              # which end we are off when path is empty
+    self._key = None                    # key of current item, to resume by key
+    self._version = tree._version
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _descend(self, k, forward, inclusive):
+    """Rebuild path to the nearest item at or beyond k in the given direction."""
+    path = []
+    keep = 0                            # length of path up to best candidate
+    node = self._tree._root
+    while node is not None:
+      path.append(node)
+      key = node._element._key
+      if forward:
+        if key < k or (not inclusive and key == k):
+          node = node._right            # too small; candidate is to the right
+        else:
+          keep = len(path)              # candidate; look for a smaller one
+          node = node._left
+      else:
+        if k < key or (not inclusive and key == k):
+          node = node._left             # too large; candidate is to the left
+        else:
+          keep = len(path)              # candidate; look for a larger one
+          node = node._right
+    del path[keep:]
+    self._settle(path, forward)
+
+  def _extreme(self, forward):
+    """Rebuild path to the first (if forward) or last item of the tree."""
+    path = []
+    node = self._tree._root
+    while node is not None:
+      path.append(node)
+      node = node._left if forward else node._right
+    self._settle(path, not forward)
+
+  def _settle(self, path, forward):
+    """Adopt path as the current position (if empty, we ran off in given direction)."""
+    self._path = path
+    self._past_end = forward
+    self._key = path[-1]._element._key if path else None
+    self._version = self._tree._version
+
+  def _sync(self, forward, inclusive):
+    """Re-seek by key if the tree has been restructured since the cursor last moved.
+
+    The cursor goes to the nearest item in the given direction from the remembered
+    key, including that key itself if inclusive is True.  Return True if a re-seek
+    was necessary.
+    """
+    if self._version == self._tree._version:
+      return False
+    if self._path:
+      self._descend(self._key, forward, inclusive)
+    else:
+      self._version = self._tree._version         # still off the same end
+    return True
+
+  def _step(self, forward):
+    """Move the path to the neighboring item in the given direction."""
+    path = self._path
+    if not path:                                  # off an end
+      if self._past_end != forward:               # re-enter from that end
+        self._extreme(forward)
+      return
+    node = path[-1]
+    child = node._right if forward else node._left
+    if child is not None:                         # neighbor is below us
+      path.append(child)
+      while True:
+        child = child._left if forward else child._right
+        if child is None:
+          break
+        path.append(child)
+    else:                                         # neighbor is above us
+      child = path.pop()
+      while path and child is (path[-1]._right if forward else path[-1]._left):
+        child = path.pop()
+    self._settle(path, forward)
+
+  def _pull(self, n, forward, extract):
+    """Return up to n extracted items starting with the current one."""
+    self._sync(forward, True)
+    if not self._path and self._past_end != forward:   # about to enter from an end
+      self._extreme(forward)
+    result = []
+    while len(result) < n and self._path:
+      result.append(extract(self._path[-1]._element))
+      self._step(forward)
+    return result
+
+  #------------------------------- positioning -------------------------------
+  def seek(self, k):
+    """Move to the first item with key greater than or equal to k.
+
+    Return True if there is such an item, and False if the cursor is past the end.
+    """
+    self._descend(k, True, True)
+    return bool(self._path)
+
+  def seek_first(self):
+    """Move to the first item; return False if the map is empty."""
+    self._extreme(True)
+    return bool(self._path)
+
+  def seek_last(self):
+    """Move to the last item; return False if the map is empty."""
+    self._extreme(False)
+    return bool(self._path)
+
+  #------------------------------- accessors -------------------------------
+  def item(self):
+    """Return (key,value) pair of the current item (or None if off an end)."""
+    self._sync(True, True)
+    if not self._path:
+      return None
+    item = self._path[-1]._element
+    return (item._key, item._value)
+
+  def key(self):
+    """Return key of the current item (raise KeyError if off an end)."""
+    pair = self.item()
+    if pair is None:
+      raise KeyError('cursor is not on an item')
+    return pair[0]
+
+  def value(self):
+    """Return value of the current item (raise KeyError if off an end)."""
+    pair = self.item()
+    if pair is None:
+      raise KeyError('cursor is not on an item')
+    return pair[1]
+
+  #------------------------------- movement -------------------------------
+  def next(self):
+    """Advance to the following item and return its (key,value) pair.
+
+    Return None if the cursor moves (or already was) past the last item.
+    """
+    if not (self._sync(True, False) and self._path):
+      self._step(True)
+    return self.item()
+
+  def prev(self):
+    """Retreat to the preceding item and return its (key,value) pair.
+
+    Return None if the cursor moves (or already was) before the first item.
+    """
+    if not (self._sync(False, False) and self._path):
+      self._step(False)
+    return self.item()
+
+  def items(self, n, reverse=False):
+    """Return a list of up to n (key,value) pairs, beginning with the current item.
+
+    The cursor moves forward (or backward if reverse is True) and is left on the
+    first item not returned, so that repeated calls page through the map.
+    """
+    return self._pull(n, not reverse, lambda item: (item._key, item._value))
+
+  def keys(self, n, reverse=False):
+    """Return a list of up to n keys, moving as described for items."""
+    return self._pull(n, not reverse, lambda item: item._key)
+
+  def values(self, n, reverse=False):
+    """Return a list of up to n values, moving as described for items."""
+    return self._pull(n, not reverse, lambda item: item._value)
@@ -0,0 +1,296 @@
+import operator
+from collections import deque
+from avl_tree import AVLTreeMap
+from map_file import load_items, MappedTreeMap
+from map_merge import merge_maps
+from frozen_map import FrozenTreeMap
+
+class TreeMultiMap(AVLTreeMap):
+  """Sorted map allowing any number of values per key, based on an AVL tree.
+
+  Each distinct key occupies one node, whose value is a deque holding the values
+  added for that key in insertion order.  So len reports the number of distinct
+  keys, iteration reports each key once, and the sorted map methods inherited
+  from TreeMap report (key, deque) pairs (which should not be modified directly).
+  Use entries to iterate over every (key, value) pair.
+
+  Each node also caches the number of values in its subtree, so that total is
+  O(1) and the counts remain correct through rotations, split and join.
+  """
+
+  _augmented = True               # refreshed up to the root after each update
+
+  #-------------------------- nested _Node class --------------------------
+  class _Node(AVLTreeMap._Node):
+    """Node class for TreeMultiMap maintains number of values within its subtree."""
+    __slots__ = '_total'          # additional data member to store number of values
+
+    def __init__(self, element, parent=None, left=None, right=None):
+      super().__init__(element, parent, left, right)
+      self._total = 0             # will be recomputed during balancing
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _multiplicity(self, bucket):
+    """Return number of values represented by the value stored at a node."""
+    return len(bucket)
+
+  def _make_bucket(self, values):
+    """Return a new bucket holding the given values (which may be another bucket)."""
+    return deque(values)
+
+  def _pair_bucket(self, v):
+    """Return a new bucket for the value of a single (key,value) pair."""
+    return deque([v])
+
+  def _report(self, bucket):
+    """Return the value reported to callers for a bucket (a copy, if mutable)."""
+    return list(bucket)
+
+  def _refresh_node(self, node):
+    super()._refresh_node(node)
+    total = self._multiplicity(node._element._value)
+    for child in (node._left, node._right):
+      if child is not None:
+        total += child._total
+    node._total = total
+
+  def _node_exact(self, k):
+    """Return node having key k (or None if not found)."""
+    if self._root is None:
+      return None
+    node = self._node_search(self._root, k)
+    return node if node._element._key == k else None
+
+  def _store(self, k, bucket):
+    """Make bucket the value stored for key k, adding key k if not present."""
+    node = self._node_exact(k)
+    if node is None:
+      AVLTreeMap.__setitem__(self, k, bucket)       # new node, balanced by the hooks
+    else:
+      node._element._value = bucket
+      self._refresh_path(node)
+
+  def _add_bucket(self, k, bucket):
+    """Add the values of bucket to those associated with key k, adding key k if not present."""
+    node = self._node_exact(k)
+    if node is None:
+      AVLTreeMap.__setitem__(self, k, bucket)
+    else:
+      node._element._value += bucket                # extends a deque in place; adds counts
+      self._refresh_path(node)
+
+  def _grouped(self, items):
+    """Return list of [key,bucket] pairs for the (key,value) pairs of items, in key order."""
+    if hasattr(items, 'keys'):
+      items = items.items()
+    grouped = []
+    for k, v in sorted(items, key=lambda pair: pair[0]):   # stable; linear if sorted
+      if grouped and grouped[-1][0] == k:
+        grouped[-1][1] += self._pair_bucket(v)
+      else:
+        grouped.append([k, self._pair_bucket(v)])
+    return grouped
+
+  def _load_buckets(self, grouped):
+    """Replace the contents of the map with the [key,bucket] pairs of grouped, in key order."""
+    self._deprecate_subtree(self._root)
+    self._reset_root(self._build_subtree(grouped, 0, len(grouped), None))
+    self.rebuild_filter()
+
+  def _set_operation(self, other, operation, combine, processes):
+    """Return a new map holding the result of a set operation on the buckets of two maps."""
+    if type(self) is not type(other):
+      raise TypeError('Map types must match')
+    if combine is None:
+      combine = operator.add                        # a new bucket, holding both
+    merged = merge_maps(self, other, operation, combine, processes)
+    grouped = [[k, self._make_bucket(bucket)] for k, bucket in merged]   # never share buckets
+    result = type(self)()
+    result._load_buckets([pair for pair in grouped if self._multiplicity(pair[1]) > 0])
+    return result
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __getitem__(self, k):
+    """Return list of the values associated with key k (raise KeyError if not found)."""
+    return list(super().__getitem__(k))
+
+  def __setitem__(self, k, values):
+    """Replace the values associated with key k by those of the given iteration.
+
+    Raise ValueError if there are no values.
+    """
+    bucket = deque(values)
+    if not bucket:
+      raise ValueError('No values given for key: ' + repr(k))
+    self._store(k, bucket)
+
+  def get_many(self, keys, default=None):
+    """Return list of the values associated with each of the given keys, in the same order.
+
+    Each is reported as __getitem__ would, or as default if the key is not in the map.
+    """
+    return [self._report(node._element._value) if node is not None else default
+            for node in self._node_sweep(keys)]
+
+  #--------------------- public methods for bulk construction and updates ---------------------
+  def bulk_load(self, items):
+    """Replace the contents of the map with the (key,value) pairs of items.
+
+    items may be a mapping or an iterable of (key,value) pairs.  Unlike TreeMap,
+    every pair is kept; values of a repeated key remain in their given order.
+    """
+    self._load_buckets(self._grouped(items))
+
+  def update_sorted(self, items):
+    """Add the (key,value) pairs of items, as a batch.
+
+    items is interpreted as for bulk_load.  Unlike TreeMap.update_sorted, the
+    values are added after those already associated with each key, as by add.
+    The batch is sorted once, and m distinct keys take O(m log n) time.
+    """
+    grouped = self._grouped(items)
+    if grouped:
+      self._compare_keys(grouped[0][0], grouped[-1][0])   # fail before any change
+    for k, bucket in grouped:
+      self._add_bucket(k, bucket)
+
+  @classmethod
+  def load(cls, path, mmap=True):
+    """Return a map with the items stored in the file at path, written by save.
+
+    If mmap is True, return a read-only MappedTreeMap, as for TreeMap.load, whose
+    values are the stored buckets.  Otherwise return a new map of this class.
+    """
+    if mmap:
+      return MappedTreeMap(path)
+    result = cls()
+    result._load_buckets([[k, result._make_bucket(bucket)] for k, bucket in load_items(path)])
+    return result
+
+  def freeze(self):
+    """Return an immutable FrozenTreeMap of the current items, reported as by __getitem__."""
+    return FrozenTreeMap((k, self._report(bucket)) for k, bucket in self.find_range(None, None))
+
+  #--------------------- public methods for bulk set operations ---------------------
+  def union(self, other, combine=None, processes=None):
+    """Return a new map with the values of the keys in this map or in other.
+
+    other must be of the same type.  For a key in both maps, the values of this map
+    come first, followed by those of other; if combine is given, the values are
+    instead those of combine(self_values, other_values), which receives the two
+    deques (counts for TreeMultiSet).  processes is interpreted as for TreeMap.union.
+    """
+    return self._set_operation(other, 'union', combine, processes)
+
+  def intersection(self, other, combine=None, processes=None):
+    """Return a new map with the values of the keys in both this map and other.
+
+    Values are determined as described for union.
+    """
+    return self._set_operation(other, 'intersection', combine, processes)
+
+  def difference(self, other, processes=None):
+    """Return a new map with the values of the keys of this map that are not in other."""
+    return self._set_operation(other, 'difference', None, processes)
+
+  def symmetric_difference(self, other, processes=None):
+    """Return a new map with the values of the keys in exactly one of the two maps."""
+    return self._set_operation(other, 'symmetric_difference', None, processes)
+
+  #--------------------- public methods for multiple values ---------------------
+  def add(self, k, v):
+    """Add value v for key k, after any values already associated with k."""
+    self._add_bucket(k, self._pair_bucket(v))
+
+  def remove_one(self, k):
+    """Remove and return the earliest added value for key k (raise KeyError if not found).
+
+    The key itself is removed along with its last value.
+    """
+    node = self._node_exact(k)
+    if node is None:
+      raise KeyError('Key Error: ' + repr(k))
+    bucket = node._element._value
+    v = bucket.popleft()
+    if bucket:
+      self._refresh_path(node)
+    else:
+      self._remove_node(node)
+    return v
+
+  def count(self, k):
+    """Return the number of values associated with key k (0 if not found)."""
+    node = self._node_exact(k)
+    return self._multiplicity(node._element._value) if node is not None else 0
+
+  def total(self):
+    """Return the total number of values in the map."""
+    return self._root._total if self._root is not None else 0
+
+  def entries(self, start=None, stop=None, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop, one per value.
+
+    Bounds of None and reverse are interpreted as for find_range.  Values of the
+    same key are reported in insertion order (or the opposite order if reverse).
+    """
+    for k, bucket in self.find_range(start, stop, reverse):
+      for v in (reversed(bucket) if reverse else bucket):
+        yield (k, v)
+
+
+class TreeMultiSet(TreeMultiMap):
+  """Sorted multiset of keys, based on an AVL tree.
+
+  Each distinct key occupies one node, whose value is the number of copies of that
+  key.  len reports the number of distinct keys, and total the number of copies.
+  Where TreeMultiMap takes (key,value) pairs, a multiset takes (key,count) pairs.
+  """
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _multiplicity(self, bucket):
+    return bucket                 # a count, rather than a deque of values
+
+  def _make_bucket(self, n):
+    return n
+
+  def _pair_bucket(self, n):
+    if n < 1:
+      raise ValueError('Count must be positive: ' + repr(n))
+    return n
+
+  def _report(self, bucket):
+    return bucket
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __getitem__(self, k):
+    """Return the number of copies of key k (raise KeyError if not found)."""
+    return AVLTreeMap.__getitem__(self, k)
+
+  def __setitem__(self, k, n):
+    """Set the number of copies of key k to n (raise ValueError if n < 1)."""
+    self._store(k, self._pair_bucket(n))
+
+  #--------------------- public methods for multiple copies ---------------------
+  def add(self, k):
+    """Add a copy of key k."""
+    self._add_bucket(k, 1)
+
+  def remove_one(self, k):
+    """Remove a copy of key k (raise KeyError if not found)."""
+    node = self._node_exact(k)
+    if node is None:
+      raise KeyError('Key Error: ' + repr(k))
+    if node._element._value > 1:
+      node._element._value -= 1
+      self._refresh_path(node)
+    else:
+      self._remove_node(node)
+
+  def entries(self, start=None, stop=None, reverse=False):
+    """Iterate all keys such that start <= key < stop, once per copy.
+
+    Bounds of None and reverse are interpreted as for find_range.
+    """
+    for k, n in self.find_range(start, stop, reverse):
+      for j in range(n):
+        yield k
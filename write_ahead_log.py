@@ -0,0 +1,299 @@
+"""Write-ahead logging of map updates, with group commit and compaction into snapshots."""
+
+import os
+import pickle
+import struct
+import threading
+import zlib
+from collections.abc import MutableMapping
+from persistent_avl_tree import PersistentAVLTreeMap
+from map_file import save_map, sync_directory
+
+_FRAME = struct.Struct('<II')     # length and crc32 of the pickled record that follows
+_MISSING = object()               # marks a key absent from the map
+
+
+class WriteAheadLog:
+  """Append-only file of picklable records, made durable by group commit.
+
+  Each record is framed by its length and checksum, so a record torn by a crash
+  is detected, and discarded, when the log is reopened.  append only writes a
+  record to a buffer; commit waits until it is on stable storage.  Threads
+  committing at the same time share a single fsync: whichever arrives first
+  performs it on behalf of all records appended so far, while the others wait.
+  """
+
+  def __init__(self, path):
+    """Open the log at path for appending, creating it if necessary.
+
+    A damaged record at the end of an existing log, and any following data, is removed.
+    """
+    self._path = path
+    valid = 0
+    for record, end in self._scan(path):
+      valid = end
+    self._file = open(path, 'ab')
+    if self._file.tell() > valid:              # discard torn record
+      self._file.truncate(valid)
+    self._condition = threading.Condition(threading.Lock())
+    self._appended = 0                         # sequence number of last record appended
+    self._synced = 0                           # sequence number of last durable record
+    self._syncing = False                      # is an fsync in progress?
+
+  @staticmethod
+  def _scan(path):
+    """Generate (record, end offset) for each intact record of the log at path."""
+    if not os.path.exists(path):
+      return
+    with open(path, 'rb') as f:
+      position = 0
+      while True:
+        header = f.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+          return
+        length, checksum = _FRAME.unpack(header)
+        data = f.read(length)
+        if len(data) < length or zlib.crc32(data) != checksum:
+          return
+        position += _FRAME.size + length
+        yield pickle.loads(data), position
+
+  @classmethod
+  def replay(cls, path):
+    """Generate the intact records of the log at path (if any), in order."""
+    for record, end in cls._scan(path):
+      yield record
+
+  def __len__(self):
+    """Return number of records appended since the log was opened."""
+    return self._appended
+
+  def append(self, record):
+    """Append record to the log, and return its sequence number (for commit)."""
+    data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+    with self._condition:
+      self._file.write(_FRAME.pack(len(data), zlib.crc32(data)))
+      self._file.write(data)
+      self._appended += 1
+      return self._appended
+
+  def commit(self, sequence=None):
+    """Return once all records up to the given sequence number (by default, all) are durable."""
+    with self._condition:
+      if sequence is None:
+        sequence = self._appended
+      while self._synced < sequence:
+        if self._syncing:                      # another thread's fsync may cover us
+          self._condition.wait()
+          continue
+        self._syncing = True
+        target = self._appended
+        self._file.flush()
+        self._condition.release()              # let others append during the fsync
+        try:
+          os.fsync(self._file.fileno())
+        finally:
+          self._condition.acquire()
+          self._syncing = False
+          self._condition.notify_all()
+        self._synced = target
+
+  def close(self):
+    """Commit all records and close the log."""
+    self.commit()
+    self._file.close()
+
+
+class DurableTreeMap(MutableMapping):
+  """Sorted map whose updates survive crashes, using a write-ahead log and snapshots.
+
+  The map is kept in memory as a PersistentAVLTreeMap, and each update is first
+  appended to the log in the given directory.  If synchronous is True, an update
+  returns only once it is durable; otherwise, updates become durable with the
+  next call to sync (or close).  Concurrent updates share fsyncs (see WriteAheadLog).
+
+  Once the log holds compact_after records, it is replaced by a new log and the
+  contents of the map at that moment, taken as an O(1) snapshot, are written in
+  the background as a snapshot file in map_file format.  Opening the directory
+  loads the snapshot and replays the logs.  An error in the compaction thread is
+  reported by the next update (or close), and the old log is kept until a later
+  compaction succeeds.  Keys and values must be picklable.
+  """
+
+  def __init__(self, directory, synchronous=True, compact_after=100000, background=True):
+    """Open (or create) the map kept in the given directory."""
+    os.makedirs(directory, exist_ok=True)
+    self._directory = directory
+    self._synchronous = synchronous
+    self._compact_after = compact_after
+    self._background = background
+    self._lock = threading.Lock()              # orders updates in the log and the tree
+    self._compactor = None
+    self._compacting = False                   # is a background compaction running?
+    self._previous = False                     # does previous.log hold updates not in the snapshot?
+    self._failure = None                       # error of the last background compaction, if it failed
+    snapshot = self._path('snapshot.tmap')
+    if os.path.exists(snapshot):
+      self._tree = PersistentAVLTreeMap.load(snapshot, mmap=False)
+    else:
+      self._tree = PersistentAVLTreeMap()
+    for name in ('previous.log', 'current.log'):   # a compaction may have been interrupted
+      for record in WriteAheadLog.replay(self._path(name)):
+        try:
+          self._apply(record)
+        except TypeError:                      # key not comparable: failed when first made, too
+          pass
+    if os.path.exists(self._path('previous.log')):
+      self._compact(self._tree.snapshot())     # finish the interrupted compaction
+    self._log = WriteAheadLog(self._path('current.log'))
+
+  #------------------------------- nonpublic utilities -------------------------------
+  def _path(self, name):
+    return os.path.join(self._directory, name)
+
+  def _apply(self, record):
+    if record[0] == 'set':
+      self._tree[record[1]] = record[2]
+    elif record[1] in self._tree:              # deletion may be replayed twice
+      del self._tree[record[1]]
+
+  def _update(self, record):
+    """Apply and log record, then wait until durable if synchronous.
+
+    The record is logged only once applied, so an update that fails (such as one
+    with a key that cannot be compared to the others) leaves no trace in the log.
+    Raise RuntimeError, without applying record, if a background compaction has
+    failed since the previous update.
+    """
+    with self._lock:
+      self._raise_failure()
+      k = record[1]
+      old = self._tree.get(k, _MISSING)
+      self._apply(record)                      # leaves the tree unchanged if it raises
+      log = self._log                          # may be replaced by _rotate
+      try:
+        sequence = log.append(record)
+      except BaseException:                    # e.g. value cannot be pickled
+        if old is _MISSING:
+          del self._tree[k]
+        else:
+          self._tree[k] = old
+        raise
+      if len(log) >= self._compact_after and not self._compacting:
+        self._rotate()
+    if self._synchronous:
+      log.commit(sequence)
+
+  def _raise_failure(self):
+    """Raise RuntimeError if a background compaction has failed (lock must be held)."""
+    failure, self._failure = self._failure, None
+    if failure is not None:
+      raise RuntimeError('background compaction failed') from failure
+
+  def _rotate(self):
+    """Start a new log, and compact the old one into a snapshot (lock must be held).
+
+    If a failed compaction left the previous log in place, the current log is kept
+    instead, and the compaction tried again with the current contents of the map.
+    """
+    if not self._previous:
+      self._log.close()
+      os.replace(self._path('current.log'), self._path('previous.log'))
+      self._log = WriteAheadLog(self._path('current.log'))
+      sync_directory(self._directory)
+      self._previous = True
+    snapshot = self._tree.snapshot()           # O(1), unaffected by later updates
+    if self._background:
+      self._compacting = True
+      self._compactor = threading.Thread(target=self._compact_in_background, args=(snapshot,),
+                                         daemon=True)
+      self._compactor.start()
+    else:
+      self._compact(snapshot)
+      self._previous = False
+
+  def _compact(self, snapshot):
+    """Write snapshot as the snapshot file, replacing the previous log."""
+    save_map(snapshot, self._path('snapshot.tmap'))   # replaced atomically, and synced
+    os.remove(self._path('previous.log'))
+
+  def _compact_in_background(self, snapshot):
+    try:
+      self._compact(snapshot)
+    except Exception as e:                     # reported by the next update (or close)
+      with self._lock:
+        self._failure = e
+        self._compacting = False
+    else:
+      with self._lock:
+        self._previous = False
+        self._compacting = False
+
+  #--------------------- public methods for (standard) map interface ---------------------
+  def __len__(self):
+    """Return number of items in the map."""
+    with self._lock:
+      return len(self._tree)
+
+  def __getitem__(self, k):
+    """Return value associated with key k (raise KeyError if not found)."""
+    with self._lock:
+      return self._tree[k]
+
+  def __contains__(self, k):
+    """Return True if the map has an item with key k."""
+    with self._lock:
+      return k in self._tree
+
+  def __setitem__(self, k, v):
+    """Assign value v to key k, overwriting existing value if present."""
+    self._update(('set', k, v))
+
+  def __delitem__(self, k):
+    """Remove item associated with key k (raise KeyError if not found)."""
+    if k not in self:
+      raise KeyError('Key Error: ' + repr(k))
+    self._update(('del', k))
+
+  def __iter__(self):
+    """Generate an iteration of all keys in the map (as of the call) in order."""
+    with self._lock:
+      snapshot = self._tree.snapshot()
+    return iter(snapshot)
+
+  #--------------------- public methods for sorted map interface ---------------------
+  def snapshot(self):
+    """Return an immutable TreeSnapshot of the current contents of the map, in O(1) time."""
+    with self._lock:
+      return self._tree.snapshot()
+
+  def find_range(self, start, stop, reverse=False):
+    """Iterate all (key,value) pairs such that start <= key < stop, as of the call.
+
+    Bounds of None and reverse are interpreted as for TreeMap.find_range.
+    """
+    return self.snapshot().find_range(start, stop, reverse)
+
+  #--------------------- public methods for durability ---------------------
+  def sync(self):
+    """Return once all updates so far are durable."""
+    self._log.commit()
+
+  def close(self):
+    """Make all updates durable, wait for any compaction to finish, and close the log.
+
+    Raise RuntimeError if a background compaction has failed (see _update).
+    """
+    with self._lock:
+      self._log.close()
+      compactor = self._compactor
+    if compactor is not None:
+      compactor.join()
+    with self._lock:
+      self._raise_failure()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()